@@ -0,0 +1,154 @@
+import logging
+import math
+import time
+
+from alibi_metrics import metrics
+
+MIN_TICK_MS = 10
+
+
+class Countdown:
+    """A countdown measured against a deadline instead of a decremented counter.
+
+    Remaining time is always derived from the scheduler's clock, so slow
+    callbacks or a busy main loop can delay a label update but never make
+    the countdown drift.
+    """
+
+    def __init__(self, scheduler, duration, on_change=None, on_expire=None):
+        self.scheduler = scheduler
+        self.duration = duration
+        self.on_change = on_change
+        self.on_expire = on_expire
+        self.deadline = None
+        self.paused_remaining = duration
+        self.running = False
+        self.finished = False
+        self.shown = None
+
+    def remaining(self):
+        if self.running:
+            return max(0.0, self.deadline - self.scheduler.clock())
+        return self.paused_remaining
+
+    def seconds_shown(self):
+        """Whole seconds as displayed: 120 at start, 1 in the last second"""
+        return math.ceil(self.remaining() - 1e-9)
+
+    def start(self):
+        if self.finished or self.running:
+            return
+        self.deadline = self.scheduler.clock() + self.paused_remaining
+        self.running = True
+        self.scheduler.wake()
+
+    def pause(self):
+        if self.running:
+            self.paused_remaining = self.remaining()
+            self.running = False
+
+    def resume(self):
+        self.start()
+
+    def cancel(self):
+        self.running = False
+        self.finished = True
+        self.scheduler.discard(self)
+
+
+class TimerScheduler:
+    """Drives every countdown from one `master.after` tick.
+
+    Each tick recomputes remaining time from `clock()` and calls on_change
+    only when the whole-second value shown to the player changes. The next
+    tick is scheduled for the moment the nearest displayed value will
+    change, rather than on a fixed one-second chain per timer.
+    """
+
+    def __init__(self, master, clock=time.monotonic):
+        self.master = master
+        self.clock = clock
+        self.countdowns = []
+        self._tick_id = None
+        self.ticks = 0
+
+    def countdown(self, duration, on_change=None, on_expire=None, start=True):
+        countdown = Countdown(self, duration, on_change, on_expire)
+        self.countdowns.append(countdown)
+        if start:
+            countdown.start()
+        return countdown
+
+    def group(self):
+        """A TimerGroup for one of several games sharing this scheduler's tick"""
+        return TimerGroup(self)
+
+    def discard(self, countdown):
+        if countdown in self.countdowns:
+            self.countdowns.remove(countdown)
+
+    def cancel_all(self):
+        for countdown in list(self.countdowns):
+            countdown.cancel()
+        if self._tick_id is not None:
+            self.master.after_cancel(self._tick_id)
+            self._tick_id = None
+
+    def wake(self):
+        """Tick now so a freshly started countdown shows its value immediately"""
+        if self._tick_id is not None:
+            self.master.after_cancel(self._tick_id)
+        self._tick_id = self.master.after(0, self._tick)
+
+    @metrics.timed("ui.timer_tick")
+    def _tick(self):
+        self._tick_id = None
+        self.ticks += 1
+        for countdown in list(self.countdowns):
+            if not countdown.running:
+                continue
+            shown = countdown.seconds_shown()
+            if shown <= 0:
+                countdown.cancel()
+                self._dispatch(countdown.on_expire)
+                continue
+            if shown != countdown.shown:
+                countdown.shown = shown
+                self._dispatch(countdown.on_change, shown)
+        self._schedule()
+
+    def _schedule(self):
+        running = [c for c in self.countdowns if c.running]
+        if not running or self._tick_id is not None:
+            return
+        # Time until the soonest countdown crosses its next whole second
+        delay = min(c.remaining() - (c.seconds_shown() - 1) for c in running)
+        self._tick_id = self.master.after(max(MIN_TICK_MS, math.ceil(delay * 1000)), self._tick)
+
+    def _dispatch(self, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception:
+            logging.exception("Timer callback failed")
+
+
+class TimerGroup:
+    """One game's countdowns on a shared TimerScheduler; cancel_all only cancels its own"""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.clock = scheduler.clock
+        self.countdowns = []
+
+    def countdown(self, duration, on_change=None, on_expire=None, start=True):
+        self.countdowns = [c for c in self.countdowns if not c.finished]
+        countdown = self.scheduler.countdown(duration, on_change, on_expire, start)
+        self.countdowns.append(countdown)
+        return countdown
+
+    def cancel_all(self):
+        for countdown in self.countdowns:
+            countdown.cancel()
+        self.countdowns = []
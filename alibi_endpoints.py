@@ -0,0 +1,335 @@
+"""Routing across several middleware instances: health probes, EWMA latency, failover and hedging.
+
+`ALIBI_MIDDLEWARE_URL` may list more than one instance. A background thread
+probes each one's /health. Endpoints keep two exponentially weighted moving
+averages: one of the time each request takes to its first answer, and one
+of probe round trips. A request goes to the session's home endpoint while it
+is healthy, otherwise to the healthy one that answers fastest. Probe times
+only order endpoints that have not answered anything yet. Sessions live in
+one server's memory, so a request that moves to another endpoint carries
+the full transcript (`resync`), and the endpoint that answers becomes the
+new home.
+
+With hedging on, a request that has no answer yet once its endpoint's p95
+time to first answer has passed is sent again to the next best endpoint.
+The first to answer wins and the other is abandoned. If the winning stream
+breaks off part way, the caller gets a ("reset", None) event and the answer
+starts over from another attempt.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+
+from alibi_metrics import Histogram, metrics
+from alibi_net import RETRY_STATUSES, MiddlewareClient, RequestCancelled
+
+EWMA_ALPHA = 0.3
+PROBE_INTERVAL = 10.0  # seconds between background health probes
+PROBE_TIMEOUT = 3.0
+FAILURE_THRESHOLD = 2  # consecutive failures before an endpoint is passed over
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20  # below this the configured delay is used
+DEFAULT_HEDGE_DELAY = 3.0
+MIN_HEDGE_DELAY = 0.25
+
+
+def _ewma(average, seconds):
+    return seconds if average is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * average
+
+
+class Endpoint:
+    """One middleware instance and what has been measured about it"""
+
+    def __init__(self, client, index):
+        self.client = client
+        self.url = client.base_url
+        self.index = index
+        self.name = urlsplit(self.url).netloc or self.url
+        self.answer_ewma = None  # seconds to first answer from /interrogate
+        self.probe_ewma = None  # seconds per /health round trip
+        self.failures = 0  # consecutive
+        self.latency = Histogram(1000, "ms")  # time to first answer from /interrogate
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self):
+        return self.failures < FAILURE_THRESHOLD
+
+    def rank(self):
+        # Healthy before unhealthy, then fastest to answer. Probes only order endpoints that have not
+        # answered yet: a /health round trip says nothing about model time.
+        return (not self.healthy, self.answer_ewma is None, self.answer_ewma or 0.0,
+                self.probe_ewma is None, self.probe_ewma or 0.0, self.index)
+
+    def observe_probe(self, seconds):
+        with self._lock:
+            self.probe_ewma = _ewma(self.probe_ewma, seconds)
+            self.failures = 0
+        metrics.time(f"endpoints.{self.name}.probe", seconds)
+
+    def observe_answer(self, seconds):
+        with self._lock:
+            self.answer_ewma = _ewma(self.answer_ewma, seconds)
+            self.latency.record(seconds * 1000.0)
+            self.failures = 0
+        metrics.time(f"endpoints.{self.name}.first_answer", seconds)
+
+    def observe_abandoned(self, seconds):
+        """An attempt that lost a hedge race took at least `seconds` to answer"""
+        with self._lock:
+            self.answer_ewma = _ewma(self.answer_ewma, seconds)
+
+    def observe_failure(self):
+        with self._lock:
+            self.failures += 1
+        metrics.incr(f"endpoints.{self.name}.failures")
+
+    def hedge_delay(self, default):
+        with self._lock:
+            if self.latency.count < HEDGE_MIN_SAMPLES:
+                return default
+            return max(MIN_HEDGE_DELAY, self.latency.percentile(HEDGE_PERCENTILE) / 1000.0)
+
+
+class _Race:
+    """Buffers each attempt's stream events until one attempt produces the first answer"""
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.winner = None
+        self.futures = {}
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def emitter(self, endpoint):
+        buffer = self._buffers[endpoint] = []
+        started = time.perf_counter()
+
+        def emit(event):
+            with self._lock:
+                if self.winner is None and event[0] == "delta":
+                    endpoint.observe_answer(time.perf_counter() - started)
+                    self._claim(endpoint)
+                if self.winner is None:
+                    buffer.append(event)
+                    return
+                if self.winner is not endpoint:
+                    raise RequestCancelled()
+            self.emit(event)
+        return emit
+
+    def claim(self, endpoint):
+        """Make `endpoint` the winner unless another attempt already is; True if it won"""
+        with self._lock:
+            if self.winner is None:
+                self._claim(endpoint)
+            return self.winner is endpoint
+
+    def _claim(self, endpoint):
+        self.winner = endpoint
+        if self.emit is not None:
+            for event in self._buffers.pop(endpoint, ()):
+                self.emit(event)
+
+    def reopen(self):
+        """The winner failed part way: let the other attempts race again and tell the caller to start over"""
+        with self._lock:
+            self.winner = None
+        if self.emit is not None:
+            self.emit(("reset", None))
+
+
+class EndpointPool:
+    """Drop-in for MiddlewareClient that spreads calls over several endpoints.
+
+    Calls take the session's `home` URL and, for incremental turns, a
+    `resync` payload with the full transcript to send if the call has to
+    go elsewhere. Every response gets an `endpoint` attribute with the URL
+    that served it. `concurrent_calls` is how many calls may be in flight at
+    once (more than one when several games share the pool).
+    """
+
+    def __init__(self, urls, hedge=False, hedge_delay=DEFAULT_HEDGE_DELAY,
+                 probe_interval=PROBE_INTERVAL, concurrent_calls=1, **client_kwargs):
+        if not urls:
+            raise ValueError("At least one middleware URL is required")
+        self.endpoints = [Endpoint(MiddlewareClient(url, **client_kwargs), i) for i, url in enumerate(urls)]
+        self.hedge = hedge and len(self.endpoints) > 1
+        self.hedge_delay = hedge_delay
+        self.probe_interval = probe_interval
+        self.concurrent_calls = concurrent_calls
+        self._by_url = {endpoint.url: endpoint for endpoint in self.endpoints}
+        self._executor = None
+        self._prober = None
+        self._stop = threading.Event()
+
+    def ranked(self, home=None):
+        """Endpoints in the order to try them: a healthy home first, then the fastest healthy"""
+        ordered = sorted(self.endpoints, key=Endpoint.rank)
+        endpoint = self._by_url.get(home)
+        if endpoint is not None and endpoint.healthy:
+            ordered.remove(endpoint)
+            ordered.insert(0, endpoint)
+        return ordered
+
+    def interrogate(self, payload, home=None, resync=None):
+        return self._call("interrogate", payload, home, resync)
+
+    def interrogate_stream(self, payload, emit, home=None, resync=None):
+        return self._call("interrogate_stream", payload, home, resync, emit)
+
+    def rekey(self, payload, home=None):
+        # The prefetched session exists on one server only, so there is nowhere to fail over to
+        endpoint = self._by_url.get(home) or self.ranked()[0]
+        return self._attempt(endpoint, "rekey", payload, record=False)
+
+    def warm_up(self):
+        """Probe every endpoint once, then keep probing in the background; never raises"""
+        results = self._map(self.probe, self.endpoints)
+        if len(self.endpoints) > 1 and self._prober is None and not self._stop.is_set():
+            self._prober = threading.Thread(target=self._probe_loop, name="alibi-probe", daemon=True)
+            self._prober.start()
+        return any(results)
+
+    def probe(self, endpoint, timeout=None):
+        start = time.perf_counter()
+        try:
+            response = endpoint.client.health(timeout=timeout)
+            ok = response.ok
+            response.close()
+        except requests.exceptions.RequestException as e:
+            logging.debug("Probe of %s failed: %s", endpoint.name, e)
+            ok = False
+        if ok:
+            endpoint.observe_probe(time.perf_counter() - start)
+        else:
+            endpoint.observe_failure()
+            metrics.incr("endpoints.probe_failed")
+        return ok
+
+    def close(self):
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            self._map(lambda e: self.probe(e, timeout=(e.client.timeout[0], PROBE_TIMEOUT)), self.endpoints)
+            logging.debug("Endpoint latency: %s",
+                          ", ".join(f"{e.name}={e.answer_ewma and round(e.answer_ewma * 1000)}ms"
+                                    f"/{e.probe_ewma and round(e.probe_ewma * 1000)}ms/{e.failures}"
+                                    for e in self.endpoints))
+
+    def _map(self, func, items):
+        if len(items) == 1:
+            return [func(items[0])]
+        return list(self._pool().map(func, items))
+
+    def _pool(self):
+        if self._executor is None:
+            # Room for every endpoint's probe plus a primary and a hedge per call
+            self._executor = ThreadPoolExecutor(max_workers=2 * len(self.endpoints) + 2 * self.concurrent_calls,
+                                                thread_name_prefix="alibi-endpoint")
+        return self._executor
+
+    def _attempt(self, endpoint, method, payload, emit=None, record=True):
+        start = time.perf_counter()
+        args = (payload,) if emit is None else (payload, emit)
+        try:
+            response = getattr(endpoint.client, method)(*args)
+        except RequestCancelled:
+            raise
+        except requests.exceptions.RequestException:
+            endpoint.observe_failure()
+            raise
+        if response.status_code >= 500 or response.status_code in RETRY_STATUSES:
+            endpoint.observe_failure()
+        elif record:
+            endpoint.observe_answer(time.perf_counter() - start)
+        response.endpoint = endpoint.url
+        return response
+
+    def _call(self, method, payload, home, resync, emit=None):
+        ordered = self.ranked(home)
+        if len(ordered) == 1:
+            return self._attempt(ordered[0], method, payload, emit)
+
+        portable = resync or payload
+        race = _Race(emit)
+        pending = {}
+        launched = {}
+
+        def launch(endpoint, body):
+            launched[endpoint] = time.perf_counter()
+            stream = race.emitter(endpoint) if emit is not None else None
+            future = self._pool().submit(self._attempt, endpoint, method, body, stream, emit is None)
+            race.futures[endpoint] = future
+            pending[future] = endpoint
+
+        primary, spare = ordered[0], ordered[1:]
+        if home is not None and primary.url != home:
+            metrics.incr("endpoints.failover")
+            logging.info("Session home %s is unhealthy; moving to %s", home, primary.name)
+        launch(primary, payload if primary.url == home else portable)
+        deadline = time.monotonic() + primary.hedge_delay(self.hedge_delay) if self.hedge else None
+        hedged = None
+        failure = None
+
+        while True:
+            if race.winner is not None and race.futures[race.winner] in pending:
+                # A stream claimed the race with its first token; only its attempt can answer now
+                done, _ = wait([race.futures[race.winner]])
+            else:
+                if not pending:
+                    if isinstance(failure, Exception):
+                        raise failure
+                    result = failure
+                    break
+                timeout = max(0.0, deadline - time.monotonic()) if deadline is not None and spare else None
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    if race.winner is not None:
+                        continue  # the first token arrived while we waited
+                    hedged = spare.pop(0)
+                    deadline = None
+                    metrics.incr("endpoints.hedged")
+                    logging.debug("No answer from %s yet; hedging to %s", primary.name, hedged.name)
+                    launch(hedged, portable)
+                    continue
+            result = None
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    response = future.result()
+                except RequestCancelled:
+                    continue
+                except requests.exceptions.RequestException as e:
+                    failure = e
+                    if race.winner is endpoint:
+                        logging.info("Stream from %s broke off; the answer starts over", endpoint.name)
+                        race.reopen()
+                    continue
+                if response.status_code >= 500 or response.status_code in RETRY_STATUSES:
+                    failure = response
+                elif race.claim(endpoint):
+                    result = response
+            if result is not None:
+                break
+            if not pending and spare and race.winner is None:
+                endpoint = spare.pop(0)
+                metrics.incr("endpoints.failover")
+                logging.info("Request failed on every endpoint tried; failing over to %s", endpoint.name)
+                launch(endpoint, portable)
+
+        for future, endpoint in pending.items():
+            future.cancel()
+            endpoint.observe_abandoned(time.perf_counter() - launched[endpoint])
+        if hedged is not None and race.winner is hedged:
+            metrics.incr("endpoints.hedge_won")
+        return result
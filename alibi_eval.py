@@ -0,0 +1,312 @@
+"""Batch evaluator: plays a corpus of scripted alibis at every difficulty and role.
+
+The corpus is JSONL, one alibi per line:
+
+    {"id": "movie-night", "answers": ["I was at home all night.", "Watching a movie.", ...]}
+
+`name` is optional. Each alibi is played once for every difficulty and
+role (`--difficulty`/`--role` narrow the matrix, `--repeats` plays each
+cell more than once). A run opens an interrogation and answers with the
+script until the detective catches the suspect or the answers run out.
+This is the same request sequence as AlibiGame and alibi_loadgen.
+
+Each finished run is appended to the results file as one JSON line. Run
+again with the same `--results` and it skips runs already there, so an
+interrupted batch resumes where it stopped. Runs that ended in an error
+are tried again. The summary gives catch rate, turns-to-catch and
+request latency per difficulty. It is printed at the end, or on its own
+with `--summarize`.
+
+Usage:
+    python alibi_eval.py corpus.jsonl --results eval.jsonl --url http://localhost:3000 --concurrency 20
+    python alibi_eval.py corpus.jsonl --results eval.jsonl --stand-in --catch-rate 0.3
+    python alibi_eval.py --summarize --results eval.jsonl
+"""
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from alibi_loadgen import summarize
+from alibi_net import MiddlewareClient
+from alibi_protocol import (DIFFICULTIES, VALID_ROLES, build_answer_payload,
+                            build_opening_payload, is_caught)
+from alibi_transcript import Transcript
+
+
+def load_corpus(path):
+    """[(id, name, answers)] from a JSONL corpus; lines without answers are skipped"""
+    alibis = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            answers = [a for a in entry.get("answers", []) if isinstance(a, str) and a.strip()]
+            if not answers:
+                print(f"{path}:{number}: no answers, skipped", file=sys.stderr)
+                continue
+            alibis.append((str(entry.get("id", number)), entry.get("name", "Suspect"), answers))
+    return alibis
+
+
+def run_key(alibi_id, difficulty, role, repeat):
+    return f"{alibi_id}|{difficulty}|{role}|{repeat}"
+
+
+def load_results(path):
+    """Results by run key; a later line for the same key replaces an earlier one"""
+    results = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short when the last run was killed
+                results[entry["key"]] = entry
+    except FileNotFoundError:
+        pass
+    return results
+
+
+class ResultWriter:
+    """Appends one line per run and flushes it, so a killed batch loses at most the runs in flight"""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ScriptedRun:
+    """One interrogation of one alibi at one difficulty and role"""
+
+    def __init__(self, client, alibi_id, name, answers, difficulty, role, repeat):
+        self.client = client
+        self.key = run_key(alibi_id, difficulty, role, repeat)
+        # The seed fixes the scenario per cell, so reruns and other servers see the same case
+        self.seed = zlib.crc32(self.key.encode("utf-8"))
+        self.name = f"{name}-{self.seed:08x}"
+        self.alibi_id = alibi_id
+        self.answers = answers
+        self.difficulty = difficulty
+        self.role = role
+        self.repeat = repeat
+        self.transcript = Transcript()
+        self.session_token = None
+        self.latencies = []
+
+    def send(self, payload):
+        start = time.perf_counter()
+        response = self.client.interrogate(payload)
+        self.latencies.append(round(time.perf_counter() - start, 4))
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        return response.status_code, data
+
+    def run(self):
+        entry = {"key": self.key, "alibi": self.alibi_id, "difficulty": self.difficulty, "role": self.role,
+                 "repeat": self.repeat, "seed": self.seed, "caught": False, "caught_at": None,
+                 "turns": 0, "resyncs": 0, "error": None}
+        try:
+            self.play(entry)
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+        entry["latency_s"] = self.latencies
+        return entry
+
+    def play(self, entry):
+        payload = build_opening_payload(self.name, self.role, self.difficulty, scenario_seed=self.seed)
+        question = self.expect(entry, *self.send(payload))
+        if question is None:
+            return
+        for answer in self.answers:
+            turn = self.transcript.add(question, answer)
+            full = self.session_token is None
+            history = self.transcript.messages() if full else ()
+            payload = build_answer_payload(self.name, self.role, self.difficulty, answer, history, (),
+                                           session_token=self.session_token, turn=turn,
+                                           full=full, seq=self.transcript.seq)
+            status, data = self.send(payload)
+            if status == 409:
+                entry["resyncs"] += 1
+                payload = build_answer_payload(self.name, self.role, self.difficulty, answer,
+                                               self.transcript.messages(), (),
+                                               session_token=self.session_token, full=True)
+                status, data = self.send(payload)
+            question = self.expect(entry, status, data)
+            if question is None:
+                return
+            entry["turns"] += 1
+            if is_caught(question):
+                entry["caught"] = True
+                entry["caught_at"] = entry["turns"]
+                return
+
+    def expect(self, entry, status, data):
+        """The detective's reply, or None after recording why there is none"""
+        if status != 200 or not data or "response" not in data:
+            detail = data.get("error") if isinstance(data, dict) else None
+            entry["error"] = f"HTTP {status}: {detail}" if detail else f"HTTP {status}"
+            return None
+        self.session_token = data.get("sessionToken", self.session_token)
+        return data["response"]
+
+
+def plan(alibis, difficulties, roles, repeats, done):
+    """Every run in the matrix that has no successful result yet"""
+    runs = []
+    for alibi_id, name, answers in alibis:
+        for difficulty in difficulties:
+            for role in roles:
+                for repeat in range(repeats):
+                    previous = done.get(run_key(alibi_id, difficulty, role, repeat))
+                    if previous is None or previous.get("error"):
+                        runs.append((alibi_id, name, answers, difficulty, role, repeat))
+    return runs
+
+
+def evaluate(url, alibis, results_path, difficulties=DIFFICULTIES, roles=VALID_ROLES, repeats=1,
+             concurrency=8, timeout=60.0, progress=None):
+    """Play every outstanding run, appending each result as it finishes; returns how many ran"""
+    runs = plan(alibis, difficulties, roles, repeats, load_results(results_path))
+    if not runs:
+        return 0
+    client = MiddlewareClient(url, read_timeout=timeout, pool_size=concurrency)
+    writer = ResultWriter(results_path)
+    finished = 0
+
+    def play(args):
+        entry = ScriptedRun(client, *args).run()
+        writer.write(entry)
+        return entry
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="alibi-eval") as pool:
+            for entry in pool.map(play, runs):
+                finished += 1
+                if progress:
+                    progress(finished, len(runs), entry)
+    finally:
+        writer.close()
+        client.close()
+    return finished
+
+
+def report(results):
+    """Catch rate, turns-to-catch and latency per difficulty (and catch rate per role)"""
+    by_difficulty = {}
+    for entry in results.values():
+        by_difficulty.setdefault(entry["difficulty"], []).append(entry)
+    summary = {}
+    for difficulty in sorted(by_difficulty, key=lambda d: DIFFICULTIES.index(d) if d in DIFFICULTIES else 99):
+        entries = by_difficulty[difficulty]
+        played = [e for e in entries if not e.get("error")]
+        caught = [e for e in played if e["caught"]]
+        turns_to_catch = sorted(e["caught_at"] for e in caught)
+        distribution = {}
+        for turns in turns_to_catch:
+            distribution[str(turns)] = distribution.get(str(turns), 0) + 1
+        roles = {}
+        for e in played:
+            counts = roles.setdefault(e["role"], [0, 0])
+            counts[0] += e["caught"]
+            counts[1] += 1
+        latencies = [e.get("latency_s", []) for e in entries]
+        summary[difficulty] = {
+            "runs": len(entries),
+            "errors": len(entries) - len(played),
+            "caught": len(caught),
+            "catch_rate": round(len(caught) / len(played), 4) if played else None,
+            "turns_to_catch": dict(summarize(turns_to_catch), distribution=distribution),
+            "survived_turns": summarize([e["turns"] for e in played if not e["caught"]]),
+            "catch_rate_by_role": {role: round(c / n, 4) for role, (c, n) in sorted(roles.items())},
+            "latency_s": {
+                "opening": summarize([l[0] for l in latencies if l]),
+                "turn": summarize([value for l in latencies for value in l[1:]]),
+            },
+        }
+    return summary
+
+
+def start_stand_in(catch_rate):
+    """Run alibi_server's StubServer on a free local port in a daemon thread; returns its URL"""
+    from alibi_server import StubConfig, StubServer
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = StubServer(StubConfig(latency=0.0, tokens_per_second=0.0, catch_rate=catch_rate))
+    ready = threading.Event()
+
+    async def serve():
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", port)
+        ready.set()
+        async with listener:
+            await listener.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), name="alibi-eval-stand-in", daemon=True).start()
+    if not ready.wait(10):
+        raise RuntimeError("stand-in server did not start")
+    return f"http://127.0.0.1:{port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score scripted alibis across difficulties and roles")
+    parser.add_argument("corpus", nargs="?", help="JSONL file of {id, answers, name?} alibis")
+    parser.add_argument("--results", required=True, help="JSONL results file (appended to; resumable)")
+    parser.add_argument("--url", default="http://localhost:3000", help="middleware base URL")
+    parser.add_argument("--stand-in", action="store_true", help="play against an in-process alibi_server")
+    parser.add_argument("--catch-rate", type=float, default=0.1, help="stand-in catch rate")
+    parser.add_argument("--difficulty", action="append", choices=DIFFICULTIES,
+                        help="repeat to pick difficulties (default: all)")
+    parser.add_argument("--role", action="append", choices=VALID_ROLES, help="repeat to pick roles (default: all)")
+    parser.add_argument("--repeats", type=int, default=1, help="runs per alibi, difficulty and role")
+    parser.add_argument("--concurrency", type=int, default=8, help="interrogations in flight at once")
+    parser.add_argument("--timeout", type=float, default=60.0, help="read timeout per request")
+    parser.add_argument("--summarize", action="store_true", help="only print the summary of --results")
+    parser.add_argument("--output", help="write the JSON summary here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not args.summarize:
+        if not args.corpus:
+            parser.error("a corpus is required unless --summarize is given")
+        alibis = load_corpus(args.corpus)
+        url = start_stand_in(args.catch_rate) if args.stand_in else args.url
+        started = time.perf_counter()
+
+        def progress(done, total, entry):
+            if done % 50 == 0 or done == total:
+                rate = done / (time.perf_counter() - started) * 3600
+                print(f"{done}/{total} runs ({rate:.0f}/hour)", file=sys.stderr)
+
+        evaluate(url, alibis, args.results, difficulties=args.difficulty or DIFFICULTIES,
+                 roles=args.role or VALID_ROLES, repeats=args.repeats, concurrency=args.concurrency,
+                 timeout=args.timeout, progress=progress)
+
+    text = json.dumps(report(load_results(args.results)), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Local stand-in for the detective when the middleware is too slow to answer a turn.
+
+`LocalInterrogator` asks follow-up questions built from the case file
+(scenario and evidence) and the player's answers. It keeps a ledger of
+where the player says they were and when. If a new answer puts the player
+somewhere else at a time they have already accounted for, or at the scene
+at the time of the crime, the next question is put to them directly.
+
+The local detective never ends the game; only the model decides that the
+player has been caught.
+"""
+import random
+import re
+
+CLOSE_MINUTES = 30  # claims this close together are about the same moment
+
+TIME_RE = re.compile(
+    r"\b(?P<word>noon|midday|midnight)\b"
+    r"|\b(?P<hour>\d{1,2})(?::(?P<minute>[0-5]\d))?\s*(?P<meridiem>[ap]\.?m\b\.?|o'clock\b)"
+    r"|\b(?:at|around|about|by|until|till|after|before|since)\s+(?P<bare>\d{1,2})(?::(?P<bare_minute>[0-5]\d))?"
+    r"(?![\d:])(?!\s*(?:[ap]\.?m\b|o'clock))",
+    re.IGNORECASE,
+)
+PLACE_RE = re.compile(r"\b(?:at|in|to|from|near|inside|outside)\s+(?P<place>[a-z][\w'’-]*(?:\s+[\w'’-]+){0,4})",
+                      re.IGNORECASE)
+SENTENCE_RE = re.compile(r"[^.!?;]+")
+
+DETERMINERS = {"the", "a", "an", "my", "his", "her", "our", "their", "some", "this", "that"}
+PLACE_STOP_WORDS = {
+    "at", "around", "about", "by", "until", "till", "after", "before", "since", "with", "and", "or",
+    "when", "while", "then", "so", "because", "but", "for", "on", "all", "that", "which", "who",
+    "where", "to", "from", "in", "i", "we", "he", "she", "they", "was", "were", "is",
+}
+NOT_PLACES = {
+    "morning", "afternoon", "evening", "night", "noon", "midday", "midnight", "time", "fact", "general",
+    "case", "truth", "order", "person", "touch", "charge", "question", "least", "first", "last", "once",
+    "any", "there", "here", "it", "me", "you", "him", "them", "be", "get", "go", "see", "meet", "watch",
+    "do", "make", "have", "pick", "grab", "buy", "eat", "talk", "call", "leave", "know", "say", "tell",
+}
+PLACE_ALIASES = {
+    "house": "home", "place": "home", "apartment": "home", "flat": "home", "bed": "home", "home": "home",
+    "office": "work", "job": "work", "work": "work", "shift": "work",
+}
+ALIBI_WITNESS_WORDS = {"with", "friend", "friends", "saw", "seen", "witness", "receipt", "camera", "wife",
+                       "husband", "girlfriend", "boyfriend", "brother", "sister", "mom", "dad", "roommate"}
+VAGUE_PLACE_WORDS = {"downtown", "local", "district", "city"}  # too common to place someone at the scene
+EVASIVE_WORDS = 4  # answers shorter than this many words are treated as dodges
+
+CONTRADICTION_LINES = [
+    "Hold on. Earlier you said you were {earlier_place} {earlier_time}. Now it's {place} {time}. Which is it?",
+    "You told me {earlier_place} {earlier_time}. Now you're saying {place}. You can't be in two places at once, {name}.",
+]
+SCENE_LINES = [
+    "You just put yourself {place} {time}, right when the {crime} went down at {location}. Explain that.",
+    "{place_cap} {time}? That's exactly where and when the {crime} happened. Start talking.",
+]
+EVASIVE_LINES = [
+    "That's not an answer, {name}. Where were you at {crime_time}?",
+    "Silence won't help you. Walk me through what you did before and after {crime_time}.",
+]
+TIME_LINES = [
+    "Let's be precise. What time did you get there, and what time did you leave?",
+    "Give me times, {name}. Where were you at {crime_time}, exactly?",
+]
+WITNESS_LINES = [
+    "Who can confirm you were {place}?",
+    "Anyone see you {place}? A name, a receipt, anything.",
+]
+EVIDENCE_LINES = [
+    "Then explain this: {evidence_lower}.",
+    "Interesting. Because {evidence_lower}. How do you account for that?",
+]
+GENERIC_LINES = [
+    "And after that? Take me through the next hour.",
+    "How did you get there, and how did you get home?",
+    "As the suspected {role}, you'd know how the crew {method_lower}. Where did you learn to do that?",
+    "Why should I believe a word of that, {name}?",
+]
+
+
+def lower_first(text):
+    return text[:1].lower() + text[1:]
+
+
+def parse_times(sentence):
+    """(minutes after midnight, meridiem known, text) for each time mentioned"""
+    times = []
+    for match in TIME_RE.finditer(sentence):
+        if match.group("word"):
+            word = match.group("word").lower()
+            times.append((0 if word == "midnight" else 12 * 60, True, "at " + word))
+            continue
+        hour = match.group("hour") or match.group("bare")
+        minute = int(match.group("minute") or match.group("bare_minute") or 0)
+        hour = int(hour)
+        if hour > 23:
+            continue
+        meridiem = (match.group("meridiem") or "").lower().replace(".", "")
+        known = meridiem in ("am", "pm") or hour > 12 or hour == 0
+        if meridiem == "pm" and hour < 12:
+            hour += 12
+        elif meridiem == "am" and hour == 12:
+            hour = 0
+        text = match.group(0)
+        text = text if match.group("bare") else "at " + text
+        times.append((hour * 60 + minute, known, text.strip()))
+    return times
+
+
+def parse_places(sentence):
+    """(normalized place, text) for each place mentioned"""
+    places = []
+    for match in PLACE_RE.finditer(sentence):
+        tokens = match.group(0).split()
+        words = []
+        used = 1  # the preposition
+        for token in tokens[1:]:
+            word = token.lower().strip("'’,")
+            if word in PLACE_STOP_WORDS or word[:1].isdigit():
+                break
+            used += 1
+            if words or word not in DETERMINERS:
+                words.append(word)
+        if not words or words[0] in NOT_PLACES:
+            continue
+        # "my place" and "home" are the same place; "Dave's place" is not
+        key = PLACE_ALIASES.get(words[0], words[0]) if len(words) == 1 else " ".join(words)
+        # Quoted back as "you were at the gym", not "you were to the gym"
+        preposition = tokens[0].lower()
+        preposition = "at" if preposition in ("to", "from") else preposition
+        places.append((key, " ".join([preposition] + tokens[1:used]).rstrip(",")))
+    return places
+
+
+def minutes_apart(a, b, both_known):
+    period = 24 * 60 if both_known else 12 * 60
+    diff = abs(a - b) % period
+    return min(diff, period - diff)
+
+
+def same_place(a, b):
+    return a == b or a in b or b in a
+
+
+class Claim:
+    __slots__ = ("turn", "minutes", "known", "time_text", "place", "place_text")
+
+    def __init__(self, turn, minutes, known, time_text, place, place_text):
+        self.turn = turn
+        self.minutes = minutes
+        self.known = known
+        self.time_text = time_text
+        self.place = place
+        self.place_text = place_text
+
+    def near(self, other):
+        return minutes_apart(self.minutes, other.minutes, self.known and other.known) <= CLOSE_MINUTES
+
+
+class Contradiction:
+    __slots__ = ("kind", "claim", "earlier")
+
+    def __init__(self, kind, claim, earlier=None):
+        self.kind = kind  # "places" or "scene"
+        self.claim = claim
+        self.earlier = earlier
+
+
+class ClaimLedger:
+    """Where-and-when claims from the player's answers, checked against each other and the crime"""
+
+    def __init__(self, scenario=None):
+        self.claims = []
+        self.turns = 0
+        self.crime_minutes = None
+        self.scene_words = set()
+        if scenario:
+            times = parse_times(scenario.get("time", ""))
+            if times:
+                self.crime_minutes = times[0][0]
+            self.scene_words = {w.lower() for w in scenario.get("location", "").split()
+                                if len(w) > 3} - VAGUE_PLACE_WORDS
+
+    def add(self, answer):
+        """Record the claims in an answer; returns the first Contradiction it introduces, or None"""
+        self.turns += 1
+        found = None
+        for sentence in SENTENCE_RE.findall(answer):
+            times, places = parse_times(sentence), parse_places(sentence)
+            if not times or not places:
+                continue
+            place, place_text = places[0]
+            for minutes, known, time_text in times:
+                claim = Claim(self.turns, minutes, known, time_text, place, place_text)
+                if found is None:
+                    found = self.check(claim)
+                self.claims.append(claim)
+        return found
+
+    def check(self, claim):
+        for earlier in self.claims:
+            if earlier.turn < claim.turn and claim.near(earlier) and not same_place(claim.place, earlier.place):
+                return Contradiction("places", claim, earlier)
+        if (self.crime_minutes is not None and self.scene_words & set(claim.place.split())
+                and minutes_apart(claim.minutes, self.crime_minutes, claim.known) <= CLOSE_MINUTES):
+            return Contradiction("scene", claim)
+        return None
+
+    def last_place(self):
+        return self.claims[-1].place_text if self.claims and self.claims[-1].turn == self.turns else None
+
+
+class LocalInterrogator:
+    """Asks the next question from the case file when the model can't answer in time"""
+
+    def __init__(self, name, role, scenario, evidence, rng=None):
+        self.name = name
+        self.role = role
+        self.scenario = scenario or {}
+        self.evidence = list(evidence or [])
+        self.rng = rng or random.Random()
+        self.ledger = ClaimLedger(self.scenario)
+        self.contradiction = None
+        self.used = set()
+        self.last_answer = ""
+        self.questions = 0
+
+    def observe(self, answer):
+        """Feed every answer, whoever asks the next question; returns any contradiction found"""
+        self.contradiction = self.ledger.add(answer or "")
+        self.last_answer = answer or ""
+        return self.contradiction
+
+    def question(self):
+        self.questions += 1
+        fields = {
+            "name": self.name,
+            "role": self.role,
+            "crime": self.scenario.get("crime", "robbery"),
+            "location": self.scenario.get("location", "the scene"),
+            "crime_time": self.scenario.get("time", "the time of the crime"),
+            "method_lower": lower_first(self.scenario.get("method", "got in")),
+        }
+        contradiction, self.contradiction = self.contradiction, None
+        if contradiction is not None:
+            claim = contradiction.claim
+            fields.update(place=claim.place_text, place_cap=claim.place_text[:1].upper() + claim.place_text[1:],
+                          time=claim.time_text)
+            if contradiction.kind == "scene":
+                return self.pick(SCENE_LINES, fields)
+            fields.update(earlier_place=contradiction.earlier.place_text, earlier_time=contradiction.earlier.time_text)
+            return self.pick(CONTRADICTION_LINES, fields)
+
+        answer = self.last_answer
+        if len(answer.split()) < EVASIVE_WORDS or answer.startswith("["):
+            return self.pick(EVASIVE_LINES, fields)
+        if not self.ledger.claims:
+            return self.pick(TIME_LINES, fields)
+        place = self.ledger.last_place()
+        if place and not ALIBI_WITNESS_WORDS & set(re.findall(r"[a-z]+", answer.lower())):
+            fields["place"] = place
+            line = self.pick(WITNESS_LINES, fields, reuse=False)
+            if line:
+                return line
+        unused = [e for e in self.evidence if e not in self.used]
+        if unused:
+            evidence = self.rng.choice(unused)
+            self.used.add(evidence)
+            fields["evidence_lower"] = lower_first(evidence.rstrip("."))
+            return self.pick(EVIDENCE_LINES, fields)
+        return self.pick(GENERIC_LINES, fields)
+
+    def pick(self, lines, fields, reuse=True):
+        """A line not asked yet if there is one; with reuse=False, None once all are used"""
+        fresh = [line for line in lines if line not in self.used]
+        if not fresh:
+            if not reuse:
+                return None
+            fresh = lines
+        line = self.rng.choice(fresh)
+        self.used.add(line)
+        return line.format(**fields)
@@ -1,20 +1,49 @@
 import tkinter as tk
-from tkinter import messagebox, simpledialog, ttk
-import requests
+from tkinter import messagebox
+import importlib
 import random
 import threading
 import time
 import logging
-from tkinter import font
+import os
+import argparse
+import alibi_log
+from alibi_clock import TimerScheduler
+from alibi_fallback import LocalInterrogator
+from alibi_log import Redacted
+from alibi_metrics import metrics
+from alibi_protocol import (CAUGHT_PHRASE, VALID_ROLES, build_answer_payload,
+                            build_opening_payload, build_rekey_payload, is_caught,
+                            provisional_name, rename_player)
+from alibi_scenario import generate_case, new_seed
+from alibi_transcript import DEFAULT_TOKEN_BUDGET, Transcript
+from alibi_transcript_view import TranscriptView
 
-# Logging setup
-logging.basicConfig(level=logging.DEBUG, format='[%(levelname)s] %(message)s')
+# Comma-separated; with several instances requests go to the fastest healthy one
+MIDDLEWARE_URLS = [url.strip() for url in
+                   os.environ.get("ALIBI_MIDDLEWARE_URL", "https://alibi-myn4.onrender.com").split(",")
+                   if url.strip()]
+HEDGE_REQUESTS = os.environ.get("ALIBI_HEDGE", "0") == "1"
+HEDGE_DELAY = float(os.environ.get("ALIBI_HEDGE_DELAY", 3))
+PROBE_INTERVAL = float(os.environ.get("ALIBI_PROBE_INTERVAL", 10))
+CONNECT_TIMEOUT = float(os.environ.get("ALIBI_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("ALIBI_READ_TIMEOUT", 30))
+STREAM_RESPONSES = os.environ.get("ALIBI_STREAM", "1") != "0"
+METRICS_PATH = os.environ.get("ALIBI_METRICS_PATH", "alibi_metrics.json")
+TOKEN_BUDGET = int(os.environ.get("ALIBI_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+# Seconds the model gets to start answering before the local detective asks instead; 0 disables
+FALLBACK_BUDGET = float(os.environ.get("ALIBI_FALLBACK_BUDGET", 10))
+FALLBACK_STATUSES = {429, 500, 502, 503, 504}
+PROFILE_PATH = os.environ.get("ALIBI_PROFILE_PATH", "alibi_profile.jsonl")
+PROFILE_TURNS = os.environ.get("ALIBI_PROFILE", "0") == "1"  # or toggle with F8
+PRELOAD_DELAY_MS = 100  # let the intro screen paint before loading requests/urllib3
+
+
+def preload_network():
+    """Import the network stack on a background thread while the player reads the intro"""
+    threading.Thread(target=importlib.import_module, args=("alibi_net",),
+                     name="alibi-preload", daemon=True).start()
 
-MIDDLEWARE_URL = "https://alibi-myn4.onrender.com/interrogate"
-VALID_ROLES = [
-    "Driver", "Lookout", "Hacker", "Muscle",
-    "Inside Man", "Mastermind", "Tech Specialist", "Demolitions Expert"
-]
 
 class ModernButton(tk.Button):
     def __init__(self, master, **kwargs):
@@ -35,8 +64,10 @@ class ModernButton(tk.Button):
         self.config(bg="#2c3e50")
 
 class AlibiGame:
-    def __init__(self, master):
+    def __init__(self, master, clock=time.monotonic, recorder=None, seat=None, client=None, network=None):
         self.master = master
+        self.recorder = recorder  # alibi_replay.Recorder when the session is being recorded
+        self.seat = seat  # alibi_kiosk.Seat when a kiosk host shares its engine, client and timers with us
         self.master.title("🎮 ALIBI: The Interrogation Experience")
         
         # Get screen dimensions and set window size
@@ -74,12 +105,11 @@ class AlibiGame:
         
         # Game state
         self.name = ""
-        self.difficulty = "Normal"
+        self.difficulty = "Medium"
         self.role = random.choice(VALID_ROLES)
         self.scenario = {}
         self.evidence = []
-        self.conversationHistory = []
-        self.context = []
+        self.transcript = Transcript(TOKEN_BUDGET)
         self.current_question = ""
         self.response_time_left = 120  # 2 minutes per answer
         self.total_time_left = 20 * 60  # 20 minutes to survive
@@ -88,8 +118,78 @@ class AlibiGame:
         self.is_first_question = True
         self.timer_running = False
         self.response_timer_running = False
+        self.response_countdown = None
+        self.total_countdown = None
+        self.pending_request = None
+        self.session_token = None  # server-side transcript handle for incremental turns
+        self.endpoint = None  # middleware instance that holds the session
+        self.last_answer = ""
+        self.streamed_text = ""
+        self.stream_verdict = None
+        self.rendered = {}  # last options pushed to retained interrogation widgets
+        self.prefetch = None  # speculative opening request made while the setup dialog is open
+        self.setup_dialog = None
+        self.rekey_request = None
+        self.deferred_request = None
+        self.question_seq = 0  # bumped for every question shown
+        self.answered_seq = 0  # question_seq of the last answer sent
+        self.request_seq = 0  # bumped for every request; replies to older ones are dropped
+        self.interrogator = None  # local detective for turns the middleware can't answer in time
+        self.fallback_countdown = None
+        self.degraded = False  # the last question came from the local detective
+
+        # One monotonic-clock tick drives both countdowns (and, in a kiosk, every seat's)
+        self.timers = TimerScheduler(self.master, clock=clock) if seat is None else seat.timers
+
+        # Network stack is created on first use so the intro screen never waits for it,
+        # unless one is passed in (alibi_replay's stand-ins), which is used as is
+        self._network = network
+        self._client = client
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.master.bind("<F9>", lambda event: self.dump_metrics())
+        self.master.bind("<F8>", lambda event: self.toggle_profiling())
+        self.profiler = None  # alibi_profile.TurnProfiler once profiling has been turned on
+        if PROFILE_TURNS:
+            self.toggle_profiling()
 
         self.build_intro_screen()
+        self.master.after(PRELOAD_DELAY_MS, preload_network)
+
+    @property
+    def network(self):
+        """Background request engine so the Tk loop never blocks on the network"""
+        if self._network is None:
+            if self.seat is not None:
+                self._network = self.seat.network
+            else:
+                from alibi_net import NetworkEngine
+                self._network = NetworkEngine(self.master)
+        return self._network
+
+    @property
+    def client(self):
+        if self._client is None:
+            if self.seat is not None:
+                self._client = self.seat.client
+            else:
+                from alibi_endpoints import EndpointPool
+                self._client = EndpointPool(MIDDLEWARE_URLS, hedge=HEDGE_REQUESTS, hedge_delay=HEDGE_DELAY,
+                                            probe_interval=PROBE_INTERVAL, connect_timeout=CONNECT_TIMEOUT,
+                                            read_timeout=READ_TIMEOUT)
+            if self.recorder is not None:
+                from alibi_replay import RecordingClient
+                self._client = RecordingClient(self._client, self.recorder)
+        return self._client
+
+    def toggle_profiling(self):
+        if self.profiler is None:
+            from alibi_profile import TurnProfiler
+            self.profiler = TurnProfiler(PROFILE_PATH)
+        self.profiler.toggle()
+
+    def record(self, action, **fields):
+        if self.recorder is not None:
+            self.recorder.action(action, **fields)
 
     def create_gradient_frame(self, parent, **kwargs):
         """Create a frame with gradient-like styling"""
@@ -159,13 +259,19 @@ class AlibiGame:
         start_button.grid(row=1, column=0, pady=30)
 
     def get_player_info(self):
+        self.record("setup", role=self.role)
+        # Warm the pooled connection (and a cold host) while the player types
+        self.network.submit(self.client.warm_up)
+
         # Create a modern dialog
         dialog = tk.Toplevel(self.master)
         dialog.title("Setup Interrogation")
         dialog.geometry("400x300")
         dialog.configure(bg=self.colors['bg_dark'])
         dialog.transient(self.master)
-        dialog.grab_set()
+        if self.seat is None:
+            dialog.grab_set()  # a grab is app-wide; in a kiosk it would freeze the other players
+        self.setup_dialog = dialog
         
         # Center dialog
         dialog.geometry("+%d+%d" % (self.master.winfo_rootx() + 50, self.master.winfo_rooty() + 50))
@@ -182,20 +288,20 @@ class AlibiGame:
         tk.Label(dialog, text="Choose difficulty:", font=("Segoe UI", 12), 
                 bg=self.colors['bg_dark'], fg=self.colors['text_light']).pack(pady=10)
         
-        difficulty_var = tk.StringVar(value="Normal")
-        difficulties = [("Easy", "Easy"), ("Normal", "Normal"), ("Hard", "Hard"), ("Expert", "Expert")]
+        difficulty_var = tk.StringVar(value=self.difficulty)
+        difficulties = [("Easy", "Easy"), ("Normal", "Medium"), ("Hard", "Hard"), ("Expert", "Expert")]
         
         for text, value in difficulties:
             tk.Radiobutton(dialog, text=text, variable=difficulty_var, value=value,
                           font=("Segoe UI", 10), bg=self.colors['bg_dark'], 
-                          fg=self.colors['text_light'], selectcolor=self.colors['bg_medium']).pack()
+                          fg=self.colors['text_light'], selectcolor=self.colors['bg_medium'],
+                          command=lambda: self.select_difficulty(difficulty_var.get())).pack()
+
+        # Role and difficulty are already known; only the name is missing
+        self.start_prefetch(difficulty_var.get())
         
         def on_submit():
-            self.name = name_entry.get() or "Player"
-            self.difficulty = difficulty_var.get()
-            self.role = random.choice(VALID_ROLES)
-            dialog.destroy()
-            self.start_interrogation(first=True)
+            self.submit_player_info(name_entry.get() or "Player", difficulty_var.get())
         
         # Submit button
         submit_btn = ModernButton(dialog, text="START", command=on_submit,
@@ -206,40 +312,277 @@ class AlibiGame:
         # Enter key binding
         name_entry.bind('<Return>', lambda e: on_submit())
 
+    def select_difficulty(self, difficulty):
+        self.record("difficulty", value=difficulty)
+        self.start_prefetch(difficulty)
+
+    def submit_player_info(self, name, difficulty):
+        self.record("start", name=name, difficulty=difficulty)
+        self.name = name
+        self.difficulty = difficulty
+        self.setup_dialog.destroy()
+        self.setup_dialog = None
+        self.begin_interrogation()
+
+    def start_prefetch(self, difficulty):
+        """Request the opening question under a provisional name while the player types theirs"""
+        if self.prefetch is not None:
+            if self.prefetch["difficulty"] == difficulty:
+                return
+            self.discard_prefetch()
+
+        prefetch = {"name": provisional_name(), "difficulty": difficulty, "seed": new_seed(),
+                    "response": None, "error": None, "claimed": False}
+
+        def finish(key):
+            def handler(value):
+                prefetch[key] = value
+                prefetch["handle"] = None
+                if prefetch["claimed"] and not self.interrogation_over:
+                    self.adopt_prefetch(prefetch)
+            return handler
+
+        payload = build_opening_payload(prefetch["name"], self.role, difficulty,
+                                        scenario_seed=prefetch["seed"])
+        prefetch["handle"] = self.network.submit(self.client.interrogate, payload,
+                                                 on_success=finish("response"), on_error=finish("error"))
+        self.prefetch = prefetch
+        metrics.incr("prefetch.started")
+
+    def discard_prefetch(self):
+        # The orphaned server session expires with the normal session cleanup
+        prefetch, self.prefetch = self.prefetch, None
+        if prefetch is None:
+            return
+        if prefetch["handle"] is not None:
+            prefetch["handle"].cancel()
+        metrics.incr("prefetch.discarded")
+
+    def begin_interrogation(self):
+        """Use the prefetched opening question if it matches the dialog, else ask for one"""
+        prefetch = self.prefetch
+        if prefetch is None or prefetch["difficulty"] != self.difficulty:
+            self.discard_prefetch()
+            self.start_interrogation(first=True)
+            return
+        self.prefetch = None
+        prefetch["claimed"] = True
+        self.show_local_case(prefetch["seed"])
+        if prefetch["handle"] is None:
+            self.adopt_prefetch(prefetch)
+        # Otherwise adopt_prefetch runs as soon as the opening question arrives
+
+    def adopt_prefetch(self, prefetch):
+        data = None
+        response = prefetch["response"]
+        if response is not None and response.status_code == 200:
+            try:
+                data = self.decode_response(response)
+            except ValueError:
+                data = None
+        if data is None:
+            logging.info("Prefetched opening unusable (%s), requesting a new one",
+                         prefetch["error"] or response.status_code)
+            metrics.incr("prefetch.failed")
+            self.start_interrogation(first=True)
+            return
+
+        metrics.incr("prefetch.used")
+        old_name = prefetch["name"]
+        data["response"] = rename_player(data.get("response", ""), old_name, self.name)
+        data["evidence"] = rename_player(data.get("evidence", []), old_name, self.name)
+        self.show_opening(data, first=True)
+
+        # Answers wait in send_request until the server knows the real name
+        self.rekey_request = self.network.submit(
+            self.client.rekey, build_rekey_payload(old_name, self.name, self.session_token),
+            home=self.endpoint, on_success=self.on_rekeyed, on_error=self.on_rekey_failed)
+
+    def on_rekeyed(self, response):
+        if self.interrogation_over:
+            return
+        if response.status_code != 200:
+            self.on_rekey_failed(f"HTTP {response.status_code}")
+            return
+        self.rekey_request = None
+        data = self.decode_response(response)
+        self.session_token = data.get("sessionToken", self.session_token)
+        deferred, self.deferred_request = self.deferred_request, None
+        if deferred is not None:
+            self.send_request(*deferred)
+
+    def on_rekey_failed(self, error):
+        if self.interrogation_over:
+            return
+        logging.warning("Could not claim prefetched session: %s", error)
+        metrics.incr("prefetch.rekey_failed")
+        self.rekey_request = None
+        self.deferred_request = None
+        # The question on screen belongs to a session we can't use; start a real one
+        self.reset_transcript()
+        self.session_token = None
+        self.start_interrogation(first=True)
+
+    def reset_transcript(self):
+        self.transcript.clear()
+        if self.interrogation_screen_built():
+            self.transcript_view.clear()
+
+    def show_local_case(self, seed):
+        """Render the case file the server will derive from `seed` before it answers"""
+        self.scenario, self.evidence = generate_case(seed, self.name, self.difficulty)
+        self.current_question = ""
+        self.build_interrogation_screen()
+        self.question_label.config(text="🔄 Getting AI response...", fg=self.colors['warning'])
+
     def start_interrogation(self, first=False, player_answer=""):
-        payload = {
-            "playerName": self.name,
-            "role": self.role,
-            "difficulty": self.difficulty,
-            "conversationHistory": self.conversationHistory,
-            "context": self.context,
-            "playerResponse": player_answer,
-            "startInterrogation": first
-        }
+        seed = None
+        if first:
+            self.endpoint = None
+            seed = new_seed()
+            self.show_local_case(seed)
+        payload = build_opening_payload(self.name, self.role, self.difficulty,
+                                        self.transcript.messages(),
+                                        player_answer=player_answer, first=first,
+                                        scenario_seed=seed)
+
+        logging.debug("Sending payload: %s", Redacted(payload))
 
-        logging.debug(f"Sending payload: {payload}")
+        self.send_request(payload,
+                          on_success=lambda response: self.on_interrogation_started(response, first),
+                          on_error=self.on_interrogation_failed,
+                          first=first)
 
+    def on_interrogation_started(self, response, first):
+        import requests
+        logging.debug("Received status: %s", response.status_code)
+        logging.debug("Response text: %s", Redacted(response.text))
         try:
-            response = requests.post(MIDDLEWARE_URL, json=payload)
-            logging.debug(f"Received status: {response.status_code}")
-            logging.debug(f"Response text: {response.text}")
             response.raise_for_status()
-            data = response.json()
+            data = self.decode_response(response)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.on_interrogation_failed(e)
+            return
+        self.show_opening(data, first)
+
+    def show_opening(self, data, first):
+        if first:
+            self.scenario = data.get("scenario", {})
+            self.evidence = data.get("evidence", [])
+        self.session_token = data.get("sessionToken")
+        if first:
+            self.interrogator = LocalInterrogator(self.name, self.role, self.scenario, self.evidence)
+
+        self.current_question = data.get("response", "")
+        self.question_seq += 1
+        self.build_interrogation_screen()
+
+    def on_interrogation_failed(self, error):
+        logging.error("Interrogation setup failed.")
+        messagebox.showerror("Error", str(error), parent=self.master)
+
+    def send_request(self, payload, on_success, on_error, first=False, resync=None):
+        """Post a payload on the network engine; callbacks run on the Tk main thread.
+
+        `resync` is the full-transcript form of an incremental payload, sent
+        instead if the session's endpoint is down or a hedge goes elsewhere.
+        """
+        if self.rekey_request is not None:
+            # The server must move the prefetched session before it sees an answer
+            self.deferred_request = (payload, on_success, on_error, first, resync)
+            return
+        self.request_seq += 1
+        request_seq = self.request_seq
+        if self.pending_request is not None:
+            self.pending_request.cancel()
+            metrics.incr("requests.superseded")
+        self.streamed_text = ""
+        self.stream_verdict = None
+
+        def deliver(callback, final=True):
+            def handler(value):
+                if request_seq != self.request_seq:
+                    # A newer request replaced this one after its result was queued
+                    metrics.incr("requests.stale_dropped")
+                    return
+                if final:
+                    self.pending_request = None
+                if self.interrogation_over:
+                    metrics.incr("requests.dropped_after_end")
+                    return
+                callback(value)
+            return handler
+
+        if STREAM_RESPONSES:
+            func = self.client.interrogate_stream
+            on_chunk = deliver(lambda chunk: self.on_stream_chunk(chunk, first), final=False)
+        else:
+            func = self.client.interrogate
+            on_chunk = None
+
+        self.pending_request = self.network.submit(
+            func, payload,
+            on_success=deliver(on_success),
+            on_error=deliver(on_error),
+            on_progress=self.on_request_progress,
+            on_chunk=on_chunk,
+            home=self.endpoint,
+            resync=resync
+        )
+
+    def on_request_progress(self, elapsed):
+        if self.stream_verdict is not None:
+            return  # the detective's words are already on screen
+        label = getattr(self, 'question_label', None)
+        if label is not None and label.winfo_exists():
+            label.config(text=f"🔄 Getting AI response... ({int(elapsed)}s)")
+
+    def on_stream_chunk(self, chunk, first):
+        kind, value = chunk
+        if kind == "reset":
+            # The stream broke off and another endpoint is answering from the start
+            self.streamed_text = ""
+            self.stream_verdict = None
+            return
+        if kind == "meta":
+            # Case file arrives before the first word; show it straight away
+            if first and value.get("scenario"):
+                self.scenario = value.get("scenario", {})
+                self.evidence = value.get("evidence", [])
+                self.current_question = ""
+                self.build_interrogation_screen()
+            return
 
-            if first:
-                self.scenario = data.get("scenario", {})
-                self.evidence = data.get("evidence", [])
+        self.streamed_text += value
+        self.cancel_fallback_countdown()  # the model is answering
+        if self.stream_verdict is None:
+            # Decide on the catch phrase as soon as the opening words allow it
+            opening = self.streamed_text.lower().lstrip()
+            if opening.startswith(CAUGHT_PHRASE):
+                self.stream_verdict = "caught"
+            elif not CAUGHT_PHRASE.startswith(opening):
+                self.stream_verdict = "clear"
+            else:
+                return
 
-            self.current_question = data.get("response", "")
-            self.context.append(self.current_question)
-            self.build_interrogation_screen()
+        if self.stream_verdict == "caught":
+            logging.debug("AI caught player mid-stream: I caught you in a lie because...")
+            self.end_interrogation(ai_caught=True)
+            return
 
-        except requests.exceptions.RequestException as e:
-            logging.error("Interrogation setup failed.")
-            messagebox.showerror("Error", str(e))
+        label = getattr(self, 'question_label', None)
+        if label is not None and label.winfo_exists():
+            label.config(text=self.streamed_text, fg=self.colors['text_light'])
 
+    @metrics.timed("ui.build_interrogation_screen")
     def build_interrogation_screen(self):
+        """Show the current turn, building the widgets only once per game"""
+        if self.interrogation_screen_built():
+            self.update_interrogation_screen()
+            return
+
         self.clear_frame()
+        self.rendered = {}
         
         # Main container with responsive grid
         main_frame = self.create_gradient_frame(self.master)
@@ -272,44 +615,47 @@ class AlibiGame:
         content_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
         content_frame.grid_rowconfigure(2, weight=1)
         content_frame.grid_columnconfigure(0, weight=1)
+        content_frame.grid_columnconfigure(1, weight=1, minsize=320)
+
+        # Past turns, appended one at a time as the game goes on
+        self.transcript_view = TranscriptView(content_frame, self.colors, relief="flat", bd=1)
+        self.transcript_view.grid(row=0, column=1, rowspan=3, sticky="nsew", padx=(10, 0), pady=(0, 10))
         
-        # Scenario and evidence section
-        if self.scenario:
-            info_frame = tk.Frame(content_frame, bg=self.colors['bg_light'], relief="flat", bd=1)
-            info_frame.grid(row=0, column=0, sticky="ew", pady=(0, 10))
-            info_frame.grid_columnconfigure(0, weight=1)
-            
-            # Scenario details
-            scenario_text = "📂 CASE DETAILS"
-            scenario_label = tk.Label(info_frame, text=scenario_text, 
-                                     font=("Segoe UI", 12, "bold"), 
-                                     bg=self.colors['bg_light'], 
-                                     fg=self.colors['accent'])
-            scenario_label.grid(row=0, column=0, sticky="w", padx=10, pady=5)
-            
-            details_text = "\n".join([f"   • {k.capitalize()}: {v}" for k, v in self.scenario.items()])
-            details_label = tk.Label(info_frame, text=details_text, 
-                                    font=("Segoe UI", 10), 
-                                    bg=self.colors['bg_light'], 
-                                    fg=self.colors['text_light'],
-                                    justify="left")
-            details_label.grid(row=1, column=0, sticky="w", padx=20, pady=5)
-            
-            # Evidence
-            evidence_text = "🧾 EVIDENCE AGAINST YOU"
-            evidence_title = tk.Label(info_frame, text=evidence_text, 
-                                     font=("Segoe UI", 12, "bold"), 
-                                     bg=self.colors['bg_light'], 
-                                     fg=self.colors['danger'])
-            evidence_title.grid(row=2, column=0, sticky="w", padx=10, pady=(15, 5))
-            
-            evidence_list = "\n".join([f"   • {e}" for e in self.evidence])
-            evidence_label = tk.Label(info_frame, text=evidence_list, 
+        # Scenario and evidence section (hidden until the case file is known)
+        self.info_frame = tk.Frame(content_frame, bg=self.colors['bg_light'], relief="flat", bd=1)
+        self.info_frame.grid(row=0, column=0, sticky="ew", pady=(0, 10))
+        self.info_frame.grid_columnconfigure(0, weight=1)
+        self.info_frame.grid_remove()
+        
+        # Scenario details
+        scenario_text = "📂 CASE DETAILS"
+        scenario_label = tk.Label(self.info_frame, text=scenario_text, 
+                                 font=("Segoe UI", 12, "bold"), 
+                                 bg=self.colors['bg_light'], 
+                                 fg=self.colors['accent'])
+        scenario_label.grid(row=0, column=0, sticky="w", padx=10, pady=5)
+        
+        self.details_label = tk.Label(self.info_frame, text="", 
                                      font=("Segoe UI", 10), 
                                      bg=self.colors['bg_light'], 
-                                     fg=self.colors['text_gray'],
+                                     fg=self.colors['text_light'],
                                      justify="left")
-            evidence_label.grid(row=3, column=0, sticky="w", padx=20, pady=5)
+        self.details_label.grid(row=1, column=0, sticky="w", padx=20, pady=5)
+        
+        # Evidence
+        evidence_text = "🧾 EVIDENCE AGAINST YOU"
+        evidence_title = tk.Label(self.info_frame, text=evidence_text, 
+                                 font=("Segoe UI", 12, "bold"), 
+                                 bg=self.colors['bg_light'], 
+                                 fg=self.colors['danger'])
+        evidence_title.grid(row=2, column=0, sticky="w", padx=10, pady=(15, 5))
+        
+        self.evidence_label = tk.Label(self.info_frame, text="", 
+                                      font=("Segoe UI", 10), 
+                                      bg=self.colors['bg_light'], 
+                                      fg=self.colors['text_gray'],
+                                      justify="left")
+        self.evidence_label.grid(row=3, column=0, sticky="w", padx=20, pady=5)
         
         # Question section
         question_frame = tk.Frame(content_frame, bg=self.colors['bg_light'], relief="flat", bd=1)
@@ -376,83 +722,115 @@ class AlibiGame:
                                  font=("Segoe UI", 12, "bold"),
                                  width=20, height=2)
         submit_btn.grid(row=3, column=0, pady=15)
+
+        self.update_interrogation_screen()
+
+    def interrogation_screen_built(self):
+        label = getattr(self, 'question_label', None)
+        return label is not None and label.winfo_exists()
+
+    def update_interrogation_screen(self):
+        """Push the current turn into the existing widgets, touching only what changed"""
+        if self.scenario:
+            details_text = "\n".join([f"   • {k.capitalize()}: {v}" for k, v in self.scenario.items()])
+            evidence_list = "\n".join([f"   • {e}" for e in self.evidence])
+            self.update_widget('details', self.details_label, text=details_text)
+            self.update_widget('evidence', self.evidence_label, text=evidence_list)
+            if 'info_frame' not in self.rendered:
+                self.info_frame.grid()
+                self.rendered['info_frame'] = True
+
+        # The question label is also written by loading/streaming updates, so always set it
+        self.question_label.config(text=self.current_question, fg=self.colors['text_light'])
         
         # Only show waiting message for first question
         if self.is_first_question:
             self.response_timer_label.config(text="⚡ Response: Waiting for first answer...", fg=self.colors['text_gray'])
 
+        self.answer_entry.focus_set()
+
+    def update_widget(self, key, widget, **options):
+        if self.rendered.get(key) != options:
+            widget.config(**options)
+            self.rendered[key] = options
+
     def start_response_timer(self):
-        # Cancel any existing timer
-        if hasattr(self, '_response_timer_id'):
-            self.master.after_cancel(self._response_timer_id)
-        
-        if self.response_timer_running:
-            return
-            
+        # Replace any running response countdown with a fresh one
+        if self.response_countdown is not None:
+            self.response_countdown.cancel()
         self.response_timer_running = True
         self.response_time_left = 120  # 2 minutes per answer
-        
-        def update_response_timer():
-            if self.interrogation_over or not self.response_timer_running:
-                return
-                
-            if self.response_time_left > 0:
-                color = self.colors['success'] if self.response_time_left > 30 else self.colors['warning'] if self.response_time_left > 10 else self.colors['danger']
-                self.response_timer_label.config(text=f"⚡ Response: {self.response_time_left}s", fg=color)
-                self.response_time_left -= 1
-                self._response_timer_id = self.master.after(1000, update_response_timer)
-            else:
-                self.response_timer_running = False
-                self.submit_answer(auto_submit=True)
-        
-        update_response_timer()
+        self.response_countdown = self.timers.countdown(
+            self.response_time_left,
+            on_change=self.show_response_time,
+            on_expire=self.on_response_time_up
+        )
+
+    def stop_response_timer(self):
+        self.response_timer_running = False
+        if self.response_countdown is not None:
+            self.response_countdown.cancel()
+            self.response_countdown = None
+
+    def show_response_time(self, seconds):
+        self.response_time_left = seconds
+        color = self.colors['success'] if seconds > 30 else self.colors['warning'] if seconds > 10 else self.colors['danger']
+        self.response_timer_label.config(text=f"⚡ Response: {seconds}s", fg=color)
+
+    def on_response_time_up(self):
+        self.response_timer_running = False
+        self.response_countdown = None
+        self.submit_answer(auto_submit=True)
 
     def start_total_timer(self):
-        # Cancel any existing timer
-        if hasattr(self, '_total_timer_id'):
-            self.master.after_cancel(self._total_timer_id)
-            
         if self.timer_running:
             return
             
         self.timer_running = True
-        
-        def update_total_timer():
-            if self.interrogation_over or not self.timer_running:
-                return
-                
-            if self.total_time_left > 0:
-                minutes = self.total_time_left // 60
-                seconds = self.total_time_left % 60
-                color = self.colors['success'] if self.total_time_left > 300 else self.colors['warning'] if self.total_time_left > 60 else self.colors['danger']
-                self.total_timer_label.config(text=f"⏰ Total: {minutes:02d}:{seconds:02d}", fg=color)
-                self.total_time_left -= 1
-                self._total_timer_id = self.master.after(1000, update_total_timer)
-            else:
-                self.timer_running = False
-                self.end_interrogation(player_won=True)
-        
-        update_total_timer()
+        self.total_countdown = self.timers.countdown(
+            self.total_time_left,
+            on_change=self.show_total_time,
+            on_expire=self.on_total_time_up
+        )
+
+    def show_total_time(self, seconds):
+        self.total_time_left = seconds
+        minutes = seconds // 60
+        color = self.colors['success'] if seconds > 300 else self.colors['warning'] if seconds > 60 else self.colors['danger']
+        self.total_timer_label.config(text=f"⏰ Total: {minutes:02d}:{seconds % 60:02d}", fg=color)
+
+    def on_total_time_up(self):
+        self.timer_running = False
+        self.total_countdown = None
+        self.end_interrogation(player_won=True)
 
     def submit_answer(self, auto_submit=False):
+        if self.answered_seq == self.question_seq:
+            # Enter, the button and the response timer can all fire for one question
+            logging.debug("Ignoring repeat submission for question %d", self.question_seq)
+            metrics.incr("answers.coalesced")
+            return
+        self.answered_seq = self.question_seq
+        if self.profiler is not None:
+            self.profiler.begin_turn()
+
         answer = self.answer_entry.get() if not auto_submit else "[No Answer Submitted]"
+        if not auto_submit:
+            self.record("answer", text=answer)
         
         # Clear the input field
         self.answer_entry.delete(0, tk.END)
         
         # Stop response timer
-        self.response_timer_running = False
+        self.stop_response_timer()
         
         # Add to conversation history in the correct format
+        turn = None
         if not auto_submit:  # Only add if it's a real answer, not auto-submit
-            self.conversationHistory.append({
-                "role": "detective",
-                "content": self.current_question
-            })
-            self.conversationHistory.append({
-                "role": "player", 
-                "content": answer
-            })
+            turn = self.transcript.add(self.current_question, answer)
+            metrics.incr("game.turns")
+            metrics.observe("game.transcript_tokens", self.transcript.tokens, unit="tokens")
+        self.transcript_view.append(self.current_question, answer if turn is not None else None)
 
         # Mark that we're no longer on the first question
         self.is_first_question = False
@@ -460,76 +838,179 @@ class AlibiGame:
         # Show loading message
         self.question_label.config(text="🔄 Getting AI response...", fg=self.colors['warning'])
 
-        # Get AI response
+        # Get AI response; only the new turn is sent once the server holds the transcript
+        self.last_answer = answer
+        if self.interrogator is not None and self.interrogator.observe(answer if turn else ""):
+            metrics.incr("consistency.contradictions")
+
+        full = self.session_token is None
+        payload = self.build_answer_payload(answer, turn, full=full)
+        resync = None
+        if not full and len(MIDDLEWARE_URLS) > 1:
+            resync = self.build_answer_payload(answer, None, full=True)
+        logging.debug("Sending payload: %s", Redacted(payload))
+        self.send_request(payload, on_success=self.on_answer_response, on_error=self.on_answer_failed,
+                          resync=resync)
+        self.start_fallback_countdown()
+
+    def build_answer_payload(self, answer, turn, full):
+        history = self.transcript.messages() if full else ()
+        return build_answer_payload(self.name, self.role, self.difficulty, answer, history, (),
+                                    session_token=self.session_token, turn=turn, full=full,
+                                    seq=self.transcript.seq)
+
+    def on_answer_response(self, response):
         try:
-            payload = {
-                "playerName": self.name,
-                "role": self.role,
-                "difficulty": self.difficulty,
-                "conversationHistory": self.conversationHistory,
-                "context": self.context,
-                "playerResponse": answer,
-                "startInterrogation": False
-            }
-            logging.debug(f"Sending payload: {payload}")
-            response = requests.post(MIDDLEWARE_URL, json=payload, timeout=30)
-            
-            logging.debug(f"Response status: {response.status_code}")
+            logging.debug("Response status: %s", response.status_code)
             
+            if response.status_code == 409:
+                # Server transcript doesn't match ours; resend it in full once
+                logging.info("Transcript out of sync, resending full history...")
+                payload = self.build_answer_payload(self.last_answer, None, full=True)
+                self.send_request(payload, on_success=self.on_answer_response, on_error=self.on_answer_failed)
+                return
+
+            self.cancel_fallback_countdown()
             if response.status_code == 200:
-                data = response.json()
+                data = self.decode_response(response)
+                self.session_token = data.get("sessionToken", self.session_token)
                 ai_response = data.get("response", "")
-                logging.debug(f"AI response: {ai_response}")
+                logging.debug("AI response: %s", Redacted(ai_response))
                 
                 # Check if AI has caught the player in a lie
-                ai_response_lower = ai_response.lower().strip()
-                if ai_response_lower.startswith("i caught you in a lie because"):
+                if is_caught(ai_response):
                     logging.debug("AI caught player with explicit phrase: I caught you in a lie because...")
                     self.end_interrogation(ai_caught=True)
                     return
                 
                 # If not caught, continue with normal flow
-                self.current_question = ai_response
-                self.context.append(self.current_question)
-                self.build_interrogation_screen()
-                
-                # Start timers for the next question
-                if not self.timer_running:
-                    self.start_total_timer()
-                self.start_response_timer()  # Always restart response timer for new question
+                if self.degraded:
+                    logging.info("Middleware answering again; the model is back in charge")
+                    metrics.incr("fallback.recovered")
+                    self.degraded = False
+                self.show_question(ai_response)
             else:
-                logging.error(f"HTTP error: {response.status_code}")
+                logging.error("HTTP error: %s", response.status_code)
+                self.answered_seq = None  # let the player send an answer again
+                if response.status_code in FALLBACK_STATUSES and self.fallback_ready():
+                    self.ask_locally("http_error")
+                    return
                 try:
                     error_data = response.json()
                     error_message = error_data.get('error', 'Unknown error')
-                    logging.error(f"Error details: {error_data}")
+                    logging.error("Error details: %s", Redacted(error_data))
                     
                     # If session not found, try to restart
                     if "Session not found" in error_message:
                         logging.info("Session lost, restarting interrogation...")
-                        self.conversationHistory = []
-                        self.context = []
+                        self.reset_transcript()
+                        self.session_token = None
                         self.start_interrogation(first=True)
                         return
                     else:
-                        messagebox.showerror("Error", f"Failed to get AI response: {error_message}")
+                        messagebox.showerror("Error", f"Failed to get AI response: {error_message}",
+                                             parent=self.master)
                 except:
-                    messagebox.showerror("Error", f"Failed to get AI response (HTTP {response.status_code})")
+                    messagebox.showerror("Error", f"Failed to get AI response (HTTP {response.status_code})",
+                                         parent=self.master)
                 
-        except requests.exceptions.Timeout:
-            logging.error("Request timeout")
-            messagebox.showerror("Error", "Request timed out. Please try again.")
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Request failed: {e}")
-            messagebox.showerror("Error", f"Failed to get AI response: {str(e)}")
         except Exception as e:
-            logging.error(f"Unexpected error: {e}")
-            messagebox.showerror("Error", f"Unexpected error: {str(e)}")
+            logging.error("Unexpected error: %s", e)
+            messagebox.showerror("Error", f"Unexpected error: {str(e)}", parent=self.master)
+
+    def show_question(self, question):
+        self.current_question = question
+        self.question_seq += 1
+        self.build_interrogation_screen()
+
+        # Start timers for the next question
+        if not self.timer_running:
+            self.start_total_timer()
+        self.start_response_timer()  # Always restart response timer for new question
+        if self.profiler is not None:
+            self.profiler.end_turn(turns=len(self.transcript), tokens=self.transcript.tokens,
+                                   local=self.degraded)
+
+    def fallback_ready(self):
+        return FALLBACK_BUDGET > 0 and self.interrogator is not None and not self.interrogation_over
+
+    def start_fallback_countdown(self):
+        """Give the model FALLBACK_BUDGET seconds to start answering before asking locally"""
+        self.cancel_fallback_countdown()
+        if self.fallback_ready():
+            self.fallback_countdown = self.timers.countdown(FALLBACK_BUDGET, on_expire=self.on_fallback_due)
+
+    def cancel_fallback_countdown(self):
+        if self.fallback_countdown is not None:
+            self.fallback_countdown.cancel()
+            self.fallback_countdown = None
+
+    def on_fallback_due(self):
+        self.fallback_countdown = None
+        if self.streamed_text or not self.fallback_ready():
+            return
+        self.ask_locally("budget")
+
+    def ask_locally(self, reason):
+        """Ask the next question from the local detective; the model gets the turn after again.
+
+        The abandoned request is dropped. If the server never saw the turn,
+        the next answer gets a 409 and the full transcript, local questions
+        included, is resent.
+        """
+        self.cancel_fallback_countdown()
+        if self.pending_request is not None:
+            self.pending_request.cancel()
+            self.pending_request = None
+        self.deferred_request = None
+        self.request_seq += 1  # anything already queued for the old request is stale
+        self.degraded = True
+        metrics.incr("fallback.fired")
+        metrics.incr(f"fallback.{reason}")
+        logging.info("No answer from the middleware (%s); asking the next question locally", reason)
+        self.show_question(self.interrogator.question())
+
+    def decode_response(self, response):
+        from alibi_net import StreamedResponse
+        # Whichever instance answered now holds the session
+        self.endpoint = getattr(response, "endpoint", self.endpoint)
+        # Streamed replies were already decoded (and timed) on the worker thread
+        if isinstance(response, StreamedResponse):
+            return response.json()
+        with metrics.span("http.json_decode"):
+            return response.json()
+
+    def on_answer_failed(self, error):
+        import requests
+        self.answered_seq = None  # let the player send an answer again
+        if isinstance(error, requests.exceptions.RequestException) and self.fallback_ready():
+            logging.warning("Request failed: %s", error)
+            self.ask_locally("timeout" if isinstance(error, requests.exceptions.Timeout) else "error")
+            return
+        if isinstance(error, requests.exceptions.Timeout):
+            logging.error("Request timeout")
+            messagebox.showerror("Error", "Request timed out. Please try again.", parent=self.master)
+        elif isinstance(error, requests.exceptions.RequestException):
+            logging.error("Request failed: %s", error)
+            messagebox.showerror("Error", f"Failed to get AI response: {str(error)}", parent=self.master)
+        else:
+            logging.error("Unexpected error: %s", error)
+            messagebox.showerror("Error", f"Unexpected error: {str(error)}", parent=self.master)
 
     def end_interrogation(self, player_won=False, ai_caught=False):
+        self.record("end", won=player_won, caught=ai_caught)
         self.interrogation_over = True
+        self.network.cancel_all()
+        self.pending_request = None
+        self.timers.cancel_all()
         self.timer_running = False
         self.response_timer_running = False
+        self.response_countdown = None
+        self.total_countdown = None
+        metrics.incr("game.sessions")
+        metrics.observe("game.turns_per_session", len(self.transcript), unit="turns")
+        self.dump_metrics()
+        alibi_log.flush_trace()
         
         self.clear_frame()
         
@@ -583,19 +1064,33 @@ class AlibiGame:
         play_again_btn.pack(side="left", padx=10)
         
         exit_btn = ModernButton(button_frame, text="🚪 EXIT", 
-                               command=self.master.destroy,
+                               command=self.on_close,
                                bg=self.colors['bg_light'], fg=self.colors['text_light'],
                                font=("Segoe UI", 12, "bold"))
         exit_btn.pack(side="left", padx=10)
+        if self.profiler is not None:
+            self.profiler.end_turn(turns=len(self.transcript), tokens=self.transcript.tokens,
+                                   outcome="caught" if ai_caught else "survived" if player_won else "timeout")
 
     def restart_game(self):
+        self.record("restart")
+        self.network.cancel_all()
+        self.pending_request = None
+        self.discard_prefetch()
+        self.rekey_request = None
+        self.deferred_request = None
+        self.timers.cancel_all()
         self.name = ""
-        self.difficulty = "Normal"
+        self.difficulty = "Medium"
         self.role = random.choice(VALID_ROLES)
         self.scenario = {}
         self.evidence = []
-        self.conversationHistory = []
-        self.context = []
+        self.transcript.clear()
+        self.session_token = None
+        self.endpoint = None
+        self.interrogator = None
+        self.fallback_countdown = None
+        self.degraded = False
         self.current_question = ""
         self.response_time_left = 120  # 2 minutes per answer
         self.total_time_left = 20 * 60  # 20 minutes to survive
@@ -604,12 +1099,56 @@ class AlibiGame:
         self.is_first_question = True
         self.timer_running = False
         self.response_timer_running = False
+        self.response_countdown = None
+        self.total_countdown = None
         self.build_intro_screen()
 
+    def dump_metrics(self):
+        try:
+            path = metrics.dump(METRICS_PATH)
+            logging.info("Metrics written to %s", path)
+        except OSError as e:
+            logging.error("Could not write metrics: %s", e)
+
+    def on_close(self):
+        self.record("close")
+        self.timers.cancel_all()
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.seat is not None:
+            # The engine, client and log belong to the kiosk host; give back only this seat's share
+            self.seat.release()
+        else:
+            if self._network is not None:
+                self.network.shutdown()
+            if self._client is not None:
+                self.client.close()
+        self.master.destroy()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.seat is None:
+            alibi_log.shutdown()
+
     def clear_frame(self):
         for widget in self.master.winfo_children():
             widget.destroy()
 
-root = tk.Tk()
-game = AlibiGame(root)
-root.mainloop() 
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alibi interrogation game")
+    alibi_log.add_arguments(parser)
+    parser.add_argument("--record", metavar="PATH", default=os.environ.get("ALIBI_RECORD"),
+                        help="append this session's requests, responses and answers to PATH for "
+                             "alibi_replay.py")
+    args = parser.parse_args(argv)
+    alibi_log.configure(level=args.log_level, trace_level=args.trace_level, trace_path=args.trace_file)
+    recorder = None
+    if args.record:
+        from alibi_replay import Recorder
+        recorder = Recorder(args.record)
+    root = tk.Tk()
+    AlibiGame(root, recorder=recorder)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main() 
\ No newline at end of file
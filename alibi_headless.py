@@ -0,0 +1,304 @@
+"""A display-free stand-in for the parts of tkinter the desktop client uses.
+
+`install()` registers this module's widgets as `tkinter` and
+`tkinter.messagebox` before alibi_game is imported. The whole client, with
+its widgets, timers and network callbacks, can then run without a display.
+Every `after` callback goes through an EventLoop with a virtual clock.
+`run()` jumps straight to the next due callback, so a 20-minute
+interrogation finishes in well under a second. With `speed` set, the loop
+sleeps instead, to run at that multiple of real time.
+
+Widgets keep their options (`cget("text")` works) but draw nothing.
+Geometry, focus and binding calls are accepted and ignored.
+"""
+import heapq
+import itertools
+import logging
+import sys
+import time
+import types
+
+END = "end"
+INSERT = "insert"
+N, S, E, W = "n", "s", "e", "w"
+NSEW = "nsew"
+LEFT, RIGHT, TOP, BOTTOM = "left", "right", "top", "bottom"
+BOTH, X, Y = "both", "x", "y"
+HORIZONTAL, VERTICAL = "horizontal", "vertical"
+NORMAL, DISABLED = "normal", "disabled"
+
+
+def _ignore(*args, **kwargs):
+    return None
+
+
+class EventLoop:
+    """`after` queue ordered by virtual due time; ties run in scheduling order"""
+
+    def __init__(self, speed=None):
+        self.now = 0.0
+        self.speed = speed
+        self.processed = 0
+        self.errors = []
+        self._queue = []
+        self._order = itertools.count()
+        self._cancelled = set()
+
+    def clock(self):
+        return self.now
+
+    def after(self, ms, func=None, *args):
+        order = next(self._order)
+        after_id = f"after#{order}"
+        heapq.heappush(self._queue, (self.now + max(0, ms) / 1000.0, order, after_id, func, args))
+        return after_id
+
+    def after_cancel(self, after_id):
+        self._cancelled.add(after_id)
+
+    def pending(self):
+        return sum(1 for entry in self._queue if entry[2] not in self._cancelled)
+
+    def run(self, until=None):
+        """Run callbacks in due order until none are left (or the next is past `until`)"""
+        wall_start, virtual_start = time.monotonic(), self.now
+        while self._queue:
+            due, _, after_id, func, args = self._queue[0]
+            if until is not None and due > until:
+                self.now = until
+                break
+            heapq.heappop(self._queue)
+            if after_id in self._cancelled:
+                self._cancelled.discard(after_id)
+                continue
+            if self.speed:
+                delay = wall_start + (due - virtual_start) / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self.now = max(self.now, due)
+            self.processed += 1
+            if func is None:
+                continue
+            try:
+                func(*args)
+            except Exception as e:
+                # Tk reports callback errors and keeps going; so do we, but keep them for the report
+                logging.exception("Headless callback failed")
+                self.errors.append(f"{type(e).__name__}: {e}")
+        return self.now
+
+
+class Misc:
+    """Base widget: remembers options and children, ignores everything visual"""
+
+    def __init__(self, master=None, cnf=None, **kwargs):
+        self.master = master
+        self.loop = master.loop if master is not None else EventLoop()
+        self.children_list = []
+        self.options = dict(cnf or {}, **kwargs)
+        self.destroyed = False
+        if master is not None:
+            master.children_list.append(self)
+
+    def __getattr__(self, name):
+        # grid, pack, bind, focus_set, title, geometry, transient, tag_configure, ...
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _ignore
+
+    def configure(self, cnf=None, **kwargs):
+        self.options.update(cnf or {}, **kwargs)
+
+    config = configure
+
+    def cget(self, key):
+        return self.options.get(key)
+
+    __getitem__ = cget
+
+    def __setitem__(self, key, value):
+        self.options[key] = value
+
+    def after(self, ms, func=None, *args):
+        return self.loop.after(ms, func, *args)
+
+    def after_cancel(self, after_id):
+        self.loop.after_cancel(after_id)
+
+    def destroy(self):
+        for child in list(self.children_list):
+            child.destroy()
+        self.destroyed = True
+        if self.master is not None and self in self.master.children_list:
+            self.master.children_list.remove(self)
+
+    def winfo_exists(self):
+        return not self.destroyed
+
+    def winfo_children(self):
+        return list(self.children_list)
+
+    def winfo_screenwidth(self):
+        return 1920
+
+    def winfo_screenheight(self):
+        return 1080
+
+    def winfo_rootx(self):
+        return 0
+
+    def winfo_rooty(self):
+        return 0
+
+
+class Tk(Misc):
+    def __init__(self, loop=None, speed=None):
+        super().__init__()
+        self.loop = loop or EventLoop(speed)
+
+    def mainloop(self, n=0):
+        self.loop.run()
+
+
+class Toplevel(Misc):
+    pass
+
+
+class Frame(Misc):
+    pass
+
+
+class Label(Misc):
+    pass
+
+
+class Scrollbar(Misc):
+    pass
+
+
+class Canvas(Misc):
+    pass
+
+
+class Button(Misc):
+    def invoke(self):
+        command = self.options.get("command")
+        return command() if command else None
+
+
+class Radiobutton(Button):
+    pass
+
+
+class Checkbutton(Button):
+    pass
+
+
+class Entry(Misc):
+    def __init__(self, master=None, cnf=None, **kwargs):
+        super().__init__(master, cnf, **kwargs)
+        self.value = ""
+
+    def get(self):
+        return self.value
+
+    def insert(self, index, text):
+        index = len(self.value) if index in (END, INSERT) else int(index)
+        self.value = self.value[:index] + text + self.value[index:]
+
+    def delete(self, first, last=None):
+        first = int(first)
+        last = first + 1 if last is None else (len(self.value) if last == END else int(last))
+        self.value = self.value[:first] + self.value[last:]
+
+
+class Text(Misc):
+    """Keeps the text (always appended at the end); indexes and tags are not modelled"""
+
+    def __init__(self, master=None, cnf=None, **kwargs):
+        super().__init__(master, cnf, **kwargs)
+        self.value = ""
+
+    def insert(self, index, chars, *args):
+        self.value += chars + "".join(args[1::2])
+
+    def delete(self, first, last=None):
+        self.value = ""
+
+    def get(self, first="1.0", last=END):
+        return self.value
+
+    def index(self, index):
+        return "1.0"
+
+    def yview(self, *args):
+        return (0.0, 1.0)
+
+    def tag_ranges(self, tag):
+        return ()
+
+    def search(self, pattern, index, stopindex=None, **kwargs):
+        return ""
+
+
+class Variable:
+    _default = ""
+
+    def __init__(self, master=None, value=None, name=None):
+        self.value = self._default if value is None else value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+    def trace_add(self, mode, callback):
+        return ""
+
+
+class StringVar(Variable):
+    pass
+
+
+class IntVar(Variable):
+    _default = 0
+
+
+class BooleanVar(Variable):
+    _default = False
+
+
+class TclError(Exception):
+    pass
+
+
+dialogs = []  # (kind, title, message) for every messagebox call
+
+
+def _dialog(kind, answer=None):
+    def show(title=None, message=None, **options):
+        dialogs.append((kind, title, message))
+        return answer
+    return show
+
+
+def install():
+    """Make `import tkinter` (and tkinter.messagebox) resolve to this module; call before alibi_game.
+
+    Calling it again once installed does nothing.
+    """
+    module = sys.modules[__name__]
+    if sys.modules.get("tkinter") is module:
+        return module
+    if "alibi_game" in sys.modules:
+        raise RuntimeError("install() must run before alibi_game is imported")
+    messagebox = types.ModuleType("tkinter.messagebox")
+    for kind in ("showerror", "showinfo", "showwarning"):
+        setattr(messagebox, kind, _dialog(kind, "ok"))
+    for kind in ("askyesno", "askokcancel", "askretrycancel"):
+        setattr(messagebox, kind, _dialog(kind, False))
+    module.messagebox = messagebox
+    sys.modules["tkinter"] = module
+    sys.modules["tkinter.messagebox"] = messagebox
+    return module
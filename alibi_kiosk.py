@@ -0,0 +1,140 @@
+"""Kiosk host: a table of players in one process, one game window each.
+
+Every seat is an AlibiGame in its own Toplevel. The seats share:
+
+- one EndpointPool, so every seat reuses the same keep-alive connections
+  and health probes;
+- one SharedNetworkEngine, whose worker pool queues requests per seat and
+  serves the least busy seat first, with a single result poll;
+- one TimerScheduler tick for every seat's countdowns.
+
+A seat that closes gives back only its own requests and countdowns. The
+host window adds seats and closes the whole table. See
+benchmarks/bench_kiosk.py for the memory each extra seat costs.
+
+Usage:
+    python alibi_kiosk.py --seats 4
+"""
+import argparse
+import logging
+import math
+import os
+import time
+import tkinter as tk
+
+import alibi_log
+from alibi_clock import TimerScheduler
+from alibi_endpoints import EndpointPool
+from alibi_game import (CONNECT_TIMEOUT, HEDGE_DELAY, HEDGE_REQUESTS, MIDDLEWARE_URLS, PROBE_INTERVAL,
+                        READ_TIMEOUT, AlibiGame, ModernButton)
+from alibi_net import SharedNetworkEngine
+
+PER_SEAT = 2  # requests one seat may have on workers at once; the rest wait their turn
+WORKERS_PER_SEAT = 2  # default pool size is this times the starting seat count
+
+
+class Seat:
+    """What one AlibiGame borrows from the host: an engine seat, the client and a timer group"""
+
+    def __init__(self, host, index, window):
+        self.host = host
+        self.index = index
+        self.window = window
+        self.network = host.engine.seat()
+        self.client = host.client
+        self.timers = host.timers.group()
+        self.game = None
+
+    def release(self):
+        self.network.shutdown()
+        self.timers.cancel_all()
+        self.host.seat_closed(self)
+
+
+class KioskHost:
+    def __init__(self, root, seats=4, workers=None, per_seat=PER_SEAT, record_dir=None, clock=time.monotonic):
+        self.root = root
+        self.table_size = max(1, seats)
+        self.record_dir = record_dir
+        self.seats = []
+        self.opened = 0
+        workers = workers or WORKERS_PER_SEAT * self.table_size
+        self.engine = SharedNetworkEngine(root, max_workers=workers, per_seat=per_seat)
+        self.client = EndpointPool(MIDDLEWARE_URLS, hedge=HEDGE_REQUESTS, hedge_delay=HEDGE_DELAY,
+                                   probe_interval=PROBE_INTERVAL, connect_timeout=CONNECT_TIMEOUT,
+                                   read_timeout=READ_TIMEOUT, pool_size=workers, concurrent_calls=workers)
+        self.timers = TimerScheduler(root, clock=clock)
+
+        root.title("🎮 ALIBI Kiosk")
+        root.configure(bg="#1a1a2e", padx=20, pady=20)
+        root.protocol("WM_DELETE_WINDOW", self.close)
+        self.status = tk.Label(root, text="", font=("Segoe UI", 12), bg="#1a1a2e", fg="#ffffff")
+        self.status.pack(pady=10)
+        ModernButton(root, text="➕ ADD PLAYER", command=self.add_seat, bg="#e94560", fg="#ffffff",
+                     font=("Segoe UI", 12, "bold"), width=20).pack(pady=5)
+        ModernButton(root, text="🚪 CLOSE TABLE", command=self.close, bg="#0f3460", fg="#ffffff",
+                     font=("Segoe UI", 12, "bold"), width=20).pack(pady=5)
+
+        for _ in range(seats):
+            self.add_seat()
+
+    def add_seat(self):
+        window = tk.Toplevel(self.root)
+        seat = Seat(self, self.opened, window)
+        self.opened += 1
+        recorder = None
+        if self.record_dir:
+            from alibi_replay import Recorder
+            recorder = Recorder(os.path.join(self.record_dir, f"seat-{seat.index + 1}.jsonl"))
+        seat.game = AlibiGame(window, clock=self.timers.clock, recorder=recorder, seat=seat)
+        window.title(f"🎮 ALIBI: Player {seat.index + 1}")
+        self.place(seat)
+        self.seats.append(seat)
+        self.update_status()
+        return seat
+
+    def place(self, seat):
+        """Tile the seat windows across the screen, wrapping round once the table is full"""
+        columns = math.ceil(math.sqrt(self.table_size))
+        rows = math.ceil(self.table_size / columns)
+        width = self.root.winfo_screenwidth() // columns
+        height = self.root.winfo_screenheight() // rows
+        slot = seat.index % (columns * rows)
+        seat.window.geometry(f"{width}x{height}+{slot % columns * width}+{slot // columns * height}")
+
+    def seat_closed(self, seat):
+        if seat in self.seats:
+            self.seats.remove(seat)
+            logging.info("Player %d left the table", seat.index + 1)
+        self.update_status()
+
+    def update_status(self):
+        count = len(self.seats)
+        self.status.configure(text=f"{count} player{'s' if count != 1 else ''} at the table")
+
+    def close(self):
+        for seat in list(self.seats):
+            seat.game.on_close()
+        self.timers.cancel_all()
+        self.engine.shutdown()
+        self.client.close()
+        self.root.destroy()
+        alibi_log.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several Alibi games in one process")
+    alibi_log.add_arguments(parser)
+    parser.add_argument("--seats", type=int, default=4, help="game windows to open at start")
+    parser.add_argument("--workers", type=int, help=f"shared request workers (default: {WORKERS_PER_SEAT} per seat)")
+    parser.add_argument("--per-seat", type=int, default=PER_SEAT, help="requests one seat may run at once")
+    parser.add_argument("--record-dir", metavar="DIR", help="record each seat to DIR/seat-N.jsonl")
+    args = parser.parse_args(argv)
+    alibi_log.configure(level=args.log_level, trace_level=args.trace_level, trace_path=args.trace_file)
+    root = tk.Tk()
+    KioskHost(root, seats=args.seats, workers=args.workers, per_seat=args.per_seat, record_dir=args.record_dir)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Headless load generator: drives N simulated players through /interrogate.
+
+Each simulated player builds exactly the payloads AlibiGame sends (via
+alibi_protocol), opens an interrogation and then replays scripted answers
+for a fixed number of turns. Results are printed (or written) as JSON.
+
+Usage:
+    python alibi_loadgen.py --url http://localhost:3000 --players 200 --concurrency 50 --turns 5
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from alibi_net import MiddlewareClient
+from alibi_protocol import (DIFFICULTIES, VALID_ROLES, build_answer_payload,
+                            build_opening_payload, is_caught)
+from alibi_transcript import Transcript
+
+DEFAULT_ANSWERS = [
+    "I was at home all night watching a movie.",
+    "I already told you, I never left my apartment.",
+    "My neighbor can confirm my car never moved.",
+    "I don't know anything about a robbery.",
+    "I went to the store around eight, then straight home.",
+    "I want to speak to my lawyer.",
+]
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4) if ordered else None,
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1] if ordered else None,
+    }
+
+
+class LoadStats:
+    """Thread-safe per-turn latency and error accounting"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency_by_turn = {}
+        self.payload_bytes_by_turn = {}
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.resyncs = 0
+        self.caught = 0
+        self.completed_players = 0
+
+    def record(self, turn_index, latency, payload_bytes, status):
+        with self.lock:
+            self.requests += 1
+            self.latency_by_turn.setdefault(turn_index, []).append(round(latency, 4))
+            self.payload_bytes_by_turn.setdefault(turn_index, []).append(payload_bytes)
+            if status == 429:
+                self.rate_limited += 1
+            if status is None or status >= 400 and status != 409:
+                self.errors += 1
+
+    def bump(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def report(self, players, turns, duration):
+        with self.lock:
+            all_bytes = [b for sizes in self.payload_bytes_by_turn.values() for b in sizes]
+            return {
+                "players": players,
+                "turns_per_player": turns,
+                "completed_players": self.completed_players,
+                "requests": self.requests,
+                "duration_s": round(duration, 3),
+                "throughput_rps": round(self.requests / duration, 3) if duration else None,
+                "errors": self.errors,
+                "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+                "rate_limited": self.rate_limited,
+                "rate_limited_rate": round(self.rate_limited / self.requests, 4) if self.requests else 0.0,
+                "resyncs": self.resyncs,
+                "caught": self.caught,
+                "latency_s_by_turn": {str(k): summarize(v) for k, v in sorted(self.latency_by_turn.items())},
+                "payload_bytes": {
+                    "mean": round(sum(all_bytes) / len(all_bytes), 1) if all_bytes else None,
+                    "max": max(all_bytes) if all_bytes else None,
+                    "by_turn": {str(k): summarize(v) for k, v in sorted(self.payload_bytes_by_turn.items())},
+                },
+            }
+
+
+class SimulatedPlayer:
+    """One headless interrogation, mirroring AlibiGame's request sequence"""
+
+    def __init__(self, client, stats, index, difficulty, answers, turns, think_time=0.0):
+        self.client = client
+        self.stats = stats
+        self.name = f"loadgen-{index}-{uuid.uuid4().hex[:8]}"
+        self.role = random.choice(VALID_ROLES)
+        self.difficulty = difficulty
+        self.answers = answers
+        self.turns = turns
+        self.think_time = think_time
+        self.offset = index
+        self.transcript = Transcript()
+        self.session_token = None
+        self.current_question = ""
+
+    def send(self, turn_index, payload):
+        payload_bytes = len(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        start = time.perf_counter()
+        try:
+            response = self.client.interrogate(payload)
+        except Exception:
+            self.stats.record(turn_index, time.perf_counter() - start, payload_bytes, None)
+            return None, None
+        self.stats.record(turn_index, time.perf_counter() - start, payload_bytes, response.status_code)
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        return response.status_code, data
+
+    def run(self):
+        payload = build_opening_payload(self.name, self.role, self.difficulty)
+        status, data = self.send(0, payload)
+        if status != 200 or not data:
+            return
+        self.accept(data)
+
+        for turn_index in range(1, self.turns + 1):
+            if self.think_time:
+                time.sleep(self.think_time)
+            answer = self.answers[(self.offset + turn_index) % len(self.answers)]
+            turn = self.transcript.add(self.current_question, answer)
+            full = self.session_token is None
+            history = self.transcript.messages() if full else ()
+            payload = build_answer_payload(self.name, self.role, self.difficulty, answer, history, (),
+                                           session_token=self.session_token, turn=turn,
+                                           full=full, seq=self.transcript.seq)
+            status, data = self.send(turn_index, payload)
+            if status == 409:
+                self.stats.bump("resyncs")
+                payload = build_answer_payload(self.name, self.role, self.difficulty, answer,
+                                               self.transcript.messages(), (),
+                                               session_token=self.session_token, full=True)
+                status, data = self.send(turn_index, payload)
+            if status != 200 or not data:
+                return
+            if is_caught(data.get("response", "")):
+                self.stats.bump("caught")
+                break
+            self.accept(data)
+        self.stats.bump("completed_players")
+
+    def accept(self, data):
+        self.session_token = data.get("sessionToken", self.session_token)
+        self.current_question = data.get("response", "")
+
+
+def run_load(url, players, concurrency, turns, difficulties, answers, think_time=0.0,
+             ramp=0.0, timeout=60.0):
+    """Run the simulation and return the JSON-ready report"""
+    client = MiddlewareClient(url, read_timeout=timeout, max_retries=0, pool_size=concurrency)
+    stats = LoadStats()
+    cycle = itertools.cycle(difficulties)
+
+    def launch(index, difficulty):
+        if ramp:
+            time.sleep(ramp * index / max(1, players))
+        SimulatedPlayer(client, stats, index, difficulty, answers, turns, think_time).run()
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="alibi-load") as pool:
+            futures = [pool.submit(launch, i, next(cycle)) for i in range(players)]
+            for future in futures:
+                future.result()
+    finally:
+        client.close()
+    return stats.report(players, turns, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive simulated players through /interrogate")
+    parser.add_argument("--url", default="http://localhost:3000", help="middleware base URL")
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=5, help="answered turns after the opening question")
+    parser.add_argument("--difficulty", action="append", choices=DIFFICULTIES,
+                        help="repeat to mix difficulties (default: Medium)")
+    parser.add_argument("--answers", help="file with one scripted answer per line")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds between turns")
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds over which players start")
+    parser.add_argument("--timeout", type=float, default=60.0, help="read timeout per request")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    answers = DEFAULT_ANSWERS
+    if args.answers:
+        with open(args.answers, encoding="utf-8") as f:
+            answers = [line.strip() for line in f if line.strip()] or DEFAULT_ANSWERS
+
+    report = run_load(args.url, args.players, args.concurrency, args.turns,
+                      args.difficulty or ["Medium"], answers,
+                      think_time=args.think_time, ramp=args.ramp, timeout=args.timeout)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Level-gated logging for the desktop client.
+
+Records go unformatted through a queue to a listener thread, which feeds
+both the console and the trace: a bounded ring buffer of every record at or
+above the trace level (DEBUG by default). The calling thread, usually the
+Tk loop, only builds the record and enqueues it. Formatting happens on the
+listener thread, and the buffer is written to disk by a third thread at the
+end of a game, on errors and on exit. A full debug trace of a bad session
+is always there without slowing the UI.
+
+Log arguments are formatted lazily (`logging.debug("x: %s", value)`), and
+`Redacted` wraps payloads so that when they are formatted, tokens are
+masked and long transcripts are cut down. The buffer keeps only the
+formatted text, never the payloads themselves.
+"""
+import collections
+import logging
+import logging.handlers
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+FORMAT = "[%(levelname)s] %(message)s"
+TRACE_FORMAT = "%(asctime)s.%(msecs)03d [%(levelname)s] %(threadName)s %(message)s"
+DEFAULT_LEVEL = "INFO"
+DEFAULT_TRACE_LEVEL = "DEBUG"
+DEFAULT_CAPACITY = 5000
+DEFAULT_TRACE_PATH = "alibi_trace.log"
+MAX_TEXT = 200
+SECRET_KEYS = {"sessionToken", "token", "authorization", "apiKey"}
+
+
+def parse_level(value, default):
+    """Accept level names ("debug") or numbers ("10"); fall back to default"""
+    if value is None or value == "":
+        value = default
+    if isinstance(value, int) or str(value).isdigit():
+        return int(value)
+    level = logging.getLevelName(str(value).upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {value}")
+    return level
+
+
+def truncate(text, limit=MAX_TEXT):
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text)} chars)"
+
+
+def redact(value, limit=MAX_TEXT):
+    """Copy of a payload that is safe and short enough to log"""
+    if isinstance(value, dict):
+        return {k: ("***" if k in SECRET_KEYS and v else redact(v, limit)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) > 4:
+            # Keep the shape of long transcripts but not their contents
+            return [redact(value[0], limit), f"... {len(value) - 2} more ...", redact(value[-1], limit)]
+        return [redact(v, limit) for v in value]
+    if isinstance(value, str):
+        return truncate(value, limit)
+    return value
+
+
+class Redacted:
+    """Defers redact() until a handler actually formats the record"""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit=MAX_TEXT):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        if isinstance(self.value, str):
+            return truncate(self.value, self.limit)
+        return str(redact(self.value, self.limit))
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last `capacity` records as formatted lines; flush() writes them off-thread"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, path=DEFAULT_TRACE_PATH, level=logging.DEBUG,
+                 flush_level=logging.ERROR):
+        super().__init__(level)
+        self.lines = collections.deque(maxlen=capacity)
+        self.path = path
+        self.flush_level = flush_level
+        self.setFormatter(logging.Formatter(TRACE_FORMAT, datefmt="%H:%M:%S"))
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alibi-log")
+
+    def emit(self, record):
+        # Runs on the listener thread; formatted here so the buffer holds no references to payloads
+        try:
+            line = self.format(record)
+        except Exception as e:
+            line = f"<unformattable record {record.msg!r}: {e}>"
+        self.lines.append(line)
+        if record.levelno >= self.flush_level:
+            self.flush()
+
+    def flush(self, path=None):
+        """Queue a write of the current buffer; returns a Future or None once closed"""
+        lines = list(self.lines)
+        try:
+            return self._writer.submit(self._write, lines, path or self.path)
+        except RuntimeError:
+            return None
+
+    def _write(self, lines, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+            f.write("\n")
+        return path
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        super().close()
+
+
+class _RawQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records as they are; the listener thread's handlers format them"""
+
+    def prepare(self, record):
+        return record
+
+
+class _FlushRequest:
+    def __init__(self, path):
+        self.path = path
+
+
+class _Listener(logging.handlers.QueueListener):
+    """Also carries trace flushes through the queue, so a flush includes every record logged before it"""
+
+    def handle(self, record):
+        if isinstance(record, _FlushRequest):
+            if _ring is not None:
+                _ring.flush(record.path)
+            return
+        super().handle(record)
+
+
+_ring = None
+_listener = None
+_records = None
+
+
+def configure(level=None, trace_level=None, trace_path=None, capacity=None):
+    """Install the console queue handler and the trace ring buffer on the root logger.
+
+    Unset arguments come from ALIBI_LOG_LEVEL, ALIBI_TRACE_LEVEL,
+    ALIBI_TRACE_PATH and ALIBI_TRACE_CAPACITY. A trace level of OFF disables
+    the ring buffer.
+    """
+    global _ring, _listener, _records
+    shutdown()
+
+    level = parse_level(level or os.environ.get("ALIBI_LOG_LEVEL"), DEFAULT_LEVEL)
+    trace_setting = trace_level or os.environ.get("ALIBI_TRACE_LEVEL") or DEFAULT_TRACE_LEVEL
+    trace_path = trace_path or os.environ.get("ALIBI_TRACE_PATH", DEFAULT_TRACE_PATH)
+    capacity = capacity or int(os.environ.get("ALIBI_TRACE_CAPACITY", DEFAULT_CAPACITY))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(FORMAT))
+    console.setLevel(level)
+    handlers = [console]
+    lowest = level
+    if str(trace_setting).upper() != "OFF":
+        trace = parse_level(trace_setting, DEFAULT_TRACE_LEVEL)
+        _ring = RingBufferHandler(capacity, trace_path, level=trace)
+        handlers.append(_ring)
+        lowest = min(level, trace)
+
+    _records = queue.SimpleQueue()
+    queue_handler = _RawQueueHandler(_records)
+    queue_handler.setLevel(lowest)
+    root.addHandler(queue_handler)
+    _listener = _Listener(_records, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Records below every handler's level are rejected before a record is built
+    root.setLevel(lowest)
+    return root
+
+
+def flush_trace(path=None):
+    """Write the trace buffer to disk in the background, after the records already queued; no-op when disabled"""
+    if _ring is not None and _records is not None:
+        _records.put(_FlushRequest(path))
+
+
+def shutdown():
+    """Stop the listener thread, then write the trace buffer one last time"""
+    global _ring, _listener, _records
+    root = logging.getLogger()
+    if _listener is not None:
+        _listener.stop()  # handles everything still queued first
+        for handler in list(root.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root.removeHandler(handler)
+        _listener = None
+        _records = None
+    if _ring is not None:
+        _ring.flush()
+        _ring.close()
+        _ring = None
+
+
+def add_arguments(parser):
+    parser.add_argument("--log-level", help=f"console log level (default {DEFAULT_LEVEL}, env ALIBI_LOG_LEVEL)")
+    parser.add_argument("--trace-level",
+                        help=f"level kept in the trace buffer, or OFF (default {DEFAULT_TRACE_LEVEL}, env ALIBI_TRACE_LEVEL)")
+    parser.add_argument("--trace-file", help=f"where the trace buffer is written (default {DEFAULT_TRACE_PATH})")
@@ -0,0 +1,161 @@
+"""In-process timing spans, counters and HDR-style latency histograms.
+
+All instrumentation in the client records into the module-level `metrics`
+registry; `metrics.dump(path)` writes a JSON snapshot that can be compared
+between sessions or builds.
+"""
+import functools
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+SUB_BUCKET_BITS = 5  # 32 linear sub-buckets per power of two, ~3% worst-case error
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+def _bucket(value):
+    """Log-linear bucket key: exact below 2**SUB_BUCKET_BITS, then 5 significant bits"""
+    if value < (1 << SUB_BUCKET_BITS):
+        return (0, value)
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (shift, value >> shift)
+
+
+def _bucket_upper(key):
+    shift, mantissa = key
+    return ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """Fixed-precision histogram in the spirit of HdrHistogram.
+
+    Values are scaled to integers (e.g. seconds -> microseconds) and counted in
+    log-linear buckets, so memory stays small no matter how many samples
+    are recorded while percentiles stay within a few percent.
+    """
+
+    def __init__(self, scale=1, unit=""):
+        self.scale = scale
+        self.unit = unit
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        scaled = max(0, int(round(value * self.scale)))
+        key = _bucket(scaled)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total += scaled
+        self.min = scaled if self.min is None else min(self.min, scaled)
+        self.max = scaled if self.max is None else max(self.max, scaled)
+
+    def merge(self, other):
+        for key, n in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        target = max(1, math.ceil(pct / 100.0 * self.count))
+        running = 0
+        for key in sorted(self.counts):
+            running += self.counts[key]
+            if running >= target:
+                return min(_bucket_upper(key), self.max) / self.scale
+        return self.max / self.scale
+
+    def snapshot(self):
+        if not self.count:
+            return {"count": 0, "unit": self.unit}
+        data = {
+            "count": self.count,
+            "unit": self.unit,
+            "min": self.min / self.scale,
+            "max": self.max / self.scale,
+            "mean": round(self.total / self.count / self.scale, 6),
+        }
+        for pct in PERCENTILES:
+            data[f"p{pct:g}"] = self.percentile(pct)
+        data["buckets"] = [[_bucket_upper(k) / self.scale, self.counts[k]] for k in sorted(self.counts)]
+        return data
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value, unit=""):
+        """Record a plain value (counts, sizes)"""
+        self._record(name, value, 1, unit)
+
+    def time(self, name, seconds):
+        """Record a duration; stored at microsecond precision, reported in ms"""
+        self._record(name, seconds * 1000.0, 1000, "ms")
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.time(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator form of span()"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _record(self, name, value, scale, unit):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(scale, unit)
+            histogram.record(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "captured": time.time(),
+                "counters": dict(self.counters),
+                "histograms": {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+            }
+
+    def dump(self, path):
+        data = self.snapshot()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+
+metrics = Metrics()
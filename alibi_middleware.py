@@ -0,0 +1,1152 @@
+"""Python asyncio implementation of the middleware's /interrogate contract.
+
+Speaks the same HTTP as index.js and the offline stand-in (alibi_server.py):
+JSON or Server-Sent Events replies, incremental turns with a 409 resync,
+scenario seeds, /session/rekey, duplicate-turn sharing and gzip. It differs
+from index.js in how it holds up under many players:
+
+- Sessions are keyed by the opaque `sessionToken` it issues, not by player
+  name. Two players called "Alex" each get their own game.
+- `SessionStore` is an LRU with an idle TTL and a hard cap on both the
+  number of sessions and their estimated size. Expired sessions are dropped
+  from the cold end as new ones arrive, so there is no periodic scan.
+  A session that is evicted or expires gets a 409 on its next turn, and
+  the client resyncs with its full transcript.
+- `PromptBook` joins the fixed instructions into one template per
+  difficulty when the server starts. Per request only the player, case and
+  transcript fields are filled in. Each session renders its situation
+  block once.
+- At most `max_concurrency` model calls run at a time. A request that cannot
+  get a slot within `queue_timeout` seconds is answered 503 with
+  Retry-After, which the client already retries.
+- Opening questions depend only on the crime, method, role and difficulty
+  (plus the time and evidence they were written for). `OpeningCache` keeps
+  a few per key and serves them in milliseconds, without a model slot.
+  Background workers replace used-up openings from spare model capacity.
+  `--warm-openings` generates a pool offline into a gzipped file that
+  `--openings` loads at startup.
+
+The model is pluggable: `OpenAIModel` streams chat completions, and
+`StubModel` answers with alibi_server's templated detective for offline
+runs and benchmarks (benchmarks/bench_middleware.py).
+
+Usage:
+    python alibi_middleware.py --port 3000                      # OpenAI, key from OPENAI_API_KEY
+    python alibi_middleware.py --port 3000 --model stub --latency 0.5
+    python alibi_middleware.py --warm-openings openings.jsonl.gz             # then --openings openings.jsonl.gz
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import gzip
+import itertools
+import json
+import logging
+import os
+import random
+import secrets
+import string
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from alibi_protocol import DIFFICULTIES, PROVISIONAL_PREFIX, VALID_ROLES, is_caught, rename_player
+from alibi_scenario import (CRIME_LOCATION_PAIRS, EVIDENCE_POOLS, METHODS, NORMAL_EVIDENCE, SERVER_ROLES,
+                            Mulberry32, evidence_count, generate_evidence, generate_random_time,
+                            generate_scenario, sample)
+from alibi_server import (DIAGNOSTIC_REPLY, HttpServer, StubConfig, StubDetective, now_iso, settle,
+                          validation_errors, wants_stream)
+from alibi_transcript import DEFAULT_TOKEN_BUDGET, Transcript, count_turns
+
+OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+MAX_SESSIONS = 20000
+MAX_SESSION_BYTES = 128 * 1024 * 1024
+SESSION_TTL = 30 * 60  # seconds idle, as index.js
+SWEEP_INTERVAL = 60.0
+MAX_CONCURRENCY = 32  # model calls in flight
+QUEUE_TIMEOUT = 5.0  # seconds a request may wait for a model slot
+RETRY_AFTER = 2
+DEBUG_SESSIONS_SHOWN = 100  # most recently used first
+SESSION_OVERHEAD = 850  # bytes per session besides its text, measured with tracemalloc
+TURN_OVERHEAD = 70  # bytes per stored turn besides its two strings
+OPENING_VARIANTS = 3  # cached opening questions kept per case key
+OPENING_USES = 4  # games served by one cached opening before it is replaced
+OPENING_TTL = 24 * 60 * 60  # seconds a cached opening is served before it is replaced
+LOADED_TTL_SPREAD = 0.5  # loaded openings expire over the last half of the TTL, not all at once
+MAX_OPENINGS = 100000
+MAX_OPENING_BYTES = 64 * 1024 * 1024
+OPENING_OVERHEAD = 200  # bytes per cached opening besides its question
+OPENING_NAME = f"{PROVISIONAL_PREFIX}000000"  # player name cached openings are written for
+REFILL_WORKERS = 2
+REFILL_SHARE = 0.5  # refills only start while fewer than this share of model slots are busy
+REFILL_PAUSE = 1.0  # seconds to wait for spare model slots
+REFILL_BACKLOG = 10000  # keys waiting to be topped up
+
+# -- Prompts (the text of index.js) ------------------------------------------
+
+SITUATION = ("====================\nSITUATION MEMORY (DO NOT CHANGE)\n====================\n"
+             "CRIME: {crime}\nLOCATION: {location}\nTIME: {time}\nMETHOD: {method}\n====================\n")
+
+DIFFICULTY_INSTRUCTIONS = {
+    "Easy": "Easy: Be very forgiving, patient, and helpful. Give the player plenty of chances to explain, offer "
+            "hints, and avoid being aggressive. Only catch them if the evidence is overwhelming and contradictions "
+            "are blatant. DO NOT catch them for minor timing ambiguities or fuzzy memories. If in doubt, give the "
+            "player the benefit of the doubt.",
+    "Medium": "Normal: Interrogate like a real detective. Be persistent, realistic, and fair. Look for gaps and "
+              "inconsistencies, but give the player a reasonable chance to explain.",
+    "Hard": "Hard: Be tough and relentless. Most people will find this challenging. Press hard on contradictions, "
+            "use evidence aggressively, and don't let the player off easy.",
+    "Expert": "Expert: Be extremely challenging, as if interrogating a seasoned criminal. Use every trick, trap, "
+              "and piece of evidence. Catch even subtle contradictions and push the player to their limits.",
+}
+
+CATCH_INSTRUCTION = (
+    "If you catch the player in a lie or contradiction, you MUST start your response with the exact phrase: "
+    "'I caught you in a lie because...' (verbatim, at the very beginning of your explanation, in the same "
+    "sentence). Immediately explain the reason, referencing the specific evidence, statements, and "
+    "contradictions that led you to your conclusion. Make your reasoning clear and explicit so the player "
+    "understands exactly what gave them away. IMPORTANT: Only catch lies based on the evidence list or direct "
+    "contradictions in their own statements. The crime time is when the crime occurred, NOT when the player was "
+    "there. Do not treat the crime time as evidence that the player was at the scene."
+)
+
+STYLE = """Your interrogation style:
+- Be professional but firm, matching the difficulty level
+- Ask specific questions about timing, location, and actions
+- Look for contradictions in their story
+- Use the evidence against them strategically
+- Don't let them off easy - push for details
+- If they're lying, call them out on inconsistencies
+- Keep track of what they've said and compare it to evidence
+- Build a case by gathering more information with each question
+- REJECT any supernatural, fictional, or impossible explanations (aliens, superpowers, time travel, etc.)
+- Focus only on real-world possibilities and evidence
+- If they mention impossible things, call them out and demand realistic answers"""
+
+EVIDENCE_IDEAS = """- Reference new surveillance footage, witness statements, or forensic findings
+- Mention new details about the crime scene, timing, or methods used
+- Introduce new witnesses, security cameras, or physical evidence
+- Create realistic forensic evidence (fingerprints, DNA, tool marks, etc.)
+- Reference financial records, phone records, or digital evidence
+- Mention new locations, vehicles, or accomplices involved
+- Create new details about the crime method, timing, or location
+- Introduce new crime scene details, evidence types, or investigation findings"""
+
+OPENING_SYSTEM = """{situation}
+You are Detective Holloway, a seasoned investigator known for your sharp instincts and ability to spot lies. \
+You are interrogating {name}, who is suspected of being the {role} in the above scenario.
+
+{difficulty_block}
+
+{style}
+
+{catch}
+
+EVIDENCE GENERATION: You have access to the following evidence, but you can also create additional evidence \
+as the interrogation progresses. Feel free to:
+{evidence_ideas}
+
+Current evidence against {name}:
+{evidence}
+
+IMPORTANT: As the interrogation progresses, you can introduce new evidence that makes sense for the scenario. \
+Be creative but realistic. The evidence should build the case against the suspect. You can create new details \
+about the crime, witnesses, evidence, or investigation as needed.
+
+Start your interrogation. Ask your first question. Be direct and professional, matching the {difficulty} \
+difficulty level."""
+
+OPENING_USER = "{situation}\nBegin the interrogation with your first question."
+
+FOLLOW_UP_SYSTEM = """{situation}
+CONVERSATION MEMORY (Q&A so far):
+{memory}
+
+You are Detective Holloway continuing your interrogation of {name}, the suspected {role} in the above scenario.
+
+{difficulty_block}
+
+{style}
+
+{catch}
+
+EVIDENCE GENERATION: You can introduce new evidence as the interrogation progresses. Feel free to:
+{evidence_ideas}
+
+Current evidence against {name}:
+{evidence}
+
+ANALYZE their latest response: "{answer}"
+
+Compare what they just said to:
+1. The evidence we have (ONLY use the evidence list above)
+2. What they've said before (look for direct contradictions in their own statements)
+3. The crime details (crime time is when the crime occurred, NOT when the player was there)
+
+If you find contradictions, lies, or inconsistencies, confront them directly. If they're being evasive, push \
+harder. If they provide new information, ask follow-up questions to verify it.
+
+IMPORTANT:
+- If they mention anything supernatural, fictional, or impossible (aliens, superpowers, magic, time travel, \
+etc.), immediately call them out and demand a realistic explanation. Don't accept any cop-outs.
+- You can introduce new evidence that makes sense for the scenario. Be creative but realistic.
+- The evidence should build the case against the suspect as the interrogation progresses.
+- DO NOT DEVIATE FROM THIS SCENARIO. If the player mentions a different crime, location, time, or method, \
+IGNORE IT and redirect the conversation back to the original scenario. Never reference any crime, location, \
+time, or method except the original scenario. All evidence, questions, and details must relate ONLY to this \
+original scenario for the entire interrogation.
+- CRITICAL: The crime time ({crime_time}) is when the crime occurred, NOT when the player was there. Do not use \
+the crime time as evidence that the player was at the scene. Only use the evidence list above to catch lies.
+
+Respond to their latest statement: "{answer}\""""
+
+FOLLOW_UP_USER = "{situation}\nPlayer's response: \"{answer}\""
+
+
+def partial_format(template, **fields):
+    """Fill in `fields` now and leave every other {placeholder} for later"""
+    parts = []
+    for literal, name, spec, conversion in string.Formatter().parse(template):
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if name is None:
+            continue
+        if name in fields:
+            parts.append(str(fields[name]).replace("{", "{{").replace("}", "}}"))
+        else:
+            parts.append("{" + name + ("!" + conversion if conversion else "") + (":" + spec if spec else "") + "}")
+    return "".join(parts)
+
+
+class PromptBook:
+    """System and user prompts per difficulty, with the fixed instructions joined in at startup"""
+
+    def __init__(self):
+        self.templates = {}
+        for difficulty in DIFFICULTIES:
+            fixed = {
+                "difficulty": difficulty,
+                "difficulty_block": f"DIFFICULTY LEVEL: {difficulty}\n{DIFFICULTY_INSTRUCTIONS[difficulty]}",
+                "style": STYLE,
+                "catch": CATCH_INSTRUCTION,
+                "evidence_ideas": EVIDENCE_IDEAS,
+            }
+            self.templates[difficulty] = {
+                True: (partial_format(OPENING_SYSTEM, **fixed), OPENING_USER),
+                False: (partial_format(FOLLOW_UP_SYSTEM, **fixed), FOLLOW_UP_USER),
+            }
+
+    def messages(self, session, name, role, difficulty, answer, evidence, first):
+        system, user = self.templates[difficulty][first]
+        fields = {
+            "situation": session.situation,
+            "name": name,
+            "role": role,
+            "answer": answer,
+            "evidence": "\n".join(f"- {item}" for item in evidence),
+            "memory": session.memory() if not first else "",
+            "crime_time": session.scenario["time"],
+        }
+        return [{"role": "system", "content": system.format_map(fields)},
+                {"role": "user", "content": user.format_map(fields)}]
+
+
+# -- Sessions ------------------------------------------------------------------
+
+class Session:
+    """One game: the case, the bounded transcript and the reply to its latest turn"""
+
+    __slots__ = ("token", "name", "scenario", "situation", "transcript", "seq", "last_reply", "touched", "size")
+
+    def __init__(self, token, name, scenario, history=(), token_budget=DEFAULT_TOKEN_BUDGET):
+        self.token = token
+        self.name = name
+        self.scenario = scenario
+        self.situation = SITUATION.format(**scenario)
+        self.transcript = Transcript.from_messages(history, token_budget=token_budget)
+        self.seq = count_turns(history)
+        self.last_reply = None
+        self.touched = 0.0
+        self.size = 0
+
+    def add_turn(self, question, answer):
+        self.transcript.add(question, answer)
+        self.seq += 1
+
+    def reset(self, history):
+        """Replace the transcript after a full resync"""
+        self.transcript = Transcript.from_messages(history, token_budget=self.transcript.token_budget)
+        self.seq = count_turns(history)
+
+    def memory(self):
+        # Joined per request rather than stored: it is a few dozen short lines, and this halves a session's size
+        return self.transcript.memory()
+
+    def estimate_size(self):
+        # getsizeof, not len: a shortened gist ends in "…", which makes CPython store it two bytes per character
+        transcript = self.transcript
+        return (SESSION_OVERHEAD + sys.getsizeof(self.situation) + sys.getsizeof(transcript.summary)
+                + sum(TURN_OVERHEAD + sys.getsizeof(turn.question) + sys.getsizeof(turn.answer)
+                      for turn in transcript)
+                + sum(sys.getsizeof(claim) for claim in transcript.folded_claims))
+
+
+class SessionStore:
+    """LRU of sessions by token, with an idle TTL and caps on count and estimated bytes"""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, max_bytes=MAX_SESSION_BYTES, ttl=SESSION_TTL,
+                 clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.bytes = 0
+        self.evicted = 0
+        self.expired = 0
+        self._sessions = collections.OrderedDict()  # least recently used first
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __iter__(self):
+        return iter(reversed(self._sessions.values()))  # most recently used first
+
+    def get(self, token):
+        session = self._sessions.get(token)
+        if session is None:
+            return None
+        now = self.clock()
+        if now - session.touched > self.ttl:
+            self._drop(session)
+            self.expired += 1
+            return None
+        session.touched = now
+        self._sessions.move_to_end(token)
+        return session
+
+    def add(self, session):
+        session.touched = self.clock()
+        session.size = session.estimate_size()
+        self._sessions[session.token] = session
+        self.bytes += session.size
+        self._trim()
+
+    def resize(self, session):
+        """Re-estimate a session after its transcript changed"""
+        if self._sessions.get(session.token) is not session:
+            return  # evicted while its request was in flight
+        size = session.estimate_size()
+        self.bytes += size - session.size
+        session.size = size
+        self._trim()
+
+    def remove(self, token):
+        session = self._sessions.get(token)
+        if session is not None:
+            self._drop(session)
+        return session
+
+    def clear(self):
+        count = len(self._sessions)
+        self._sessions.clear()
+        self.bytes = 0
+        return count
+
+    def sweep(self):
+        """Drop expired sessions; they are all at the cold end, so this stops at the first live one"""
+        cutoff = self.clock() - self.ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.touched >= cutoff:
+                break
+            self._drop(session)
+            self.expired += 1
+
+    def stats(self):
+        return {"sessions": len(self._sessions), "bytes": self.bytes, "maxSessions": self.max_sessions,
+                "maxBytes": self.max_bytes, "evicted": self.evicted, "expired": self.expired}
+
+    def _trim(self):
+        self.sweep()
+        # Never evict the session just touched: it is at the hot end and the last to go
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self.bytes > self.max_bytes):
+            self._drop(next(iter(self._sessions.values())))
+            self.evicted += 1
+
+    def _drop(self, session):
+        del self._sessions[session.token]
+        self.bytes -= session.size
+
+
+# -- Opening questions -----------------------------------------------------------
+
+CRIME_INDEX = {crime: i for i, (crime, _) in enumerate(CRIME_LOCATION_PAIRS)}
+METHOD_INDEX = {method: i for i, method in enumerate(METHODS)}
+
+
+def opening_key(scenario, role, difficulty):
+    """(crime, method, role, difficulty): what an opening question depends on besides time and evidence"""
+    return CRIME_INDEX[scenario["crime"]], METHOD_INDEX[scenario["method"]], role, difficulty
+
+
+class Opening:
+    """One cached opening question and the crime time and evidence it was written for"""
+
+    __slots__ = ("time", "evidence", "question", "added", "uses", "size")
+
+    def __init__(self, crime_time, evidence, question):
+        self.time = crime_time
+        self.evidence = tuple(evidence)  # indexes into the difficulty's evidence pool
+        self.question = question  # addresses the player as OPENING_NAME
+        self.added = 0.0
+        self.uses = 0
+        self.size = OPENING_OVERHEAD + sys.getsizeof(question)
+
+    def case(self, key, name):
+        """Scenario and evidence for a player called `name`"""
+        crime_index, method_index, _, difficulty = key
+        crime, location = CRIME_LOCATION_PAIRS[crime_index]
+        scenario = {"crime": crime, "location": location, "time": self.time, "method": METHODS[method_index]}
+        pool = EVIDENCE_POOLS.get(difficulty, NORMAL_EVIDENCE)
+        return scenario, [pool[i].format(name=name, location=location) for i in self.evidence]
+
+
+class OpeningCache:
+    """Opening questions by case key, a few variants per key.
+
+    A variant is replaced after `max_uses` games or `ttl` seconds, and its
+    key goes on the refill list, as does the key of every miss. Keys are
+    kept in LRU order. Past
+    `max_openings` or `max_bytes`, whole keys are evicted from the cold end.
+    """
+
+    def __init__(self, variants=OPENING_VARIANTS, max_uses=OPENING_USES, ttl=OPENING_TTL,
+                 max_openings=MAX_OPENINGS, max_bytes=MAX_OPENING_BYTES, clock=time.monotonic):
+        self.variants = variants
+        self.max_uses = max_uses
+        self.ttl = ttl
+        self.max_openings = max_openings
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.count = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.refilled = 0
+        self._keys = collections.OrderedDict()  # key -> [Opening], least recently used first
+        self._wanted = collections.OrderedDict()  # keys to top up, oldest first
+        self.filling = collections.Counter()  # key -> refills in flight
+
+    def __len__(self):
+        return self.count
+
+    def take(self, key):
+        """An opening for `key`, or None; the least used variant goes first so games are spread over all"""
+        openings = self._live(key)
+        if not openings:
+            self.misses += 1
+            self.want(key)
+            return None
+        opening = min(openings, key=lambda o: o.uses)
+        opening.uses += 1
+        if opening.uses >= self.max_uses:
+            self._remove(key, opening)
+            self.want(key)
+        else:
+            self._keys.move_to_end(key)
+        self.hits += 1
+        return opening
+
+    def add(self, key, opening):
+        opening.added = self.clock()
+        self._keys.setdefault(key, []).append(opening)
+        self.count += 1
+        self.bytes += opening.size
+        self._trim()
+
+    def missing(self, key):
+        return max(0, self.variants - len(self._keys.get(key, ())) - self.filling[key])
+
+    def want(self, key):
+        if key not in self._wanted and len(self._wanted) < REFILL_BACKLOG:
+            self._wanted[key] = True
+
+    @property
+    def backlog(self):
+        """Keys waiting to be topped up"""
+        return len(self._wanted)
+
+    def next_wanted(self):
+        while self._wanted:
+            key, _ = self._wanted.popitem(last=False)
+            if self.missing(key):
+                return key
+        return None
+
+    def stats(self):
+        return {"openings": self.count, "keys": len(self._keys), "bytes": self.bytes,
+                "maxOpenings": self.max_openings, "maxBytes": self.max_bytes, "hits": self.hits,
+                "misses": self.misses, "expired": self.expired, "evicted": self.evicted,
+                "refilled": self.refilled, "refillBacklog": self.backlog}
+
+    def save(self, path):
+        """Write every opening as gzipped JSON lines.
+
+        After a header, each line is [crime, method, role, difficulty, time,
+        evidence, question], with the crime, method and evidence as indexes
+        into alibi_scenario's tables.
+        """
+        temporary = path + ".tmp"
+        with gzip.open(temporary, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"version": 1, "name": OPENING_NAME}) + "\n")
+            for key, openings in self._keys.items():
+                for opening in openings:
+                    f.write(json.dumps([*key, opening.time, list(opening.evidence), opening.question],
+                                       separators=(",", ":"), ensure_ascii=False) + "\n")
+        os.replace(temporary, path)
+
+    def load(self, path, rng=random):
+        """Add the openings saved in `path`; returns how many were usable.
+
+        Their ages are spread over LOADED_TTL_SPREAD of the TTL, so a cache
+        loaded at startup is replaced gradually rather than expiring at once.
+        """
+        loaded = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            name = json.loads(f.readline()).get("name", OPENING_NAME)
+            for line in f:
+                try:
+                    crime, method, role, difficulty, crime_time, evidence, question = json.loads(line)
+                    pool = EVIDENCE_POOLS.get(difficulty, NORMAL_EVIDENCE)
+                    valid = (0 <= crime < len(CRIME_LOCATION_PAIRS) and 0 <= method < len(METHODS)
+                             and all(0 <= i < len(pool) for i in evidence))
+                except (ValueError, TypeError):
+                    valid = False
+                if not valid:
+                    logging.warning("Skipping a malformed opening in %s", path)
+                    continue
+                opening = Opening(crime_time, evidence, rename_player(question, name, OPENING_NAME))
+                self.add((crime, method, role, difficulty), opening)
+                opening.added -= rng.uniform(0, self.ttl * LOADED_TTL_SPREAD)
+                loaded += 1
+        return loaded
+
+    def _live(self, key):
+        openings = self._keys.get(key)
+        if openings:
+            cutoff = self.clock() - self.ttl
+            for opening in [o for o in openings if o.added < cutoff]:
+                self._remove(key, opening)
+                self.expired += 1
+                self.want(key)
+        return self._keys.get(key)
+
+    def _remove(self, key, opening):
+        openings = self._keys[key]
+        openings.remove(opening)
+        self.count -= 1
+        self.bytes -= opening.size
+        if not openings:
+            del self._keys[key]
+
+    def _trim(self):
+        # The most recently used key is the last to go, so a cache holding a single key never empties
+        while len(self._keys) > 1 and (self.count > self.max_openings or self.bytes > self.max_bytes):
+            _, openings = self._keys.popitem(last=False)
+            self.count -= len(openings)
+            self.bytes -= sum(opening.size for opening in openings)
+            self.evicted += len(openings)
+
+
+# -- Model backends --------------------------------------------------------------
+
+class ServerBusy(Exception):
+    pass
+
+
+class ModelError(Exception):
+    """The model call failed; `message` is what the player sees"""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.message = message
+        self.details = details
+
+
+class ModelGate:
+    """Bounds concurrent model calls; waiters give up after `queue_timeout`"""
+
+    def __init__(self, limit=MAX_CONCURRENCY, queue_timeout=QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self):
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ServerBusy() from None
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {"limit": self.limit, "inFlight": self.in_flight, "waiting": self.waiting, "rejected": self.rejected}
+
+
+class StubModel:
+    """alibi_server's templated detective behind the model interface"""
+
+    configured = False
+
+    def __init__(self, config=None):
+        self.detective = StubDetective(config or StubConfig())
+
+    async def stream(self, messages, context):
+        text = self.detective.reply(random, {"scenario": context["scenario"], "seq": context["seq"]},
+                                    context["name"], context["role"], context["answer"], context["evidence"],
+                                    context["first"])
+        async for token in self.detective.stream(random, text):
+            yield token
+
+    def close(self):
+        pass
+
+
+class OpenAIModel:
+    """Streams chat completions; each call holds one worker thread for as long as it streams"""
+
+    configured = True
+
+    def __init__(self, api_key, model="gpt-4o", max_tokens=500, temperature=0.9, max_concurrency=MAX_CONCURRENCY,
+                 connect_timeout=5.0, read_timeout=60.0):
+        import requests
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.timeout = (connect_timeout, read_timeout)
+        self.http = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.http.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="alibi-model")
+
+    async def stream(self, messages, context):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+        body = {"model": self.model, "messages": messages, "max_tokens": self.max_tokens,
+                "temperature": self.temperature, "stream": True}
+
+        def put(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def pump():
+            import requests
+            try:
+                with self.http.post(OPENAI_API_URL, json=body, stream=True, timeout=self.timeout,
+                                    headers={"Authorization": f"Bearer {self.api_key}"}) as response:
+                    if response.status_code >= 400:
+                        raise upstream_error(response.status_code, response.text)
+                    for line in response.iter_lines(decode_unicode=True):
+                        if stop.is_set():
+                            return  # the player went away; stop paying for tokens nobody will read
+                        if not line or not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            delta = json.loads(data)["choices"][0]["delta"].get("content")
+                        except (ValueError, KeyError, IndexError):
+                            logging.warning("Could not parse stream chunk: %s", data[:200])
+                            continue
+                        if delta:
+                            put(delta)
+            except ModelError as e:
+                put(e)
+            except requests.exceptions.RequestException as e:
+                put(ModelError("Connection timeout. Please try again." if isinstance(e, requests.Timeout)
+                               else "Failed to get response from AI", str(e)))
+            finally:
+                put(done)
+
+        loop.run_in_executor(self._executor, pump)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    return
+                if isinstance(item, ModelError):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.http.close()
+
+
+def upstream_error(status, text):
+    messages = {429: "Rate limit exceeded. Please wait a moment.",
+                401: "Authentication failed. Please check API key.",
+                400: "Invalid request format."}
+    return ModelError(messages.get(status, "Failed to get response from AI"), text[:500])
+
+
+# -- Server ------------------------------------------------------------------------
+
+class MiddlewareServer(HttpServer):
+    """Routing and session handling; the model call is the only part that leaves the process"""
+
+    def __init__(self, model, store=None, gate=None, token_budget=DEFAULT_TOKEN_BUDGET, openings=None):
+        super().__init__()
+        self.model = model
+        self.store = store if store is not None else SessionStore()
+        self.gate = gate if gate is not None else ModelGate()
+        self.openings = openings if openings is not None else OpeningCache()
+        self.refill_wanted = asyncio.Event()
+        self.prompts = PromptBook()
+        self.token_budget = token_budget
+        self.deduplicated = 0
+        self.routes = {
+            ("POST", "/interrogate"): self.interrogate,
+            ("POST", "/session/rekey"): self.rekey_session,
+            ("GET", "/health"): self.health,
+            ("GET", "/debug/sessions"): self.debug_sessions,
+            ("POST", "/debug/reset-sessions"): self.reset_sessions,
+        }
+
+    async def sweep_forever(self, interval=SWEEP_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            self.store.sweep()
+
+    async def refill_forever(self):
+        """Replace cached openings that games have used up, with spare model slots only"""
+        while True:
+            key = self.openings.next_wanted()
+            if key is None:
+                self.refill_wanted.clear()
+                await self.refill_wanted.wait()
+                continue
+            self.openings.filling[key] += 1
+            try:
+                opening = await self.refill(key)
+            finally:
+                self.openings.filling[key] -= 1
+                if not self.openings.filling[key]:
+                    del self.openings.filling[key]
+            if opening is not None:
+                self.openings.add(key, opening)
+                self.openings.refilled += 1
+            if self.openings.missing(key):
+                self.openings.want(key)
+
+    async def refill(self, key):
+        # Players come first: wait while anyone queues for a slot or the slots are busy
+        while self.gate.waiting or self.gate.in_flight >= self.gate.limit * REFILL_SHARE:
+            await asyncio.sleep(REFILL_PAUSE)
+        try:
+            await self.gate.acquire()
+        except ServerBusy:
+            return None
+        try:
+            return await self.generate_opening(key)
+        except ModelError as e:
+            logging.warning("Could not refill an opening: %s", e.details or e.message)
+            await asyncio.sleep(REFILL_PAUSE)
+            return None
+        finally:
+            self.gate.release()
+
+    async def generate_opening(self, key, rng=random):
+        """Ask the model for an opening for `key` with a fresh time and evidence draw; None if unusable"""
+        crime_index, method_index, role, difficulty = key
+        pool = EVIDENCE_POOLS.get(difficulty, NORMAL_EVIDENCE)
+        draft = Opening(generate_random_time(rng), sample(rng, range(len(pool)), evidence_count(difficulty, rng)), "")
+        scenario, evidence = draft.case(key, OPENING_NAME)
+        session = Session("", OPENING_NAME, scenario)
+        messages = self.prompts.messages(session, OPENING_NAME, role, difficulty, "", evidence, True)
+        context = {"scenario": scenario, "seq": 0, "name": OPENING_NAME, "role": role, "answer": "",
+                   "evidence": evidence, "first": True}
+        async with contextlib.aclosing(self.model.stream(messages, context)) as tokens:
+            text = "".join([token_text async for token_text in tokens]).strip()
+        if not text or is_caught(text):
+            return None
+        return Opening(draft.time, draft.evidence, text)
+
+    # -- Endpoints -----------------------------------------------------
+
+    async def health(self, body, request, responder):
+        await responder.send_json(200, {
+            "status": "OK",
+            "timestamp": now_iso(),
+            "openai_configured": self.model.configured,
+            "active_sessions": len(self.store),
+            "deduplicated_requests": self.deduplicated,
+            "store": self.store.stats(),
+            "openings": self.openings.stats(),
+            "model": self.gate.stats(),
+        })
+
+    async def debug_sessions(self, body, request, responder):
+        sessions = list(itertools.islice(self.store, DEBUG_SESSIONS_SHOWN))
+        await responder.send_json(200, {
+            "activeSessions": [{
+                "playerName": session.name,
+                "scenario": session.scenario,
+                "conversationLength": len(session.transcript) * 2,
+                "estimatedBytes": session.size,
+                "idleSeconds": round(self.store.clock() - session.touched, 1),
+            } for session in sessions],
+            "shown": len(sessions),
+            "totalSessions": len(self.store),
+            "serverTime": now_iso(),
+        })
+
+    async def reset_sessions(self, body, request, responder):
+        token = body.get("sessionToken")
+        if token:
+            if self.store.remove(token) is None:
+                await responder.send_json(404, {"error": "Session not found"})
+            else:
+                await responder.send_json(200, {"message": "Session has been reset"})
+            return
+        count = self.store.clear()
+        await responder.send_json(200, {"message": f"All {count} sessions have been reset"})
+
+    async def rekey_session(self, body, request, responder):
+        new_name = body.get("newPlayerName")
+        if not isinstance(new_name, str) or not new_name.strip():
+            await responder.send_json(400, {"error": "Validation failed",
+                                            "details": ["newPlayerName must be a non-empty string"]})
+            return
+        token = body.get("sessionToken")
+        session = self.store.get(token) if isinstance(token, str) else None
+        if session is None:
+            await responder.send_json(404, {"error": "Session not found", "timestamp": now_iso()})
+            return
+        # The session is found by its token; the name is only what the detective calls the player
+        session.name = new_name.strip()
+        await responder.send_json(200, {"playerName": session.name, "sessionToken": session.token,
+                                        "seq": session.seq, "timestamp": now_iso()})
+
+    async def interrogate(self, body, request, responder):
+        if body.get("diagnostic") is True:
+            await responder.send_json(200, DIAGNOSTIC_REPLY)
+            return
+
+        name, role, difficulty = body.get("playerName"), body.get("role"), body.get("difficulty")
+        answer = body.get("playerResponse") or body.get("playerAnswer") or ""
+        history = body.get("conversationHistory") or body.get("history")
+        token, seq, turn = body.get("sessionToken"), body.get("seq"), body.get("turn")
+        scenario_seed = body.get("scenarioSeed")
+        incremental = isinstance(token, str) and history is None
+        history = history or []
+        first = body.get("startInterrogation") is True or (not incremental and not history)
+
+        errors = validation_errors(name, role, difficulty, scenario_seed, incremental, seq, turn)
+        if errors:
+            await responder.send_json(400, {"error": "Validation failed", "details": errors,
+                                            "validDifficulties": DIFFICULTIES, "validRoles": SERVER_ROLES})
+            return
+
+        name, role, difficulty = name.strip(), role.strip(), difficulty.strip()
+        if first and not history and not body.get("evidenceList"):
+            if await self.serve_cached_opening(body, request, responder, name, role, difficulty, scenario_seed):
+                return
+        session = self.store.get(token) if isinstance(token, str) and not first else None
+
+        problem = self.turn_problem(session, incremental, first, seq, turn)
+        if problem:
+            await self.refuse_turn(problem, session, body, request, responder)
+            return
+
+        # Wait for a model slot before touching the session, so a 503 leaves it as it was
+        try:
+            await self.gate.acquire()
+        except ServerBusy:
+            await responder.send_json(503, {"error": "Server busy. Please try again.", "timestamp": now_iso()},
+                                      headers={"Retry-After": str(RETRY_AFTER)})
+            return
+        # A copy of this turn may have been given the slot first while we queued
+        problem = self.turn_problem(session, incremental, first, seq, turn)
+        if problem:
+            self.gate.release()
+            await self.refuse_turn(problem, session, body, request, responder)
+            return
+        try:
+            await self.answer(body, request, responder, session, name, role, difficulty, answer, history,
+                              turn, scenario_seed, incremental, first)
+        finally:
+            self.gate.release()
+
+    @staticmethod
+    def turn_problem(session, incremental, first, seq, turn):
+        """"duplicate" or "stale" for an incremental turn that must not reach the model, else None"""
+        if not incremental or first:
+            return None
+        last = session.last_reply if session else None
+        if (turn and session is not None and seq == session.seq
+                and last and last["seq"] == seq and last["turn"] == turn):
+            return "duplicate"
+        if session is None or seq != session.seq + (1 if turn else 0):
+            return "stale"
+        return None
+
+    async def refuse_turn(self, problem, session, body, request, responder):
+        if problem == "duplicate":
+            # Same turn again: share the first request's reply instead of calling the model twice
+            self.deduplicated += 1
+            reply = await asyncio.shield(session.last_reply["future"])
+            if reply is not None:
+                await self.replay(reply, body, request, responder)
+                return
+        await responder.send_json(409, {
+            "error": "Resync required",
+            "expectedSeq": session.seq if session else None,
+            "timestamp": now_iso(),
+        })
+
+    async def serve_cached_opening(self, body, request, responder, name, role, difficulty, scenario_seed):
+        """Open the game with a cached question if there is one for its case; no model slot needed.
+
+        The seed still picks the crime and method. The time and evidence
+        come from the cached opening, because the question may mention
+        them. The reply's case is what the client shows, as always.
+        """
+        rng = Mulberry32(scenario_seed) if scenario_seed is not None else random
+        key = opening_key(generate_scenario(rng), role, difficulty)
+        opening = self.openings.take(key)
+        if self.openings.backlog:
+            self.refill_wanted.set()
+        if opening is None:
+            return False
+        scenario, evidence = opening.case(key, name)
+        session = Session(secrets.token_urlsafe(16), name, scenario, (), self.token_budget)
+        self.store.add(session)
+        await self.replay({
+            "scenario": scenario,
+            "evidence": evidence,
+            "difficulty": difficulty,
+            "sessionToken": session.token,
+            "seq": session.seq,
+            "response": rename_player(opening.question, OPENING_NAME, name),
+            "timestamp": now_iso(),
+        }, body, request, responder)
+        return True
+
+    async def answer(self, body, request, responder, session, name, role, difficulty, answer, history,
+                     turn, scenario_seed, incremental, first):
+        evidence = None
+        reply_future = None
+        if first or session is None:
+            # Seeded draws match index.js, so the client's pre-rendered case file matches
+            rng = Mulberry32(scenario_seed) if scenario_seed is not None else random
+            scenario = generate_scenario(rng)
+            evidence = generate_evidence(scenario, name, difficulty, rng)
+            session = Session(secrets.token_urlsafe(16), name, scenario, history, self.token_budget)
+            self.store.add(session)
+        else:
+            if incremental:
+                if turn:
+                    session.add_turn(turn["question"], turn["answer"])
+                    reply_future = asyncio.get_running_loop().create_future()
+                    session.last_reply = {"seq": session.seq, "turn": turn, "future": reply_future}
+            elif history:
+                session.reset(history)
+            session.name = name
+            self.store.resize(session)
+
+        evidence = body.get("evidenceList") or evidence or generate_evidence(session.scenario, name, difficulty)
+        messages = self.prompts.messages(session, name, role, difficulty, answer, evidence, first)
+        meta = {
+            "scenario": session.scenario,
+            "evidence": evidence,
+            "difficulty": difficulty,
+            "sessionToken": session.token,
+            "seq": session.seq,
+        }
+        context = {"scenario": session.scenario, "seq": session.seq, "name": name, "role": role,
+                   "answer": answer, "evidence": evidence, "first": first}
+
+        try:
+            async with contextlib.aclosing(self.model.stream(messages, context)) as tokens:
+                if wants_stream(body, request):
+                    await responder.start_stream()
+                    await responder.send_event(dict(meta, type="meta"))
+                    parts = []
+                    try:
+                        async for token_text in tokens:
+                            parts.append(token_text)
+                            await responder.send_event({"type": "delta", "content": token_text})
+                    except ModelError as e:
+                        logging.error("Model stream failed: %s", e.details or e.message)
+                        await responder.send_event({"type": "error", "error": "Stream interrupted. Please try again."})
+                        await responder.end_stream()
+                        return
+                    reply = dict(meta, response="".join(parts), timestamp=now_iso())
+                    settle(reply_future, reply)
+                    await responder.send_event(dict(reply, type="done"))
+                    await responder.end_stream()
+                    return
+
+                try:
+                    text = "".join([token_text async for token_text in tokens])
+                except ModelError as e:
+                    logging.error("Model call failed: %s", e.details or e.message)
+                    await responder.send_json(500, {"error": e.message, "details": e.details,
+                                                    "timestamp": now_iso()})
+                    return
+            reply = dict(meta, response=text, timestamp=now_iso())
+            settle(reply_future, reply)
+            await responder.send_json(200, reply)
+        finally:
+            settle(reply_future, None)
+
+    async def replay(self, reply, body, request, responder):
+        """Send a finished reply again, as JSON or as a one-delta event stream"""
+        if not wants_stream(body, request):
+            await responder.send_json(200, reply)
+            return
+        meta = {k: v for k, v in reply.items() if k not in ("response", "timestamp")}
+        await responder.start_stream()
+        await responder.send_event(dict(meta, type="meta"))
+        await responder.send_event({"type": "delta", "content": reply["response"]})
+        await responder.send_event(dict(reply, type="done"))
+        await responder.end_stream()
+
+
+async def serve(host, port, server):
+    listener = await asyncio.start_server(server.handle_connection, host, port, backlog=1024)
+    tasks = [asyncio.create_task(server.sweep_forever())]
+    tasks += [asyncio.create_task(server.refill_forever()) for _ in range(REFILL_WORKERS)]
+    logging.info(f"🚀 Alibi middleware running on http://{host}:{port}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        server.model.close()
+
+
+async def warm_openings(server, path, roles, difficulties):
+    """Generate openings for every case key until each has its variants, saving to `path` as it goes"""
+    cache = server.openings
+    if os.path.exists(path):
+        logging.info("Loaded %d openings from %s", cache.load(path), path)
+    keys = [(crime, method, role, difficulty) for crime in range(len(CRIME_LOCATION_PAIRS))
+            for method in range(len(METHODS)) for role in roles for difficulty in difficulties]
+    jobs = [key for key in keys for _ in range(cache.missing(key))]
+    logging.info("Generating %d openings for %d keys", len(jobs), len(keys))
+    done = 0
+
+    async def generate(key):
+        nonlocal done
+        await server.gate.acquire()
+        try:
+            opening = await server.generate_opening(key)
+        except ModelError as e:
+            logging.warning("Could not generate an opening: %s", e.details or e.message)
+            return
+        finally:
+            server.gate.release()
+        if opening is not None:
+            cache.add(key, opening)
+        done += 1
+        if done % 500 == 0:
+            cache.save(path)  # an interrupted warm-up picks up from here
+            logging.info("%d/%d openings generated", done, len(jobs))
+
+    try:
+        await asyncio.gather(*(generate(key) for key in jobs))
+    finally:
+        cache.save(path)
+        server.model.close()
+    logging.info("Saved %d openings to %s", len(cache), path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asyncio implementation of the Alibi middleware")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 3000)))
+    parser.add_argument("--model", choices=("openai", "stub"),
+                        default="openai" if os.environ.get("OPENAI_API_KEY") else "stub",
+                        help="backend (default: openai when OPENAI_API_KEY is set)")
+    parser.add_argument("--openai-model", default="gpt-4o")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    parser.add_argument("--max-session-mb", type=float, default=MAX_SESSION_BYTES / (1024 * 1024),
+                        help="cap on the estimated size of all sessions")
+    parser.add_argument("--session-ttl", type=float, default=SESSION_TTL, help="seconds a session may sit idle")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY, help="model calls in flight")
+    parser.add_argument("--queue-timeout", type=float, default=QUEUE_TIMEOUT,
+                        help="seconds a request waits for a model slot before a 503")
+    parser.add_argument("--token-budget", type=int, default=int(os.environ.get("CONVERSATION_TOKEN_BUDGET",
+                                                                               DEFAULT_TOKEN_BUDGET)))
+    openings = parser.add_argument_group("opening question cache")
+    openings.add_argument("--openings", metavar="PATH", default=os.environ.get("ALIBI_OPENINGS"),
+                          help="load cached opening questions from PATH at startup")
+    openings.add_argument("--opening-variants", type=int, default=OPENING_VARIANTS, help="variants kept per case")
+    openings.add_argument("--opening-uses", type=int, default=OPENING_USES,
+                          help="games served by one opening before it is replaced")
+    openings.add_argument("--opening-ttl", type=float, default=OPENING_TTL,
+                          help="seconds an opening is served before it is replaced")
+    openings.add_argument("--max-openings", type=int, default=MAX_OPENINGS)
+    openings.add_argument("--warm-openings", metavar="PATH",
+                          help="generate openings into PATH (adding to what it holds) and exit")
+    openings.add_argument("--warm-role", action="append", choices=SERVER_ROLES,
+                          help="repeat to pick roles to warm (default: the desktop client's roles)")
+    openings.add_argument("--warm-difficulty", action="append", choices=DIFFICULTIES,
+                          help="repeat to pick difficulties to warm (default: all)")
+    stub = parser.add_argument_group("stub model")
+    stub.add_argument("--latency", type=float, default=0.5, help="seconds to first token")
+    stub.add_argument("--tokens-per-second", type=float, default=40.0, help="streaming speed (0 = instant)")
+    stub.add_argument("--catch-rate", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    if args.model == "openai":
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            parser.error("OPENAI_API_KEY is not set (use --model stub to run offline)")
+        model = OpenAIModel(api_key, model=args.openai_model, max_concurrency=args.max_concurrency)
+    else:
+        model = StubModel(StubConfig(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                                     catch_rate=args.catch_rate))
+    store = SessionStore(max_sessions=args.max_sessions, max_bytes=int(args.max_session_mb * 1024 * 1024),
+                         ttl=args.session_ttl)
+    # Warm-up has nobody to answer 503 to, so its requests wait for a slot as long as it takes
+    gate = ModelGate(args.max_concurrency, None if args.warm_openings else args.queue_timeout)
+    cache = OpeningCache(variants=args.opening_variants, max_uses=args.opening_uses, ttl=args.opening_ttl,
+                         max_openings=args.max_openings)
+    server = MiddlewareServer(model, store, gate, token_budget=args.token_budget, openings=cache)
+    try:
+        if args.warm_openings:
+            asyncio.run(warm_openings(server, args.warm_openings, args.warm_role or VALID_ROLES,
+                                      args.warm_difficulty or DIFFICULTIES))
+            return
+        if args.openings:
+            logging.info("Loaded %d cached openings from %s", cache.load(args.openings), args.openings)
+        asyncio.run(serve(args.host, args.port, server))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,534 @@
+import gzip
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+from alibi_metrics import metrics
+
+POLL_INTERVAL_MS = 16  # ~60fps, keeps the Tk loop responsive while requests are in flight
+PROGRESS_INTERVAL = 1.0  # seconds between progress callbacks
+
+# Statuses worth sending a GET again for
+RETRY_STATUSES = {429, 502, 503, 504}
+# The server's "busy, retry after" replies: it turned the request away, so even a POST may be resent.
+# A 502/504 comes from the proxy, and the model may already have been called upstream.
+BUSY_STATUSES = {429, 503}
+
+# Request bodies smaller than this are not worth gzipping
+GZIP_MIN_BYTES = 1024
+
+
+class RequestCancelled(Exception):
+    """Raised inside a worker when its request has been cancelled"""
+
+
+class StreamError(requests.exceptions.RequestException):
+    """The middleware reported an error part-way through a stream"""
+
+
+class RequestHandle:
+    """Tracks one background request and its main-thread callbacks"""
+
+    def __init__(self, on_success=None, on_error=None, on_progress=None, on_chunk=None,
+                 progress_interval=PROGRESS_INTERVAL):
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_chunk = on_chunk
+        self.progress_interval = progress_interval
+        self.started = time.monotonic()
+        self.seat = None  # EngineSeat that submitted it, on a SharedNetworkEngine
+        self.cancelled = False
+        self.done = False
+        self.future = None
+        self._last_progress = 0.0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def cancel(self):
+        """Drop the request; its callbacks will never fire"""
+        if not self.done and not self.cancelled:
+            metrics.incr("net.cancelled")
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class NetworkEngine:
+    """Runs blocking network calls on a worker pool and hands results back to the Tk main loop.
+
+    Worker threads never touch Tk. Results are queued and drained by a
+    `master.after` poll, so every callback runs on the main thread.
+    """
+
+    def __init__(self, master, max_workers=4, poll_interval=POLL_INTERVAL_MS):
+        self.master = master
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="alibi-net")
+        self._results = queue.Queue()
+        self._pending = set()
+        self._poll_id = None
+        self._closed = False
+
+    def submit(self, func, *args, on_success=None, on_error=None, on_progress=None,
+               on_chunk=None, **kwargs):
+        """Run func(*args, **kwargs) on a worker and return a RequestHandle.
+
+        With on_chunk, func also receives an `emit` callable; every value it
+        emits is delivered to on_chunk on the main thread, in order, before
+        on_success.
+        """
+        return self._submit(None, func, args, kwargs, on_success, on_error, on_progress, on_chunk)
+
+    def _submit(self, seat, func, args, kwargs, on_success, on_error, on_progress, on_chunk):
+        if self._closed:
+            raise RuntimeError("NetworkEngine is shut down")
+        handle = RequestHandle(on_success, on_error, on_progress, on_chunk)
+        handle.seat = seat
+        if on_chunk is not None:
+            kwargs["emit"] = lambda value: self._emit(handle, value)
+        self._pending.add(handle)
+        self._start(handle, func, args, kwargs)
+        self._schedule_poll()
+        return handle
+
+    def _start(self, handle, func, args, kwargs):
+        handle.future = self._executor.submit(self._run, handle, func, args, kwargs)
+
+    def busy(self):
+        return any(not h.cancelled for h in self._pending)
+
+    def cancel_all(self):
+        for handle in list(self._pending):
+            handle.cancel()
+        self._pending.clear()
+
+    def shutdown(self):
+        self._closed = True
+        self.cancel_all()
+        if self._poll_id is not None:
+            try:
+                self.master.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _emit(self, handle, value):
+        if handle.cancelled:
+            raise RequestCancelled()
+        self._results.put((handle, "chunk", value))
+
+    def _run(self, handle, func, args, kwargs):
+        if handle.cancelled:
+            return
+        try:
+            result = func(*args, **kwargs)
+        except RequestCancelled:
+            return
+        except Exception as e:
+            self._results.put((handle, "error", e))
+        else:
+            self._results.put((handle, "success", result))
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.master.after(self.poll_interval, self._poll)
+
+    @metrics.timed("ui.network_poll")
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                handle, kind, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "chunk":
+                if not handle.cancelled:
+                    self._dispatch(handle.on_chunk, value)
+                continue
+            self._pending.discard(handle)
+            handle.done = True
+            if handle.cancelled:
+                continue
+            if kind == "error":
+                self._dispatch(handle.on_error, value)
+            else:
+                self._dispatch(handle.on_success, value)
+
+        for handle in list(self._pending):
+            if handle.cancelled:
+                self._pending.discard(handle)
+                continue
+            elapsed = handle.elapsed()
+            if handle.on_progress and elapsed - handle._last_progress >= handle.progress_interval:
+                handle._last_progress = elapsed
+                self._dispatch(handle.on_progress, elapsed)
+
+        if self._pending:
+            self._schedule_poll()
+
+    def _dispatch(self, callback, value):
+        if callback is None:
+            return
+        try:
+            callback(value)
+        except Exception:
+            logging.exception("Network callback failed")
+
+
+class SharedNetworkEngine(NetworkEngine):
+    """One worker pool and one result poll shared by several games, with fair queuing.
+
+    Each game submits through its own `seat()`, which has NetworkEngine's
+    interface. Requests wait in a queue per seat. Whenever a worker is free,
+    the seat with the fewest requests running (at most `per_seat`; ties go
+    round-robin) starts its oldest one. A seat that sends a burst
+    (warm-up, prefetch and an answer at once) can therefore never hold
+    every worker while the other players wait behind it.
+    """
+
+    def __init__(self, master, max_workers=8, per_seat=2, poll_interval=POLL_INTERVAL_MS):
+        super().__init__(master, max_workers=max_workers, poll_interval=poll_interval)
+        self.max_workers = max_workers
+        self.per_seat = per_seat
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()  # seat -> deque of (handle, func, args, kwargs, queued_at), in turn order
+        self._running = {}  # seat -> requests on a worker
+        self._active = 0
+
+    def seat(self):
+        return EngineSeat(self)
+
+    def queued(self):
+        with self._lock:
+            return sum(len(jobs) for jobs in self._queues.values())
+
+    def shutdown(self):
+        with self._lock:
+            # Under the lock so a worker finishing now cannot submit to the closing executor
+            self._closed = True
+            self._queues.clear()
+        super().shutdown()
+
+    def _start(self, handle, func, args, kwargs):
+        with self._lock:
+            self._queues.setdefault(handle.seat, deque()).append((handle, func, args, kwargs, time.monotonic()))
+        self._fill()
+
+    def _drop(self, seat):
+        with self._lock:
+            self._queues.pop(seat, None)
+
+    def _fill(self):
+        """Hand queued requests to free workers, one seat at a time"""
+        with self._lock:
+            while not self._closed and self._active < self.max_workers:
+                job = self._next_job()
+                if job is None:
+                    break
+                handle, func, args, kwargs, queued_at = job
+                self._active += 1
+                self._running[handle.seat] = self._running.get(handle.seat, 0) + 1
+                metrics.time("net.queue_wait", time.monotonic() - queued_at)
+                handle.future = self._executor.submit(self._run_seated, handle, func, args, kwargs)
+
+    def _next_job(self):
+        """Oldest request of the seat with the fewest running, earliest in turn order on a tie"""
+        chosen = None
+        for seat in list(self._queues):
+            jobs = self._queues[seat]
+            while jobs and jobs[0][0].cancelled:
+                jobs.popleft()
+            if not jobs:
+                del self._queues[seat]
+                continue
+            running = self._running.get(seat, 0)
+            if running < self.per_seat and (chosen is None or running < self._running.get(chosen, 0)):
+                chosen = seat
+        if chosen is None:
+            return None
+        jobs = self._queues[chosen]
+        job = jobs.popleft()
+        if jobs:
+            self._queues.move_to_end(chosen)  # to the back of the line
+        else:
+            del self._queues[chosen]
+        return job
+
+    def _run_seated(self, handle, func, args, kwargs):
+        try:
+            self._run(handle, func, args, kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._running[handle.seat] -= 1
+                if not self._running[handle.seat]:
+                    del self._running[handle.seat]
+            self._fill()
+
+
+class EngineSeat:
+    """One game's view of a SharedNetworkEngine; cancel_all and shutdown only touch its own requests"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._closed = False
+
+    def submit(self, func, *args, on_success=None, on_error=None, on_progress=None,
+               on_chunk=None, **kwargs):
+        if self._closed:
+            raise RuntimeError("Seat is closed")
+        return self.engine._submit(self, func, args, kwargs, on_success, on_error, on_progress, on_chunk)
+
+    def busy(self):
+        return any(h.seat is self and not h.cancelled for h in self.engine._pending)
+
+    def cancel_all(self):
+        for handle in list(self.engine._pending):
+            if handle.seat is self:
+                handle.cancel()
+
+    def shutdown(self):
+        self._closed = True
+        self.cancel_all()
+        self.engine._drop(self)
+
+
+class MiddlewareClient:
+    """Shared keep-alive HTTP client for the middleware.
+
+    One pooled `requests.Session` is reused for every call so each turn skips
+    the TCP/TLS handshake. Failures where the server never handled the
+    request (a connection that could not be opened, a 429/503 busy reply)
+    are retried with full-jitter exponential backoff. POSTs are not retried
+    after a failure that may have come once the body was sent (a dropped
+    connection, a read timeout, a 502/504 from the proxy), so a model call
+    is never paid for twice. GETs also retry those.
+    """
+
+    def __init__(self, base_url, connect_timeout=5.0, read_timeout=30.0,
+                 max_retries=2, backoff_base=0.5, backoff_cap=4.0, pool_size=4):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.gzip_requests = False  # set once the server advertises Accept-Encoding: gzip
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def interrogate(self, payload):
+        body, headers = self._encode(payload)
+        with metrics.span("http.interrogate.total"):
+            response = self._request("POST", "/interrogate", idempotent=False, data=body, headers=headers)
+            self._note_response(response, len(response.content))
+        return response
+
+    def interrogate_stream(self, payload, emit):
+        """POST with streaming enabled and emit ("meta", data) / ("delta", text) events.
+
+        Returns a StreamedResponse once the stream completes. If the server
+        answers with plain JSON instead (an error, or a build without
+        streaming) the ordinary response is returned unchanged.
+        """
+        start = time.perf_counter()
+        body, headers = self._encode(dict(payload, stream=True))
+        headers["Accept"] = "text/event-stream"
+        response = self._request("POST", "/interrogate", idempotent=False,
+                                 data=body, headers=headers, stream=True)
+        if "text/event-stream" not in response.headers.get("Content-Type", ""):
+            # Reading the body also hands the connection back to the pool
+            self._note_response(response, len(response.content))
+            return response
+
+        self._note_response(response, 0)
+        first_token = None
+        decode_time = 0.0
+        with response:
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                metrics.incr("http.bytes_received", len(line) + 1)
+                if not line or not line.startswith("data:"):
+                    continue
+                decode_start = time.perf_counter()
+                event = json.loads(line[5:].strip())
+                decode_time += time.perf_counter() - decode_start
+                kind = event.get("type")
+                if kind == "delta":
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                        metrics.time("http.interrogate.first_token", first_token)
+                    emit(("delta", event.get("content", "")))
+                elif kind == "meta":
+                    emit(("meta", event))
+                elif kind == "done":
+                    metrics.time("http.json_decode", decode_time)
+                    metrics.time("http.interrogate.total", time.perf_counter() - start)
+                    return StreamedResponse(event)
+                elif kind == "error":
+                    raise StreamError(event.get("error", "Stream failed"))
+        raise StreamError("Stream ended before the detective finished")
+
+    def rekey(self, payload):
+        """POST /session/rekey; like /interrogate, a read timeout is not retried"""
+        body, headers = self._encode(payload)
+        with metrics.span("http.rekey.total"):
+            response = self._request("POST", "/session/rekey", idempotent=False, data=body, headers=headers)
+            self._note_response(response, len(response.content))
+        return response
+
+    def health(self, timeout=None):
+        with metrics.span("http.health.total"):
+            return self._request("GET", "/health", idempotent=True, timeout=timeout or self.timeout)
+
+    def warm_up(self):
+        """Open a pooled connection and wake a sleeping host; never raises"""
+        try:
+            response = self.health()
+            logging.debug("Warm-up status: %s", response.status_code)
+            return response.ok
+        except requests.exceptions.RequestException as e:
+            logging.debug("Warm-up failed: %s", e)
+            return False
+
+    def close(self):
+        self.session.close()
+
+    def _encode(self, payload):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.gzip_requests and len(body) >= GZIP_MIN_BYTES:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        metrics.incr("http.bytes_sent", len(body))
+        logging.debug("Request body: %d bytes on the wire", len(body))
+        return body, headers
+
+    def _note_response(self, response, size):
+        metrics.incr("http.bytes_received", int(response.headers.get("Content-Length") or size))
+        if "gzip" in response.headers.get("Accept-Encoding", ""):
+            self.gzip_requests = True
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_cap)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def _request(self, method, path, idempotent, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.base_url + path
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                metrics.incr("http.errors")
+                retryable = idempotent or _never_sent(e)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logging.debug("%s %s failed (%s); retrying in %.2fs", method, path, e, delay)
+            else:
+                metrics.time("http.ttfb", response.elapsed.total_seconds())
+                metrics.incr(f"http.status.{response.status_code}")
+                retry_statuses = RETRY_STATUSES if idempotent else BUSY_STATUSES
+                if response.status_code not in retry_statuses or attempt >= self.max_retries:
+                    return response
+                delay = self.backoff(attempt, _retry_after(response))
+                logging.debug("%s %s returned %s; retrying in %.2fs", method, path, response.status_code, delay)
+                response.close()
+            attempt += 1
+            metrics.incr("http.retries")
+            time.sleep(delay)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        metrics.time("http.connect", time.perf_counter() - start)
+        metrics.incr("http.connections_opened")
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        metrics.time("http.connect", time.perf_counter() - start)
+        metrics.incr("http.connections_opened")
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections record their connect (TCP + TLS) time.
+
+    Reused keep-alive connections never call connect(), so
+    http.connections_opened also shows how well pooling is working.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class StreamedResponse:
+    """Final payload of a finished stream, shaped like a successful requests.Response"""
+
+    status_code = 200
+    ok = True
+
+    def __init__(self, data):
+        self._data = data
+
+    @property
+    def text(self):
+        return json.dumps(self._data)
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        pass
+
+
+def _never_sent(error):
+    """True if a requests error came while connecting, before any of the request went out"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+        return False
+    reason = getattr(error.args[0], "reason", error.args[0])  # MaxRetryError wraps the urllib3 error
+    return isinstance(reason, ConnectTimeoutError)  # NewConnectionError included
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,132 @@
+"""Opt-in per-turn profiling of the desktop client: where each turn's time and memory went.
+
+A turn runs from the player's answer (`submit_answer`) until the next
+question is on screen, or until the end screen is up. Each turn is run under
+cProfile, and a tracemalloc snapshot is compared with the previous turn's.
+One JSON line per turn goes to the profile file. It holds the turn's wall
+time, the top functions by cumulative and by own time, the source lines
+whose allocations grew the most, and the traced memory (current and peak).
+Comparing the lines from turn 5 and turn 50 shows what gets slower or
+bigger as the game goes on.
+
+cProfile only sees the Tk thread. That is the thread whose stalls the
+player feels; request time on the network workers is in the metrics
+snapshot.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+
+DEFAULT_PATH = "alibi_profile.jsonl"
+TOP = 15  # hotspots and allocation sites kept per turn
+TRACE_FRAMES = 1  # one frame per allocation keeps tracemalloc's own overhead low
+IGNORED = (__file__, tracemalloc.__file__, cProfile.__file__, pstats.__file__, "<frozen importlib._bootstrap>",
+           "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+def describe(key):
+    filename, line, name = key
+    if filename == "~":
+        return name  # C functions: "<built-in method ...>"
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+class TurnProfiler:
+    """Runs one cProfile per turn and diffs tracemalloc snapshots between turns"""
+
+    def __init__(self, path=DEFAULT_PATH, top=TOP):
+        self.path = path
+        self.top = top
+        self.enabled = False
+        self.turn = 0
+        self._profile = None
+        self._started = None
+        self._snapshot = None
+        self._started_tracing = False
+
+    def start(self):
+        if self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._started_tracing = True
+        self._snapshot = self._take_snapshot()
+        self.enabled = True
+        logging.info("Profiling each turn to %s", self.path)
+
+    def stop(self):
+        if not self.enabled:
+            return
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._snapshot = None
+        self.enabled = False
+        logging.info("Profiling stopped after %d turns", self.turn)
+
+    def toggle(self):
+        if self.enabled:
+            self.stop()
+        else:
+            self.start()
+        return self.enabled
+
+    def begin_turn(self):
+        if not self.enabled or self._profile is not None:
+            return
+        self._profile = cProfile.Profile()
+        self._started = time.perf_counter()
+        try:
+            self._profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one profiler per thread; another kiosk seat's turn has it
+            self._profile = None
+
+    def end_turn(self, **context):
+        """Close the open turn and append its line; `context` (turn count, outcome, ...) is included"""
+        if self._profile is None:
+            return
+        self._profile.disable()
+        seconds = time.perf_counter() - self._started
+        profile, self._profile = self._profile, None
+        self.turn += 1
+
+        snapshot = self._take_snapshot()
+        growth = snapshot.compare_to(self._snapshot, "lineno")[:self.top]
+        self._snapshot = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        stats = pstats.Stats(profile).stats
+        rows = [(key, calls, own, cumulative) for key, (_, calls, own, cumulative, _) in stats.items()]
+        entry = dict({"turn": self.turn, "seconds": round(seconds, 4)}, **context)
+        entry["cumulative"] = [self._row(row) for row in sorted(rows, key=lambda r: r[3], reverse=True)[:self.top]]
+        entry["own"] = [self._row(row) for row in sorted(rows, key=lambda r: r[2], reverse=True)[:self.top]]
+        entry["memory"] = {
+            "current_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "growth": [{"where": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                        "size_kb": round(stat.size_diff / 1024, 2), "count": stat.count_diff}
+                       for stat in growth if stat.size_diff],
+        }
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        except OSError as e:
+            logging.error("Could not write profile: %s", e)
+
+    def _row(self, row):
+        key, calls, own, cumulative = row
+        return {"func": describe(key), "calls": calls, "own_ms": round(own * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3)}
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in IGNORED])
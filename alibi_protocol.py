@@ -0,0 +1,95 @@
+"""Payloads for the middleware's /interrogate contract.
+
+Shared by the Tk client and the headless tooling so both speak exactly the
+same protocol.
+"""
+import secrets
+
+from alibi_transcript import count_turns
+
+VALID_ROLES = [
+    "Driver", "Lookout", "Hacker", "Muscle",
+    "Inside Man", "Mastermind", "Tech Specialist", "Demolitions Expert"
+]
+DIFFICULTIES = ["Easy", "Medium", "Hard", "Expert"]
+CAUGHT_PHRASE = "i caught you in a lie because"
+PROVISIONAL_PREFIX = "Suspect-"
+
+
+def build_opening_payload(name, role, difficulty, conversation_history=(), context=(),
+                          player_answer="", first=True, scenario_seed=None):
+    """Payload for start_interrogation (the opening question, or a full restart).
+
+    `scenario_seed` asks the server to derive the scenario and opening
+    evidence from that seed (see alibi_scenario.generate_case).
+    """
+    payload = {
+        "playerName": name,
+        "role": role,
+        "difficulty": difficulty,
+        "conversationHistory": list(conversation_history),
+        "context": list(context),
+        "playerResponse": player_answer,
+        "startInterrogation": first
+    }
+    if scenario_seed is not None:
+        payload["scenarioSeed"] = scenario_seed
+    return payload
+
+
+def build_answer_payload(name, role, difficulty, answer, conversation_history, context,
+                         session_token=None, turn=None, full=None, seq=None):
+    """Payload for one answered (or timed-out) question.
+
+    Once the server has issued a session token only the new turn is sent;
+    `full=True` forces the whole transcript for a resync. `seq` defaults to
+    the number of turns in `conversation_history`.
+    """
+    if full is None:
+        full = session_token is None
+    payload = {
+        "playerName": name,
+        "role": role,
+        "difficulty": difficulty,
+        "playerResponse": answer,
+        "startInterrogation": False
+    }
+    if full:
+        payload["conversationHistory"] = list(conversation_history)
+        payload["context"] = list(context)
+        if session_token is not None:
+            # Servers that key sessions by token find the session to resync with it
+            payload["sessionToken"] = session_token
+    else:
+        payload["sessionToken"] = session_token
+        payload["seq"] = count_turns(conversation_history) if seq is None else seq
+        payload["turn"] = turn
+    return payload
+
+
+def provisional_name():
+    """Stand-in player name for an opening question prefetched before the real one is known"""
+    return f"{PROVISIONAL_PREFIX}{secrets.token_hex(3)}"
+
+
+def rename_player(value, old_name, new_name):
+    """Replace a provisional name in a string or list of strings returned by the server"""
+    if isinstance(value, str):
+        return value.replace(old_name, new_name)
+    if isinstance(value, list):
+        return [rename_player(v, old_name, new_name) for v in value]
+    return value
+
+
+def build_rekey_payload(old_name, new_name, session_token):
+    """Payload for /session/rekey, which moves a prefetched session to the final name"""
+    return {
+        "playerName": old_name,
+        "newPlayerName": new_name,
+        "sessionToken": session_token
+    }
+
+
+def is_caught(response_text):
+    """True when the detective opens with the catch phrase"""
+    return response_text.lower().strip().startswith(CAUGHT_PHRASE)
@@ -0,0 +1,458 @@
+"""Record a desktop session's middleware traffic and replay it headlessly under a virtual clock.
+
+Recording (`python alibi_game.py --record session.jsonl`, or ALIBI_RECORD)
+appends one compact JSON line per request/response exchange and per
+player action. Each line carries its offset in seconds from the start of
+the session, the request payload, the status, the body, any streamed
+events with their offsets, and the error if the call failed.
+
+Replay runs the real client (alibi_game) on alibi_headless's display-free
+widgets. Recorded player actions are fed back at their recorded times,
+and each request is answered from the recording after its recorded
+latency. Everything is driven by a virtual clock, so the 2-minute answer
+timer and 20-minute game timer take no real time:
+
+    python alibi_replay.py replay session.jsonl [--speed 4] [--report report.json]
+    python alibi_replay.py summary session.jsonl [other.jsonl]
+
+`replay` exits non-zero if the client sent different requests than it did
+when recorded, a callback raised, or the game ended differently. `summary`
+prints latency percentiles per operation; given two recordings it prints
+both side by side with the change, to compare builds.
+"""
+import argparse
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from alibi_metrics import Histogram
+
+FORMAT_VERSION = 1
+# Request fields compared during replay; provisional prefetch names differ per run
+COMPARED_FIELDS = ("playerResponse", "difficulty", "role", "startInterrogation", "seq", "turn",
+                   "newPlayerName")
+
+
+class Recorder:
+    """Append-only session log; with no path, entries are kept in memory"""
+
+    def __init__(self, path=None, clock=time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.started = clock()
+        self.entries = []
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1) if path else None
+        self._write({"k": "header", "v": FORMAT_VERSION,
+                     "at": datetime.now(timezone.utc).isoformat(timespec="seconds")})
+
+    def now(self):
+        return round(self.clock() - self.started, 4)
+
+    def action(self, action, **fields):
+        self._write(dict({"k": "ui", "t": self.now(), "a": action}, **fields))
+
+    def exchange(self, entry):
+        self._write(dict({"k": "net"}, **entry))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, entry):
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+            elif self.path is None:
+                self.entries.append(entry)
+
+
+class RecordingClient:
+    """Wraps the middleware client and logs every exchange; calls run on network worker threads"""
+
+    def __init__(self, client, recorder):
+        self.client = client
+        self.recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def interrogate(self, payload, **kwargs):
+        return self._record("interrogate", payload, lambda: self.client.interrogate(payload, **kwargs))
+
+    def interrogate_stream(self, payload, emit, **kwargs):
+        start = self.recorder.now()
+        events = []
+
+        def tap(event):
+            events.append([round(self.recorder.now() - start, 4), event[0], event[1]])
+            emit(event)
+        return self._record("interrogate_stream", payload,
+                            lambda: self.client.interrogate_stream(payload, tap, **kwargs), start, events)
+
+    def rekey(self, payload, **kwargs):
+        return self._record("rekey", payload, lambda: self.client.rekey(payload, **kwargs))
+
+    def _record(self, op, payload, call, start=None, events=None):
+        from alibi_net import StreamedResponse
+        start = self.recorder.now() if start is None else start
+        entry = {"t": start, "op": op, "req": payload}
+        try:
+            response = call()
+        except Exception as e:
+            entry.update(lat=round(self.recorder.now() - start, 4), err={"type": type(e).__name__, "msg": str(e)})
+            if events:
+                entry["ev"] = events
+            self.recorder.exchange(entry)
+            raise
+        entry.update(lat=round(self.recorder.now() - start, 4), st=response.status_code)
+        try:
+            entry["body"] = response.json()
+        except ValueError:
+            entry["text"] = response.text
+        if isinstance(response, StreamedResponse):
+            entry["sr"] = 1
+        if events:
+            entry["ev"] = events
+        if getattr(response, "endpoint", None):
+            entry["ep"] = response.endpoint
+        self.recorder.exchange(entry)
+        return response
+
+
+def load(path):
+    """(header, actions, exchanges) from a recording, in file order"""
+    header, actions, exchanges = {}, [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            kind = entry.get("k")
+            if kind == "header":
+                header = entry
+            elif kind == "ui":
+                actions.append(entry)
+            elif kind == "net":
+                exchanges.append(entry)
+    return header, actions, exchanges
+
+
+class ReplayResponse:
+    """Recorded non-streamed reply, shaped like the parts of requests.Response the client reads"""
+
+    def __init__(self, entry):
+        self.status_code = entry.get("st", 0)
+        self.ok = 200 <= self.status_code < 400
+        self.headers = {}
+        self._body = entry.get("body")
+        self.text = json.dumps(self._body) if "body" in entry else entry.get("text", "")
+        self.content = self.text.encode("utf-8")
+        self.endpoint = entry.get("ep")
+
+    def json(self):
+        if self._body is None:
+            raise ValueError("Recorded response was not JSON")
+        return self._body
+
+    def raise_for_status(self):
+        import requests
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error (replayed)", response=self)
+
+
+class Scripted:
+    """What a replayed call produces and when, relative to when it was made"""
+
+    def __init__(self, latency=0.0, events=(), response=None, error=None):
+        self.latency = latency
+        self.events = events
+        self.response = response
+        self.error = error
+
+
+def rebuild_error(err):
+    import requests
+    import alibi_net
+    cls = (getattr(requests.exceptions, err.get("type", ""), None)
+           or getattr(alibi_net, err.get("type", ""), None))
+    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+        cls = requests.exceptions.RequestException
+    return cls(err.get("msg", ""))
+
+
+class ReplayClient:
+    """Answers each call with the next recorded exchange for the same operation"""
+
+    def __init__(self, exchanges):
+        self.queues = collections.defaultdict(collections.deque)
+        # Lines are written as calls finish; replay hands them out in the order they started
+        for entry in sorted(exchanges, key=lambda entry: entry["t"]):
+            self.queues[entry["op"]].append(entry)
+        self.replayed = 0
+        self.divergences = []
+        self.clock = None
+
+    def interrogate(self, payload, **kwargs):
+        return self._take("interrogate", payload)
+
+    def interrogate_stream(self, payload, emit=None, **kwargs):
+        return self._take("interrogate_stream", payload)
+
+    def rekey(self, payload, **kwargs):
+        return self._take("rekey", payload)
+
+    def warm_up(self):
+        return True
+
+    def close(self):
+        pass
+
+    def remaining(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _take(self, op, payload):
+        import alibi_net
+        queue = self.queues[op]
+        if not queue:
+            self._diverge(op, "missing", "a recorded exchange", "an extra request")
+            return Scripted(error=alibi_net.RequestCancelled())
+        entry = queue.popleft()
+        self.replayed += 1
+        recorded = entry.get("req", {})
+        for field in COMPARED_FIELDS:
+            if recorded.get(field) != payload.get(field):
+                self._diverge(op, field, recorded.get(field), payload.get(field))
+        if len(recorded.get("conversationHistory") or ()) != len(payload.get("conversationHistory") or ()):
+            self._diverge(op, "conversationHistory", len(recorded.get("conversationHistory") or ()),
+                          len(payload.get("conversationHistory") or ()))
+
+        # The prefetch runs under a random provisional name; answer under this run's one
+        old_name, new_name = recorded.get("playerName"), payload.get("playerName")
+        if old_name and new_name and old_name != new_name:
+            entry = json.loads(json.dumps(entry).replace(json.dumps(old_name)[1:-1], json.dumps(new_name)[1:-1]))
+
+        if "err" in entry:
+            return Scripted(entry.get("lat", 0.0), entry.get("ev", ()), error=rebuild_error(entry["err"]))
+        if entry.get("sr"):
+            response = alibi_net.StreamedResponse(entry.get("body"))
+            response.endpoint = entry.get("ep")
+        else:
+            response = ReplayResponse(entry)
+        return Scripted(entry.get("lat", 0.0), entry.get("ev", ()), response)
+
+    def _diverge(self, op, field, recorded, replayed):
+        self.divergences.append({"t": self.clock() if self.clock else None, "op": op, "field": field,
+                                 "recorded": recorded, "replayed": replayed})
+
+
+class ReplayHandle:
+    def __init__(self, master):
+        self.master = master
+        self.after_ids = []
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        self.cancelled = True
+        for after_id in self.after_ids:
+            self.master.after_cancel(after_id)
+
+
+class ReplayEngine:
+    """NetworkEngine stand-in: delivers recorded events and results at their recorded offsets"""
+
+    def __init__(self, master):
+        self.master = master
+        self._pending = set()
+
+    def submit(self, func, *args, on_success=None, on_error=None, on_progress=None, on_chunk=None, **kwargs):
+        handle = ReplayHandle(self.master)
+        if on_chunk is not None:
+            kwargs["emit"] = on_chunk
+
+        def start():
+            # Like a worker picking the call up: one cancelled straight away never reaches the client
+            if handle.cancelled:
+                return
+            result = func(*args, **kwargs)
+            if not isinstance(result, Scripted):
+                result = Scripted(response=result)
+            import alibi_net
+            if on_chunk is not None:
+                for offset, kind, value in result.events:
+                    self._at(handle, offset, on_chunk, (kind, value))
+            if isinstance(result.error, alibi_net.RequestCancelled):
+                return  # the client cancelled it part way when recorded, and will again
+            if result.error is not None:
+                self._at(handle, result.latency, on_error, result.error, final=True)
+            else:
+                self._at(handle, result.latency, on_success, result.response, final=True)
+
+        handle.after_ids.append(self.master.after(0, start))
+        self._pending.add(handle)
+        return handle
+
+    def busy(self):
+        return any(not h.cancelled and not h.done for h in self._pending)
+
+    def cancel_all(self):
+        for handle in list(self._pending):
+            handle.cancel()
+        self._pending.clear()
+
+    def shutdown(self):
+        self.cancel_all()
+
+    def _at(self, handle, offset, callback, value, final=False):
+        def fire():
+            if handle.cancelled:
+                return
+            if final:
+                handle.done = True
+                self._pending.discard(handle)
+            if callback is not None:
+                callback(value)
+        handle.after_ids.append(self.master.after(int(round(offset * 1000)), fire))
+
+
+def perform(game, action):
+    """Repeat one recorded player action"""
+    import tkinter as tk
+    name = action["a"]
+    if name == "setup":
+        game.role = action.get("role", game.role)
+        game.get_player_info()
+    elif name == "difficulty":
+        game.select_difficulty(action["value"])
+    elif name == "start":
+        game.submit_player_info(action["name"], action["difficulty"])
+    elif name == "answer":
+        game.answer_entry.delete(0, tk.END)
+        game.answer_entry.insert(0, action["text"])
+        game.submit_answer()
+    elif name == "restart":
+        game.restart_game()
+    elif name == "close":
+        game.on_close()
+
+
+def replay(path, speed=None, metrics_path=os.devnull):
+    """Run a recording through the real client on headless widgets and return a report dict"""
+    import alibi_headless
+    alibi_headless.install()
+    alibi_headless.dialogs.clear()
+    import alibi_game
+
+    header, actions, exchanges = load(path)
+    alibi_game.METRICS_PATH = metrics_path
+    root = alibi_headless.Tk(speed=speed)
+    recorder = Recorder(clock=root.loop.clock)
+    client = ReplayClient(exchanges)
+    client.clock = root.loop.clock
+    game = alibi_game.AlibiGame(root, clock=root.loop.clock, recorder=recorder, client=client,
+                                network=ReplayEngine(root))
+    for action in actions:
+        if action["a"] != "end":
+            root.after(int(round(action["t"] * 1000)), perform, game, action)
+
+    wall_start = time.perf_counter()
+    root.loop.run()
+    wall = time.perf_counter() - wall_start
+
+    recorded_end = [{k: a[k] for k in a if k not in ("k", "t")} for a in actions if a["a"] == "end"]
+    replayed_end = [{k: a[k] for k in a if k not in ("k", "t")} for a in recorder.entries if a.get("a") == "end"]
+    report = {
+        "recording": path,
+        "recorded_at": header.get("at"),
+        "virtual_seconds": round(root.loop.now, 3),
+        "wall_seconds": round(wall, 3),
+        "callbacks": root.loop.processed,
+        "actions": len(actions),
+        "exchanges": len(exchanges),
+        "replayed": client.replayed,
+        "unused": client.remaining(),
+        "turns": len(game.transcript),
+        "outcome": {"recorded": recorded_end, "replayed": replayed_end},
+        "divergences": client.divergences,
+        "errors": root.loop.errors,
+        "dialogs": [list(d) for d in alibi_headless.dialogs],
+    }
+    report["ok"] = (not client.divergences and not root.loop.errors and not client.remaining()
+                    and recorded_end == replayed_end)
+    return report
+
+
+def summarize(path):
+    """Latency percentiles (ms) per operation, plus time to first token for streams"""
+    _, actions, exchanges = load(path)
+    histograms = collections.defaultdict(lambda: Histogram(1000, "ms"))
+    errors = collections.Counter()
+    for entry in exchanges:
+        histograms[entry["op"]].record(entry.get("lat", 0.0) * 1000.0)
+        first = next((offset for offset, kind, _ in entry.get("ev", ()) if kind == "delta"), None)
+        if first is not None:
+            histograms[entry["op"] + ".first_token"].record(first * 1000.0)
+        if entry.get("err", {}).get("type", "RequestCancelled") != "RequestCancelled" or entry.get("st", 200) >= 400:
+            errors[entry["op"]] += 1
+    summary = {}
+    for name, histogram in sorted(histograms.items()):
+        summary[name] = {"count": histogram.count, "mean": round(histogram.total / histogram.count / 1000.0, 3),
+                         "p50": histogram.percentile(50), "p95": histogram.percentile(95),
+                         "p99": histogram.percentile(99), "max": histogram.max / 1000.0,
+                         "errors": errors.get(name, 0)}
+    return {"recording": path, "answers": sum(1 for a in actions if a["a"] == "answer"), "ops": summary}
+
+
+def compare(before, after):
+    """Side-by-side summaries with the change in each statistic"""
+    ops = {}
+    for name in sorted(set(before["ops"]) | set(after["ops"])):
+        a, b = before["ops"].get(name, {}), after["ops"].get(name, {})
+        ops[name] = {stat: {"before": a.get(stat), "after": b.get(stat),
+                            "change": round(b[stat] - a[stat], 3) if a.get(stat) is not None
+                            and b.get(stat) is not None else None}
+                     for stat in ("count", "mean", "p50", "p95", "p99", "max", "errors")}
+    return {"before": before["recording"], "after": after["recording"], "ops": ops}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("replay", help="replay a recording headlessly")
+    run.add_argument("recording")
+    run.add_argument("--speed", type=float, default=None,
+                     help="multiple of real time to run at (default: as fast as possible)")
+    run.add_argument("--report", help="also write the JSON report here")
+    run.add_argument("--metrics", default=os.devnull, help="where the client's metrics snapshot goes")
+    stats = commands.add_parser("summary", help="latency summary of one recording, or two compared")
+    stats.add_argument("recording")
+    stats.add_argument("other", nargs="?")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="[%(levelname)s] %(message)s")
+    if args.command == "replay":
+        result = replay(args.recording, speed=args.speed, metrics_path=args.metrics)
+    elif args.other:
+        result = compare(summarize(args.recording), summarize(args.other))
+    else:
+        result = summarize(args.recording)
+    text = json.dumps(result, indent=2)
+    print(text)
+    if getattr(args, "report", None):
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0 if result.get("ok", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Scenario and evidence generation, mirroring the tables in index.js.
+
+Every function takes an explicit generator with a `random()` method, either
+a `random.Random` or a `Mulberry32`. With `Mulberry32(seed)` the draws are
+identical to index.js's `mulberry32(seed)`, so a client that proposes a
+`scenarioSeed` can render the same case file the server will use.
+"""
+import random
+
+MASK32 = 0xFFFFFFFF
+
+CRIME_LOCATION_PAIRS = [
+    ("Bank Vault Heist", "Central Bank downtown"),
+    ("Jewelry Store Robbery", "Diamond District"),
+    ("Art Museum Theft", "Modern Art Gallery"),
+    ("Casino Cash Grab", "Royal Casino"),
+    ("Tech Company Break-in", "Silicon Valley Tech Campus"),
+    ("Pharmaceutical Warehouse Raid", "Downtown Medical District"),
+    ("Auction House Theft", "High-End Auction House"),
+    ("Diamond Exchange Robbery", "International Diamond Exchange"),
+    ("Armored Truck Heist", "Fort Knox Military Base"),
+    ("ATM Robbery", "Local Credit Union"),
+    ("Safe Deposit Box Theft", "Central Bank downtown"),
+    ("Cash Register Robbery", "Shopping Mall"),
+    ("Gas Station Robbery", "Gas Station"),
+]
+
+METHODS = [
+    "Drilled through the back wall", "Used explosives on the front door", "Cut through the skylight",
+    "Hacked the security system", "Used crowbars to break in", "Deployed sleeping gas",
+    "Used angle grinders to cut through metal", "Employed diamond-tipped drills", "Used lockpicking tools",
+    "Deployed smoke bombs to disable cameras", "Used sledgehammers to break windows", "Used bolt cutters on locks",
+    "Used thermal lances to cut through steel", "Deployed EMP devices to disable electronics",
+    "Used hydraulic jacks to force entry", "Employed laser cutting equipment", "Used plasma torches",
+    "Deployed distraction devices", "Used ultrasonic cutting tools", "Employed robotic assistance",
+    "Used chemical compounds to weaken structures", "Deployed drones for reconnaissance",
+    "Used sound dampening equipment", "Employed thermal imaging to find weak points",
+    "Used magnetic locks to bypass security", "Deployed smoke screens for cover",
+]
+
+# Every role index.js accepts (the desktop client only picks from the first eight)
+SERVER_ROLES = [
+    "Driver", "Lookout", "Hacker", "Muscle", "Inside Man", "Mastermind", "Tech Specialist",
+    "Demolitions Expert", "Scout", "Communications Specialist", "Safecracker", "Surveillance Expert",
+    "Escape Artist", "Infiltration Specialist", "Tactical Coordinator", "Logistics Manager",
+]
+
+# (start hour, end hour) ranges; hours past 24 wrap into the early morning
+TIME_RANGES = [(22, 28), (20, 24), (0, 6), (14, 18), (8, 12)]
+
+EASY_EVIDENCE = [
+    "A car similar to one registered to {name} was seen in the general area that day",
+    "Someone thought they saw a person matching your description a few blocks away from {location}",
+    "You were reportedly in the city on the day of the incident",
+    "A neighbor mentioned seeing you earlier that week, but couldn't recall the exact day",
+    "A receipt shows you made a purchase at a store in the same city earlier that day",
+    "A social media post places you somewhere in town, but not at the scene",
+    "A friend said you mentioned being near {location} recently, but wasn't sure when",
+    "A car matching yours was seen driving past a nearby intersection",
+    "A vague tip suggested you might have been in the area, but nothing confirmed",
+    "A distant security camera caught a blurry figure that could possibly be you, but it's unclear",
+]
+
+NORMAL_EVIDENCE = [
+    "An eyewitness reported seeing someone matching your description near {location} around the time of the incident",
+    "A receipt shows you made a purchase at a store close to {location} shortly before the incident",
+    "A single security camera caught a person resembling you walking near {location}",
+    "A neighbor saw your car parked a few blocks from {location}",
+    "A friend said you mentioned being in the area that day",
+    "A bus ticket places you in the neighborhood earlier that day",
+    "A store clerk remembers seeing you, but isn't certain of the time",
+    "A partial license plate match was reported near the scene",
+    "A witness saw someone with your build and hair color near the scene",
+    "A phone ping places you somewhere in the neighborhood, but not at the scene",
+]
+
+HARD_EVIDENCE = [
+    "Two witnesses independently reported seeing you near {location} at the time of the incident",
+    "A security camera caught you walking within a block of {location} at the time of the incident",
+    "Your phone pinged a tower very close to {location} at the time of the incident",
+    "A partial fingerprint match was found on an object near the scene",
+    "A neighbor saw you leaving the area shortly after the incident",
+    "A store receipt shows you made a purchase at a shop next to {location} minutes before the incident",
+    "A rideshare record shows you were dropped off near {location}",
+    "A witness saw you talking to someone near the scene",
+    "A camera caught your car driving past {location} at the time of the incident",
+    "A partial DNA match was found on an item left near the scene",
+]
+
+EXPERT_EVIDENCE = [
+    "A security camera clearly shows you at {location} at the exact time of the incident",
+    "Your fingerprints were found on the door at {location}",
+    "Your DNA was found at the scene",
+    "Multiple witnesses identified you as being at {location} at the time of the incident",
+    "Your phone GPS data places you at {location} at the exact time",
+    "A digital record shows you accessed a device at {location}",
+    "A bank transaction places you at the scene at the exact time",
+    "A police officer saw you at {location} during the incident",
+    "A direct message from your account references the incident at {location}",
+    "A video shows you entering or leaving {location} at the time of the incident",
+]
+
+EVIDENCE_POOLS = {
+    "Easy": EASY_EVIDENCE,
+    "Normal": NORMAL_EVIDENCE,
+    "Medium": NORMAL_EVIDENCE,
+    "Hard": HARD_EVIDENCE,
+    "Expert": EXPERT_EVIDENCE,
+}
+
+
+class Mulberry32:
+    """Port of index.js's mulberry32, bit for bit"""
+
+    def __init__(self, seed):
+        self.state = seed & MASK32
+
+    def random(self):
+        self.state = (self.state + 0x6D2B79F5) & MASK32
+        t = self.state
+        t = ((t ^ (t >> 15)) * (t | 1)) & MASK32
+        t ^= (t + (((t ^ (t >> 7)) * (t | 61)) & MASK32)) & MASK32
+        return (t ^ (t >> 14)) / 4294967296
+
+
+def new_seed(rng=random):
+    return rng.getrandbits(32)
+
+
+def _index(rng, n):
+    # Math.floor(rand() * n), the only way index.js draws
+    return int(rng.random() * n)
+
+
+def sample(rng, pool, count):
+    """Unbiased partial Fisher-Yates, drawing exactly as index.js's sample()"""
+    items = list(pool)
+    count = min(count, len(items))
+    for i in range(count):
+        j = i + _index(rng, len(items) - i)
+        items[i], items[j] = items[j], items[i]
+    return items[:count]
+
+
+def generate_random_time(rng=random):
+    start, end = TIME_RANGES[_index(rng, len(TIME_RANGES))]
+    hour = _index(rng, end - start) + start
+    minute = _index(rng, 60)
+
+    ampm = "AM" if hour >= 24 else ("PM" if hour >= 12 else "AM")
+    display_hour = hour - 24 if hour >= 24 else (hour - 12 if hour > 12 else hour)
+    final_hour = 12 if display_hour == 0 else display_hour
+    return f"{final_hour}:{minute:02d} {ampm}"
+
+
+def generate_scenario(rng=random):
+    crime, location = CRIME_LOCATION_PAIRS[_index(rng, len(CRIME_LOCATION_PAIRS))]
+    method = METHODS[_index(rng, len(METHODS))]
+    return {
+        "crime": crime,
+        "location": location,
+        "time": generate_random_time(rng),
+        "method": method,
+    }
+
+
+def evidence_count(difficulty, rng=random):
+    """3-4 pieces for Easy/Normal, 4-5 for Hard, 5-6 for Expert, 3 for anything else"""
+    if difficulty == "Hard":
+        return 4 + _index(rng, 2)
+    if difficulty == "Expert":
+        return 5 + _index(rng, 2)
+    if difficulty in EVIDENCE_POOLS:
+        return 3 + _index(rng, 2)
+    return 3
+
+
+def generate_case(seed, player_name, difficulty):
+    """Scenario plus opening evidence for a scenarioSeed, as index.js derives them"""
+    rng = Mulberry32(seed)
+    scenario = generate_scenario(rng)
+    return scenario, generate_evidence(scenario, player_name, difficulty, rng)
+
+
+def generate_evidence(scenario, player_name, difficulty, rng=random):
+    pool = EVIDENCE_POOLS.get(difficulty, NORMAL_EVIDENCE)
+    count = evidence_count(difficulty, rng)
+    picked = sample(rng, pool, count)
+    return [e.format(name=player_name, location=scenario["location"]) for e in picked]
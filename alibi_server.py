@@ -0,0 +1,568 @@
+"""Local stand-in for the middleware, for offline testing and benchmarking.
+
+Implements the same /interrogate, /health and /debug/sessions contract as
+index.js (including streaming, incremental turns and gzip) but answers with
+templated detective lines instead of calling OpenAI. Latency, streaming
+speed and error injection are configurable, and every decision is drawn
+from a per-request RNG seeded by (seed, player, turn), so runs are
+reproducible regardless of how requests interleave. Session tokens are
+the exception: they are random, so a new game under the same name never
+accepts turns meant for the old one.
+
+Usage:
+    python alibi_server.py --port 3000 --latency 0.8 --tokens-per-second 30 --error-429 0.05
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import random
+import uuid
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from alibi_protocol import DIFFICULTIES
+from alibi_scenario import SERVER_ROLES, Mulberry32, generate_evidence, generate_scenario
+from alibi_transcript import Transcript, count_turns
+
+GZIP_MIN_BYTES = 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+OPENING_LINES = [
+    "Let's start simple, {name}. Where were you at {time} on the night of the {crime}?",
+    "{name}, you're here about the {crime} at {location}. Walk me through your evening, hour by hour.",
+    "We know the crew {method_lower}. As the suspected {role}, tell me where you were when it happened.",
+    "Sit down, {name}. {evidence} Care to explain that?",
+]
+
+FOLLOW_UP_LINES = [
+    "You said \"{answer}\". Then explain this: {evidence_lower}.",
+    "And who can confirm that? Because {evidence_lower}.",
+    "That doesn't line up with what we have. {evidence} Try again.",
+    "Let's go back. What time did you leave, exactly, and where did you go next?",
+    "You keep saying \"{answer}\". The {crime} happened at {time}. Where were you then?",
+]
+
+CAUGHT_LINE = "I caught you in a lie because you told me \"{answer}\", but {evidence_lower}."
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def lower_first(text):
+    return text[:1].lower() + text[1:]
+
+
+class StubConfig:
+    """Knobs for latency, streaming speed and fault injection"""
+
+    def __init__(self, latency=0.5, jitter=0.0, tokens_per_second=40.0, seed=0,
+                 catch_rate=0.1, catch_after=2, error_timeout=0.0, error_429=0.0,
+                 error_500=0.0, error_session=0.0, hang_seconds=120.0):
+        self.latency = latency                    # seconds before the first token
+        self.jitter = jitter                      # +/- seconds added to latency
+        self.tokens_per_second = tokens_per_second
+        self.seed = seed
+        self.catch_rate = catch_rate              # chance the detective catches a lie
+        self.catch_after = catch_after            # ...but never before this many turns
+        self.error_timeout = error_timeout        # chance a request hangs for hang_seconds
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.error_session = error_session        # chance of a "Session not found" reply
+        self.hang_seconds = hang_seconds
+
+
+class StubDetective:
+    """Templated stand-in for the model: picks a line and paces it like a real completion"""
+
+    def __init__(self, config):
+        self.config = config
+
+    def reply(self, rng, session, player_name, role, answer, evidence, first):
+        scenario = session["scenario"]
+        fields = {
+            "name": player_name,
+            "role": role,
+            "crime": scenario["crime"],
+            "location": scenario["location"],
+            "time": scenario["time"],
+            "method_lower": lower_first(scenario["method"]),
+            "answer": (answer or "nothing")[:80],
+            "evidence": rng.choice(evidence) + "." if evidence else "",
+            "evidence_lower": lower_first(rng.choice(evidence)) if evidence else "we have a witness",
+        }
+        if first:
+            return rng.choice(OPENING_LINES).format(**fields)
+        if session["seq"] >= self.config.catch_after and rng.random() < self.config.catch_rate:
+            return CAUGHT_LINE.format(**fields)
+        return rng.choice(FOLLOW_UP_LINES).format(**fields)
+
+    def first_token_delay(self, rng):
+        jitter = rng.uniform(-self.config.jitter, self.config.jitter) if self.config.jitter else 0.0
+        return max(0.0, self.config.latency + jitter)
+
+    def tokens(self, text):
+        """Split text into word-sized tokens that concatenate back to the original"""
+        words = text.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    async def stream(self, rng, text):
+        await asyncio.sleep(self.first_token_delay(rng))
+        interval = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+        for i, token in enumerate(self.tokens(text)):
+            if i and interval:
+                await asyncio.sleep(interval)
+            yield token
+
+    async def complete(self, rng, text):
+        async for _ in self.stream(rng, text):
+            pass
+        return text
+
+
+class Request:
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        body = self.body
+        if self.headers.get("content-encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body.decode("utf-8")) if body else {}
+
+
+class Responder:
+    """Writes one HTTP/1.1 response, either a whole JSON body or a chunked event stream"""
+
+    def __init__(self, writer, request, keep_alive):
+        self.writer = writer
+        self.request = request
+        self.keep_alive = keep_alive
+        self.streaming = False
+        self.status = None
+
+    def _head(self, status, headers):
+        self.status = status
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        headers = dict(headers)
+        headers["Connection"] = "keep-alive" if self.keep_alive else "close"
+        headers["Accept-Encoding"] = "gzip"
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        headers = dict(headers or {}, **{"Content-Type": "application/json; charset=utf-8",
+                                         "Vary": "Accept-Encoding"})
+        if len(data) >= GZIP_MIN_BYTES and "gzip" in self.request.headers.get("accept-encoding", ""):
+            data = gzip.compress(data)
+            headers["Content-Encoding"] = "gzip"
+        headers["Content-Length"] = str(len(data))
+        self._head(status, headers)
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def start_stream(self):
+        self.streaming = True
+        self._head(200, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Transfer-Encoding": "chunked",
+        })
+        await self.writer.drain()
+
+    async def send_event(self, data):
+        chunk = f"data: {json.dumps(data)}\n\n".encode("utf-8")
+        self.writer.write(f"{len(chunk):x}\r\n".encode("latin-1") + chunk + b"\r\n")
+        await self.writer.drain()
+
+    async def end_stream(self):
+        self.writer.write(b"0\r\n\r\n")
+        await self.writer.drain()
+
+
+DIAGNOSTIC_REPLY = {
+    "ok": True,
+    "message": "Diagnostic endpoint reached.",
+    "expectedFields": ["playerName", "role", "difficulty", "evidenceList",
+                       "playerResponse", "conversationHistory", "sessionId"],
+    "validDifficulties": DIFFICULTIES,
+    "validRoles": SERVER_ROLES,
+}
+
+
+def validation_errors(name, role, difficulty, scenario_seed, incremental, seq, turn):
+    """The /interrogate field checks index.js makes, as a list of messages"""
+    errors = []
+    if not isinstance(name, str) or not name.strip():
+        errors.append("playerName must be a non-empty string")
+    if not isinstance(role, str) or not role.strip():
+        errors.append("role must be a non-empty string")
+    elif role not in SERVER_ROLES:
+        errors.append(f"role must be one of: {', '.join(SERVER_ROLES)}")
+    if not isinstance(difficulty, str) or not difficulty.strip():
+        errors.append("difficulty must be a non-empty string")
+    elif difficulty not in DIFFICULTIES:
+        errors.append(f"difficulty must be one of: {', '.join(DIFFICULTIES)}")
+    if scenario_seed is not None and not (isinstance(scenario_seed, int) and 0 <= scenario_seed <= 0xFFFFFFFF):
+        errors.append("scenarioSeed must be an integer from 0 to 4294967295")
+    if incremental:
+        if not isinstance(seq, int) or seq < 0:
+            errors.append("seq must be a non-negative integer")
+        if turn is not None and not (isinstance(turn, dict) and isinstance(turn.get("question"), str)
+                                     and isinstance(turn.get("answer"), str)):
+            errors.append("turn must have string question and answer fields")
+    return errors
+
+
+def wants_stream(body, request):
+    return body.get("stream") is True or "text/event-stream" in request.headers.get("accept", "")
+
+
+def settle(future, value):
+    if future is not None and not future.done():
+        future.set_result(value)
+
+
+class HttpServer:
+    """Minimal keep-alive HTTP/1.1 server; subclasses fill in `routes`"""
+
+    def __init__(self):
+        self.routes = {}  # (method, path) -> async handler(body, request, responder)
+        self.requests_served = 0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                responder = Responder(writer, request, keep_alive)
+                await self.dispatch(request, responder)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        method, target, _version = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body = b""
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                body += await reader.readexactly(size)
+                await reader.readline()
+        elif "content-length" in headers:
+            length = int(headers["content-length"])
+            if length > MAX_BODY_BYTES:
+                raise ConnectionError("request body too large")
+            body = await reader.readexactly(length)
+        return Request(method.upper(), target.split("?", 1)[0], headers, body)
+
+    async def dispatch(self, request, responder):
+        self.requests_served += 1
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            await responder.send_json(404, {"error": f"Cannot {request.method} {request.path}"})
+            return
+        try:
+            body = request.json() if request.method == "POST" else {}
+        except (ValueError, OSError):
+            await responder.send_json(400, {"error": "Invalid JSON body"})
+            return
+        try:
+            await handler(body, request, responder)
+        except Exception as e:
+            logging.exception("Handler for %s failed", request.path)
+            if responder.streaming:
+                await responder.send_event({"type": "error", "error": "Failed to get response from AI"})
+                await responder.end_stream()
+            else:
+                await responder.send_json(500, {"error": "Failed to get response from AI", "details": str(e)})
+
+
+class StubServer(HttpServer):
+    """Session handling and routing for the stand-in middleware"""
+
+    def __init__(self, config=None):
+        super().__init__()
+        self.config = config or StubConfig()
+        self.detective = StubDetective(self.config)
+        self.sessions = {}
+        self.deduplicated = 0
+        self.routes = {
+            ("POST", "/interrogate"): self.interrogate,
+            ("POST", "/session/rekey"): self.rekey_session,
+            ("GET", "/health"): self.health,
+            ("GET", "/debug/sessions"): self.debug_sessions,
+            ("POST", "/debug/reset-sessions"): self.reset_sessions,
+        }
+
+    def rng_for(self, *parts):
+        return random.Random(":".join(str(p) for p in (self.config.seed,) + parts))
+
+    # -- Endpoints -----------------------------------------------------
+
+    async def health(self, body, request, responder):
+        await responder.send_json(200, {
+            "status": "OK",
+            "timestamp": now_iso(),
+            "openai_configured": False,
+            "active_sessions": len(self.sessions),
+            "deduplicated_requests": self.deduplicated,
+        })
+
+    async def debug_sessions(self, body, request, responder):
+        await responder.send_json(200, {
+            "activeSessions": [{
+                "playerName": name,
+                "scenario": session["scenario"],
+                "historyLength": len(session["history"]),
+                "conversationLength": len(session["transcript"]) * 2,
+                "timestamp": session["timestamp"],
+                "isValid": True,
+            } for name, session in self.sessions.items()],
+            "totalSessions": len(self.sessions),
+            "serverTime": now_iso(),
+        })
+
+    async def reset_sessions(self, body, request, responder):
+        name = body.get("playerName")
+        if name:
+            if self.sessions.pop(name, None) is None:
+                await responder.send_json(404, {"error": f"No session found for {name}"})
+            else:
+                await responder.send_json(200, {"message": f"Session for {name} has been reset"})
+            return
+        count = len(self.sessions)
+        self.sessions.clear()
+        await responder.send_json(200, {"message": f"All {count} sessions have been reset"})
+
+    async def rekey_session(self, body, request, responder):
+        new_name = body.get("newPlayerName")
+        if not isinstance(new_name, str) or not new_name.strip():
+            await responder.send_json(400, {"error": "Validation failed",
+                                            "details": ["newPlayerName must be a non-empty string"]})
+            return
+        old_name = body.get("playerName").strip() if isinstance(body.get("playerName"), str) else ""
+        new_name = new_name.strip()
+        session = self.sessions.get(old_name)
+        if session is None or session["token"] != body.get("sessionToken"):
+            await responder.send_json(404, {"error": "Session not found", "timestamp": now_iso()})
+            return
+        if new_name != old_name:
+            self.sessions[new_name] = self.sessions.pop(old_name)
+        session["timestamp"] = now_iso()
+        await responder.send_json(200, {"playerName": new_name, "sessionToken": session["token"],
+                                        "seq": session["seq"], "timestamp": now_iso()})
+
+    async def interrogate(self, body, request, responder):
+        if body.get("diagnostic") is True:
+            await responder.send_json(200, DIAGNOSTIC_REPLY)
+            return
+
+        name, role, difficulty = body.get("playerName"), body.get("role"), body.get("difficulty")
+        answer = body.get("playerResponse") or body.get("playerAnswer") or ""
+        history = body.get("conversationHistory") or body.get("history")
+        token, seq, turn = body.get("sessionToken"), body.get("seq"), body.get("turn")
+        scenario_seed = body.get("scenarioSeed")
+        incremental = isinstance(token, str) and history is None
+        history = history or []
+        first = body.get("startInterrogation") is True or (not incremental and not history)
+
+        errors = validation_errors(name, role, difficulty, scenario_seed, incremental, seq, turn)
+        if errors:
+            await responder.send_json(400, {"error": "Validation failed", "details": errors,
+                                            "validDifficulties": DIFFICULTIES, "validRoles": SERVER_ROLES})
+            return
+
+        name, role, difficulty = name.strip(), role.strip(), difficulty.strip()
+        session = self.sessions.get(name)
+        turn_seq = 0 if first else (seq if incremental else count_turns(history))
+        rng = self.rng_for(name, turn_seq, answer)
+
+        if await self.inject_fault(rng, responder, first):
+            return
+
+        last = session.get("last_reply") if session else None
+        if (incremental and not first and turn and session["token"] == token and seq == session["seq"]
+                and last and last["seq"] == seq and last["turn"] == turn):
+            # Same turn again: share the first request's reply instead of generating another
+            self.deduplicated += 1
+            reply = await asyncio.shield(last["future"])
+            if reply is None:
+                await responder.send_json(409, {"error": "Resync required", "expectedSeq": session["seq"],
+                                                "timestamp": now_iso()})
+            else:
+                await self.replay(reply, body, request, responder)
+            return
+
+        if incremental and not first:
+            expected = session["seq"] + (1 if turn else 0) if session else None
+            if session is None or session["token"] != token or seq != expected:
+                await responder.send_json(409, {
+                    "error": "Resync required",
+                    "expectedSeq": session["seq"] if session and session["token"] == token else None,
+                    "timestamp": now_iso(),
+                })
+                return
+
+        opening_evidence = None
+        reply_future = None
+        if first or session is None:
+            if scenario_seed is not None:
+                # Same draws as index.js, so the client's pre-rendered case file matches
+                seeded = Mulberry32(scenario_seed)
+                scenario = generate_scenario(seeded)
+                opening_evidence = generate_evidence(scenario, name, difficulty, seeded)
+            else:
+                scenario = generate_scenario(self.rng_for(name, "scenario"))
+            session = {
+                "token": str(uuid.uuid4()),
+                "scenario": scenario,
+                "history": [],
+                "transcript": Transcript.from_messages(history),
+                "seq": count_turns(history),
+                "timestamp": now_iso(),
+            }
+            self.sessions[name] = session
+        else:
+            if incremental:
+                if turn:
+                    session["transcript"].add(turn["question"], turn["answer"])
+                    session["seq"] += 1
+                    reply_future = asyncio.get_running_loop().create_future()
+                    session["last_reply"] = {"seq": session["seq"], "turn": turn, "future": reply_future}
+            elif history:
+                session["transcript"] = Transcript.from_messages(history)
+                session["seq"] = count_turns(history)
+            session["history"].append({"question": turn["question"] if turn else "Previous question",
+                                       "answer": answer})
+            session["timestamp"] = now_iso()
+
+        evidence = (body.get("evidenceList") or opening_evidence
+                    or generate_evidence(session["scenario"], name, difficulty, rng))
+        text = self.detective.reply(rng, session, name, role, answer, evidence, first)
+        meta = {
+            "scenario": session["scenario"],
+            "evidence": evidence,
+            "difficulty": difficulty,
+            "sessionToken": session["token"],
+            "seq": session["seq"],
+        }
+
+        try:
+            if wants_stream(body, request):
+                await responder.start_stream()
+                await responder.send_event(dict(meta, type="meta"))
+                async for token_text in self.detective.stream(rng, text):
+                    await responder.send_event({"type": "delta", "content": token_text})
+                reply = dict(meta, response=text, timestamp=now_iso())
+                settle(reply_future, reply)
+                await responder.send_event(dict(reply, type="done"))
+                await responder.end_stream()
+                return
+
+            await self.detective.complete(rng, text)
+            reply = dict(meta, response=text, timestamp=now_iso())
+            settle(reply_future, reply)
+            await responder.send_json(200, reply)
+        finally:
+            settle(reply_future, None)
+
+    async def replay(self, reply, body, request, responder):
+        """Send a finished reply again, as JSON or as a one-delta event stream"""
+        if not wants_stream(body, request):
+            await responder.send_json(200, reply)
+            return
+        meta = {k: v for k, v in reply.items() if k not in ("response", "timestamp")}
+        await responder.start_stream()
+        await responder.send_event(dict(meta, type="meta"))
+        await responder.send_event({"type": "delta", "content": reply["response"]})
+        await responder.send_event(dict(reply, type="done"))
+        await responder.end_stream()
+
+    async def inject_fault(self, rng, responder, first):
+        """Apply configured error injection; returns True if the request was answered"""
+        config = self.config
+        roll = rng.random()
+        if roll < config.error_timeout:
+            await asyncio.sleep(config.hang_seconds)
+            await responder.send_json(504, {"error": "Connection timeout. Please try again."})
+            return True
+        roll -= config.error_timeout
+        if roll < config.error_429:
+            await responder.send_json(429, {"error": "Rate limit exceeded. Please wait a moment."})
+            return True
+        roll -= config.error_429
+        if roll < config.error_500:
+            await responder.send_json(500, {"error": "Failed to get response from AI"})
+            return True
+        roll -= config.error_500
+        if not first and roll < config.error_session:
+            await responder.send_json(404, {"error": "Session not found"})
+            return True
+        return False
+
+
+async def serve(host, port, config):
+    server = StubServer(config)
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    logging.info(f"🚀 Alibi stand-in server running on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Alibi middleware")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds to first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of latency jitter")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="streaming speed (0 = instant)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--catch-rate", type=float, default=0.1)
+    parser.add_argument("--catch-after", type=int, default=2)
+    parser.add_argument("--error-timeout", type=float, default=0.0, help="fraction of requests that hang")
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-500", type=float, default=0.0)
+    parser.add_argument("--error-session", type=float, default=0.0, help='fraction of "Session not found" replies')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    config = StubConfig(latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+                        seed=args.seed, catch_rate=args.catch_rate, catch_after=args.catch_after,
+                        error_timeout=args.error_timeout, error_429=args.error_429,
+                        error_500=args.error_500, error_session=args.error_session,
+                        hang_seconds=args.hang_seconds)
+    try:
+        asyncio.run(serve(args.host, args.port, config))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Bounded interrogation transcript with a token budget.
+
+The newest turns are kept verbatim. Once the transcript is over budget the
+oldest turns are folded: the detective's question becomes one line of a
+running summary, and the player's answer becomes a short claim. The
+summary never grows past SUMMARY_CHARS; when it would, its oldest lines
+drop off. Claims are kept much longer, up to MAX_CLAIMS, so the player's
+earliest statements stay in the prompt for contradiction checks after the
+questions that drew them are gone.
+
+On the wire the folded part is a single leading message with role
+"summary": the question summary as its content, the claims, and the number
+of turns folded. The recent turns follow as detective/player pairs.
+`count_turns` gives the turn count (`seq`) of such a list.
+
+index.js applies the same rules (`compactConversation`) to its copy of the
+transcript, so the prompt stays bounded too.
+"""
+import collections
+
+CHARS_PER_TOKEN = 4  # rough estimate for English text; no tokenizer needed
+DEFAULT_TOKEN_BUDGET = 1200
+MIN_RECENT_TURNS = 2
+SUMMARY_CHARS = 800
+FOLDED_QUESTION_CHARS = 60
+CLAIM_CHARS = 80
+MAX_CLAIMS = 30
+SUMMARY_ROLE = "summary"
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def shorten(text, limit):
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rstrip() + "…"
+
+
+def count_turns(messages):
+    """Turns in a wire transcript: those folded into a leading summary plus one per message pair"""
+    messages = list(messages)
+    if messages and messages[0].get("role") == SUMMARY_ROLE:
+        folded = messages[0].get("turns")
+        return (folded if isinstance(folded, int) and folded > 0 else 0) + (len(messages) - 1) // 2
+    return len(messages) // 2
+
+
+class Turn:
+    __slots__ = ("question", "answer")
+
+    def __init__(self, question, answer):
+        self.question = question
+        self.answer = answer
+
+    def tokens(self):
+        return estimate_tokens(self.question) + estimate_tokens(self.answer)
+
+
+class Transcript:
+    """Question/answer turns in order, kept within `token_budget` estimated tokens"""
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, min_recent=MIN_RECENT_TURNS):
+        self.token_budget = token_budget
+        self.min_recent = min_recent
+        self.summary = ""  # one line per folded question that still fits
+        self.folded_claims = collections.deque()  # short form of each folded answer, oldest first
+        self.folded = 0  # turns folded so far
+        self.turns = []  # the turns after those, verbatim
+        self.tokens = 0
+
+    @classmethod
+    def from_messages(cls, messages, **kwargs):
+        """Build from the wire format: an optional summary, then alternating detective/player messages"""
+        transcript = cls(**kwargs)
+        messages = list(messages)
+        if messages and messages[0].get("role") == SUMMARY_ROLE:
+            head = messages.pop(0)
+            transcript.summary = str(head.get("content", ""))
+            claims = head.get("claims")
+            if isinstance(claims, list):
+                transcript.folded_claims.extend(str(claim) for claim in claims[-MAX_CLAIMS:])
+            transcript.folded = count_turns([head])
+            transcript.tokens = estimate_tokens(transcript.summary) + sum(
+                estimate_tokens(c) for c in transcript.folded_claims)
+        for i in range(0, len(messages) - 1, 2):
+            transcript.add(str(messages[i].get("content", "")), str(messages[i + 1].get("content", "")))
+        return transcript
+
+    def __len__(self):
+        return self.folded + len(self.turns)
+
+    def __iter__(self):
+        """The recent, verbatim turns"""
+        return iter(self.turns)
+
+    @property
+    def seq(self):
+        """Turn count, as the server tracks it"""
+        return len(self)
+
+    def add(self, question, answer):
+        """Append a turn and return it verbatim as the incremental wire `turn`"""
+        turn = Turn(question, answer)
+        self.turns.append(turn)
+        self.tokens += turn.tokens()
+        self._enforce_budget()
+        return {"question": question, "answer": answer}
+
+    def _enforce_budget(self):
+        while self.tokens > self.token_budget and len(self.turns) > self.min_recent:
+            self._fold(self.turns.pop(0))
+
+    def _fold(self, turn):
+        self.tokens -= turn.tokens() + estimate_tokens(self.summary)
+        summary = shorten(turn.question, FOLDED_QUESTION_CHARS)
+        if self.summary:
+            summary = f"{self.summary}\n{summary}"
+        while len(summary) > SUMMARY_CHARS and "\n" in summary:
+            summary = summary.split("\n", 1)[1]
+        self.summary = shorten(summary, SUMMARY_CHARS)
+        self.tokens += estimate_tokens(self.summary)
+
+        claim = shorten(turn.answer, CLAIM_CHARS)
+        self.folded_claims.append(claim)
+        self.tokens += estimate_tokens(claim)
+        if len(self.folded_claims) > MAX_CLAIMS:
+            self.tokens -= estimate_tokens(self.folded_claims.popleft())
+        self.folded += 1
+
+    def memory(self):
+        """The prompt's view: earlier questions, the player's earlier claims, then the recent turns"""
+        lines = []
+        if self.summary:
+            lines.append(f"Earlier questions, summarized:\n{self.summary}")
+        if self.folded_claims:
+            lines.append("The player's earlier claims:\n" + "\n".join(f"- {c}" for c in self.folded_claims))
+        lines.extend(f"Detective: {turn.question}\nPlayer: {turn.answer}" for turn in self.turns)
+        return "\n".join(lines)
+
+    def messages(self):
+        """Wire format for a full resync: the summary (if any), then two messages per recent turn"""
+        messages = []
+        if self.folded:
+            messages.append({"role": SUMMARY_ROLE, "content": self.summary, "claims": list(self.folded_claims),
+                             "turns": self.folded})
+        for turn in self.turns:
+            messages.append({"role": "detective", "content": turn.question})
+            messages.append({"role": "player", "content": turn.answer})
+        return messages
+
+    def clear(self):
+        self.summary = ""
+        self.folded_claims.clear()
+        self.folded = 0
+        self.turns = []
+        self.tokens = 0
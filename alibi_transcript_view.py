@@ -0,0 +1,142 @@
+"""Scrollable record of the interrogation so far, with search over the player's own answers.
+
+Everything lives in one read-only `tk.Text`. A turn is appended at the
+end and never re-rendered. The Text widget only lays out the lines in
+view, so adding a turn costs the same at turn 5 as at turn 500. Search
+runs over the ranges tagged as player statements and only when the player
+asks.
+"""
+import tkinter as tk
+
+AT_BOTTOM = 0.999  # yview fraction treated as "scrolled to the end"
+
+
+class TranscriptView(tk.Frame):
+    """Past questions and answers; `append` one turn at a time"""
+
+    def __init__(self, master, colors, **kwargs):
+        super().__init__(master, bg=colors['bg_light'], **kwargs)
+        self.colors = colors
+        self.turns = 0
+        self.query = ""
+        self.matches = []
+        self.current = -1
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        title = tk.Label(self, text="📜 TRANSCRIPT", font=("Segoe UI", 12, "bold"),
+                         bg=colors['bg_light'], fg=colors['accent'])
+        title.grid(row=0, column=0, columnspan=2, sticky="w", padx=10, pady=5)
+
+        self.text = tk.Text(self, wrap="word", state="disabled", relief="flat", bd=0,
+                            font=("Segoe UI", 10), bg=colors['bg_dark'], fg=colors['text_light'],
+                            padx=10, pady=8, width=40, height=10, cursor="arrow", takefocus=0)
+        scrollbar = tk.Scrollbar(self, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+        self.text.grid(row=1, column=0, sticky="nsew", padx=(10, 0))
+        scrollbar.grid(row=1, column=1, sticky="ns", padx=(0, 10))
+
+        self.text.tag_configure("number", foreground=colors['text_gray'], font=("Segoe UI", 9, "bold"))
+        self.text.tag_configure("detective", foreground=colors['accent'], spacing1=6)
+        self.text.tag_configure("player", foreground=colors['text_light'], lmargin1=16, lmargin2=16,
+                                spacing3=6)
+        self.text.tag_configure("muted", foreground=colors['text_gray'], lmargin1=16, spacing3=6,
+                                font=("Segoe UI", 10, "italic"))
+        self.text.tag_configure("match", background=colors['warning'], foreground=colors['bg_dark'])
+        self.text.tag_configure("current", background=colors['danger'], foreground=colors['text_light'])
+        self.text.tag_raise("current", "match")
+
+        search_frame = tk.Frame(self, bg=colors['bg_light'])
+        search_frame.grid(row=2, column=0, columnspan=2, sticky="ew", padx=10, pady=5)
+        search_frame.grid_columnconfigure(1, weight=1)
+        tk.Label(search_frame, text="🔍", bg=colors['bg_light'], fg=colors['text_light']).grid(row=0, column=0)
+        self.search_entry = tk.Entry(search_frame, font=("Segoe UI", 10), bg=colors['bg_dark'],
+                                     fg=colors['text_light'], insertbackground=colors['text_light'],
+                                     relief="flat", bd=3)
+        self.search_entry.grid(row=0, column=1, sticky="ew", padx=5)
+        self.search_entry.bind("<Return>", lambda event: self.find_next())
+        self.search_entry.bind("<Escape>", lambda event: self.clear_search())
+        self.status_label = tk.Label(search_frame, text="", width=10, font=("Segoe UI", 9),
+                                     bg=colors['bg_light'], fg=colors['text_gray'])
+        self.status_label.grid(row=0, column=2)
+
+    def append(self, question, answer):
+        """Add one turn at the end; `answer` is None when the player ran out of time"""
+        follow = self.text.yview()[1] >= AT_BOTTOM
+        self.turns += 1
+        self.text.configure(state="normal")
+        self.text.insert("end", f"Q{self.turns}  ", ("number",), f"{question}\n", ("detective",))
+        start = self.text.index("end-1c")
+        if answer is None:
+            self.text.insert("end", "no answer\n", ("muted",))
+        else:
+            self.text.insert("end", f"{answer}\n", ("player",))
+            if self.query:
+                self._find(start, self.text.index("end-1c"))
+                self._show_status()
+        self.text.configure(state="disabled")
+        if follow:
+            # Keep following the conversation unless the player has scrolled back
+            self.text.see("end")
+
+    def clear(self):
+        self.turns = 0
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.configure(state="disabled")
+        self.matches = []
+        self.current = -1
+        self._show_status()
+
+    def search(self, query):
+        """Highlight every occurrence of `query` in the player's answers; returns the count"""
+        self.text.tag_remove("match", "1.0", "end")
+        self.text.tag_remove("current", "1.0", "end")
+        self.query = query
+        self.matches = []
+        self.current = -1
+        if query:
+            ranges = self.text.tag_ranges("player")
+            for i in range(0, len(ranges), 2):
+                self._find(ranges[i], ranges[i + 1])
+        self._show_status()
+        return len(self.matches)
+
+    def find_next(self):
+        query = self.search_entry.get().strip()
+        if query != self.query:
+            self.search(query)
+        if not self.matches:
+            return
+        self.text.tag_remove("current", "1.0", "end")
+        self.current = (self.current + 1) % len(self.matches)
+        start, end = self.matches[self.current]
+        self.text.tag_add("current", start, end)
+        self.text.see(start)
+        self._show_status()
+
+    def clear_search(self):
+        self.search_entry.delete(0, "end")
+        self.search("")
+
+    def _find(self, start, stop):
+        count = tk.IntVar()
+        while True:
+            index = self.text.search(self.query, start, stopindex=stop, nocase=True, count=count)
+            if not index or not count.get():
+                return
+            end = self.text.index(f"{index}+{count.get()}c")
+            self.text.tag_add("match", index, end)
+            self.matches.append((index, end))
+            start = end
+
+    def _show_status(self):
+        if not self.query:
+            text = ""
+        elif not self.matches:
+            text = "no matches"
+        elif self.current < 0:
+            text = f"{len(self.matches)} found"
+        else:
+            text = f"{self.current + 1} of {len(self.matches)}"
+        self.status_label.config(text=text)
@@ -0,0 +1,98 @@
+"""Memory and threads per extra seat: kiosk host vs one standalone game per window.
+
+Usage: python benchmarks/bench_kiosk.py [--seats 8]
+
+Runs headless (alibi_headless) with no middleware: requests fail fast
+against a closed local port. Each seat is taken as far as the setup
+dialog. By then the network stack, the speculative opening request and
+the warm-up all exist. The benchmark reports the Python heap (tracemalloc)
+and the thread count, first with every game owning its own engine, client
+and timer tick, then with the games seated at one KioskHost. Tk's own
+widget memory is not included; it is the same in both modes.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import threading
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.environ.setdefault("ALIBI_MIDDLEWARE_URL", "http://127.0.0.1:9")
+
+import alibi_headless
+
+tk = alibi_headless.install()
+
+import alibi_game  # noqa: E402  (after install)
+from alibi_kiosk import KioskHost  # noqa: E402
+
+
+def settle(root):
+    """Let the failed requests come back and the poll loops go idle"""
+    for _ in range(20):
+        root.loop.run(until=root.loop.now + 0.5)
+        threading.Event().wait(0.05)
+
+
+def measure(open_seat, root, seats):
+    """Heap and thread counts after the first seat and after all of them"""
+    samples = []
+    for i in range(seats):
+        game = open_seat(i)
+        game.get_player_info()
+        settle(root)
+        if i in (0, seats - 1):
+            gc.collect()
+            samples.append((tracemalloc.get_traced_memory()[0], threading.active_count()))
+    (first_bytes, first_threads), (last_bytes, last_threads) = samples
+    extra = max(1, seats - 1)
+    return {
+        "heap_kb_total": round(last_bytes / 1024, 1),
+        "heap_kb_per_extra_seat": round((last_bytes - first_bytes) / extra / 1024, 1),
+        "threads_total": last_threads,
+        "threads_per_extra_seat": round((last_threads - first_threads) / extra, 2),
+    }
+
+
+def standalone(seats):
+    root = tk.Tk()
+    games = []
+
+    def open_seat(i):
+        games.append(alibi_game.AlibiGame(tk.Toplevel(root)))
+        return games[-1]
+
+    result = measure(open_seat, root, seats)
+    for game in games:
+        game.timers.cancel_all()
+        game.network.shutdown()
+        game.client.close()
+    return result
+
+
+def kiosk(seats):
+    root = tk.Tk()
+    host = KioskHost(root, seats=0, workers=2 * seats)
+    result = measure(lambda i: host.add_seat().game, root, seats)
+    host.timers.cancel_all()
+    host.engine.shutdown()
+    host.client.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seats", type=int, default=8)
+    args = parser.parse_args()
+    tracemalloc.start()
+    # Import-time and first-request caches land in whichever mode runs first; warm them up
+    kiosk(2)
+    result = {"seats": args.seats, "standalone": standalone(args.seats), "kiosk": kiosk(args.seats)}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Requests per second and server memory with many live sessions.
+
+Usage: python benchmarks/bench_middleware.py [--sessions 10000] [--duration 10] [--target middleware|stub]
+
+Starts the server in a child process with a zero-latency stub model, so the
+numbers are the server's own cost rather than the model's. Then:
+
+1. It opens `--sessions` interrogations over `--connections` keep-alive
+   connections.
+2. For `--duration` seconds it sends incremental turns to random live
+   sessions, one request in flight per session.
+
+It prints JSON with requests per second and latency percentiles for each
+phase. It also reports the server's resident memory (Linux /proc) at
+start, with every session open and at the end, and the server's /health
+counters. `--target stub` runs the same load against the stand-in
+(alibi_server.py, sessions keyed by name, no bounds) for comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from alibi_metrics import Histogram
+from alibi_protocol import DIFFICULTIES, build_answer_payload, build_opening_payload
+
+ANSWERS = [
+    "I was at home all night watching a movie.",
+    "I already told you, I never left my apartment.",
+    "My neighbor can confirm my car never moved.",
+    "I went to the store around eight, then straight home.",
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_kb(pid):
+    """(current, peak) resident set size in KiB, or (None, None) off Linux"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]), int(fields["VmHWM"].split()[0])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection that sends JSON and reads Content-Length replies"""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.writer.write((f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                           f"Content-Length: {len(data)}\r\n\r\n").encode("latin-1") + data)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length)) if length else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def run_phase(connections, jobs, deadline=None):
+    """Run `jobs` (coroutine factories taking a Connection) across the connections; returns stats"""
+    latency = Histogram(1000, "ms")
+    statuses = {}
+    started = time.perf_counter()
+
+    async def worker(connection):
+        while deadline is None or time.perf_counter() < deadline:
+            job = next(jobs, None)
+            if job is None:
+                return
+            begin = time.perf_counter()
+            status = await job(connection)
+            latency.record((time.perf_counter() - begin) * 1000.0)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    await asyncio.gather(*(worker(connection) for connection in connections))
+    seconds = time.perf_counter() - started
+    return {
+        "requests": latency.count,
+        "seconds": round(seconds, 3),
+        "rps": round(latency.count / seconds, 1),
+        "latency_ms": {f"p{p}": latency.percentile(p) for p in (50, 95, 99)},
+        "statuses": statuses,
+    }
+
+
+async def bench(port, pid, sessions, duration, connection_count):
+    connections = [Connection(port) for _ in range(connection_count)]
+    players = {}
+
+    def opening(i):
+        async def job(connection):
+            name = f"Bench-{i}"
+            difficulty = DIFFICULTIES[i % len(DIFFICULTIES)]
+            status, body = await connection.request(
+                "POST", "/interrogate", build_opening_payload(name, "Driver", difficulty))
+            if status == 200:
+                players[i] = {"name": name, "difficulty": difficulty, "token": body["sessionToken"],
+                              "seq": body["seq"], "question": body["response"]}
+            return status
+        return job
+
+    result = {"rss_kb_start": rss_kb(pid)[0]}
+    result["open"] = await run_phase(connections, (opening(i) for i in range(sessions)))
+    result["rss_kb_sessions_open"] = rss_kb(pid)[0]
+
+    idle = list(players)
+    random.shuffle(idle)
+
+    def turns():
+        while True:
+            yield turn
+
+    async def turn(connection):
+        # Each session is with one worker at a time, so its seq stays in step
+        i = idle.pop()
+        player = players[i]
+        answer = random.choice(ANSWERS)
+        payload = build_answer_payload(player["name"], "Driver", player["difficulty"], answer, (), (),
+                                       session_token=player["token"],
+                                       turn={"question": player["question"], "answer": answer},
+                                       seq=player["seq"] + 1)
+        status, body = await connection.request("POST", "/interrogate", payload)
+        if status == 200:
+            player["seq"], player["question"] = body["seq"], body["response"]
+        idle.insert(0, i)
+        return status
+
+    result["turns"] = await run_phase(connections, turns(), deadline=time.perf_counter() + duration)
+    result["rss_kb_end"], result["rss_kb_peak"] = rss_kb(pid)
+    _, result["health"] = await connections[0].request("GET", "/health")
+    for connection in connections:
+        connection.close()
+    return result
+
+
+def start_server(target, port, sessions, concurrency):
+    if target == "middleware":
+        command = [sys.executable, os.path.join(ROOT, "alibi_middleware.py"), "--model", "stub",
+                   "--max-sessions", str(sessions * 2), "--max-concurrency", str(concurrency)]
+    else:
+        command = [sys.executable, os.path.join(ROOT, "alibi_server.py")]
+    command += ["--port", str(port), "--latency", "0", "--tokens-per-second", "0", "--catch-rate", "0"]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{target} server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=("middleware", "stub"), default="middleware")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of incremental turns")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--max-concurrency", type=int, default=256, help="middleware model slots")
+    args = parser.parse_args()
+
+    port = free_port()
+    process = start_server(args.target, port, args.sessions, args.max_concurrency)
+    try:
+        result = asyncio.run(bench(port, process.pid, args.sessions, args.duration, args.connections))
+    finally:
+        process.terminate()
+        process.wait()
+    print(json.dumps(dict({"target": args.target, "sessions": args.sessions,
+                           "connections": args.connections}, **result), indent=2))
+
+
+if __name__ == "__main__":
+    main()
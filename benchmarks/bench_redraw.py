@@ -0,0 +1,76 @@
+"""Per-turn redraw cost of the interrogation screen: full rebuild vs in-place update.
+
+Usage: python benchmarks/bench_redraw.py [--turns 200]
+
+Needs a display (or Xvfb). Prints JSON with per-turn timings in milliseconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from alibi_game import AlibiGame
+
+SCENARIO = {
+    "crime": "Bank Vault Heist",
+    "location": "Central Bank downtown",
+    "time": "11:42 PM",
+    "method": "Drilled through the back wall",
+}
+EVIDENCE = [
+    "An eyewitness reported seeing someone matching your description near Central Bank downtown",
+    "A bus ticket places you in the neighborhood earlier that day",
+    "A partial license plate match was reported near the scene",
+]
+
+
+def run(game, turns, rebuild):
+    samples = []
+    for i in range(turns):
+        game.current_question = f"Question {i}: where exactly were you at {i % 12 + 1}:00 that night?"
+        start = time.perf_counter()
+        if rebuild:
+            game.clear_frame()
+        game.build_interrogation_screen()
+        game.master.update_idletasks()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "turns": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    game = AlibiGame(root)
+    game.name, game.difficulty = "Bench", "Medium"
+    game.scenario, game.evidence = SCENARIO, EVIDENCE
+    game.is_first_question = False
+
+    results = {
+        "rebuild": summarize(run(game, args.turns, rebuild=True)),
+        "in_place": summarize(run(game, args.turns, rebuild=False)),
+    }
+    game.on_close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
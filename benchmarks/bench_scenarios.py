@@ -0,0 +1,56 @@
+"""Throughput of the local scenario/evidence engine (alibi_scenario).
+
+Usage: python benchmarks/bench_scenarios.py [--count 100000]
+
+Mints a scenario plus opening evidence per seed, cycling through the
+difficulties, and prints JSON with cases per second for the seeded
+Mulberry32 generator and for random.Random.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from alibi_protocol import DIFFICULTIES
+from alibi_scenario import generate_case, generate_evidence, generate_scenario
+
+
+def run_seeded(count):
+    start = time.perf_counter()
+    for seed in range(count):
+        generate_case(seed, "Bench", DIFFICULTIES[seed % len(DIFFICULTIES)])
+    return time.perf_counter() - start
+
+
+def run_random(count):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for i in range(count):
+        scenario = generate_scenario(rng)
+        generate_evidence(scenario, "Bench", DIFFICULTIES[i % len(DIFFICULTIES)], rng)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    results = {}
+    for label, run in (("mulberry32", run_seeded), ("random.Random", run_random)):
+        elapsed = run(args.count)
+        results[label] = {
+            "cases": args.count,
+            "seconds": round(elapsed, 3),
+            "cases_per_second": round(args.count / elapsed),
+            "us_per_case": round(elapsed / args.count * 1e6, 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Cold-start cost of the desktop client: module import and time to first paint of the intro screen.
+
+Usage: python benchmarks/bench_startup.py [--runs 10] [--import-only]
+
+Each run is a fresh interpreter. Times are measured from just before the
+child process is spawned, using time.monotonic (system-wide on Linux, macOS
+and Windows). The paint measurement needs a display (or Xvfb). Prints JSON
+timings in milliseconds, plus whether requests was already imported when
+the intro screen appeared.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def child(spawned, paint):
+    sys.path.insert(0, ROOT)
+    import alibi_game
+    imported = time.monotonic()
+    result = {
+        "import_ms": (imported - spawned) * 1000,
+        "requests_after_import": "requests" in sys.modules,
+    }
+    if paint:
+        import tkinter as tk
+        root = tk.Tk()
+        game = alibi_game.AlibiGame(root)
+        root.wait_visibility()
+        root.update()
+        result["first_paint_ms"] = (time.monotonic() - spawned) * 1000
+        result["requests_at_paint"] = "requests" in sys.modules
+        game.on_close()
+    print(json.dumps(result))
+
+
+def run_once(paint):
+    args = [sys.executable, os.path.abspath(__file__), "--child", repr(time.monotonic())]
+    if paint:
+        args.append("--paint")
+    out = subprocess.run(args, check=True, capture_output=True, text=True, cwd=ROOT).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--import-only", action="store_true", help="skip the Tk paint measurement")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--paint", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(float(args.child), args.paint)
+        return
+
+    paint = not args.import_only
+    runs = [run_once(paint) for _ in range(args.runs)]
+    results = {
+        "import": summarize([r["import_ms"] for r in runs]),
+        "requests_after_import": any(r["requests_after_import"] for r in runs),
+    }
+    if paint:
+        results["first_paint"] = summarize([r["first_paint_ms"] for r in runs])
+        results["requests_at_paint"] = any(r["requests_at_paint"] for r in runs)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
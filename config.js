@@ -16,6 +16,7 @@ module.exports = {
     // Game configuration
     INTERROGATION_TIME: 900, // 15 minutes in seconds
     RESPONSE_TIME_LIMIT: 60, // 1 minute to respond
+    CONVERSATION_TOKEN_BUDGET: Number(process.env.CONVERSATION_TOKEN_BUDGET) || 1200, // transcript share of the prompt
     
     // CORS settings - more restrictive for production
     CORS_ORIGIN: process.env.NODE_ENV === 'production' 
@@ -2,6 +2,9 @@ const express = require('express');
 const axios = require('axios');
 const cors = require('cors');
 const path = require('path');
+const crypto = require('crypto');
+const zlib = require('zlib');
+const { StringDecoder } = require('string_decoder');
 const rateLimit = require('express-rate-limit');
 const config = require('./config');
 require('dotenv').config({ path: path.join(__dirname, 'secrets', '.env') });
@@ -48,6 +51,127 @@ function validateSession(session) {
     return true;
 }
 
+// Format one transcript message as a line of the conversation memory block
+function formatMemoryLine(msg) {
+    if (msg.role === 'detective') return `Detective: ${msg.content}`;
+    if (msg.role === 'player') return `Player: ${msg.content}`;
+    return `${msg.role || 'Unknown'}: ${msg.content}`;
+}
+
+// Transcript budget. Recent turns stay verbatim; once over budget the oldest
+// turns are folded: the question becomes a line of a running summary of at
+// most SUMMARY_CHARS (oldest lines drop first) and the answer a short claim,
+// of which the last MAX_CLAIMS are kept. A full resync carries both as a
+// leading { role: 'summary', content, claims, turns } message.
+// Mirrors alibi_transcript.py so client and server agree.
+const CHARS_PER_TOKEN = 4;
+const MIN_RECENT_TURNS = 2;
+const SUMMARY_CHARS = 800;
+const FOLDED_QUESTION_CHARS = 60;
+const CLAIM_CHARS = 80;
+const MAX_CLAIMS = 30;
+
+function estimateTokens(text) {
+    return Math.ceil(text.length / CHARS_PER_TOKEN);
+}
+
+function shorten(text, limit) {
+    return text.length <= limit ? text : `${text.slice(0, limit - 1).trimEnd()}…`;
+}
+
+// Turns in a wire transcript: those folded into a leading summary plus one per message pair
+function countTurns(messages) {
+    if (messages.length > 0 && messages[0]?.role === 'summary') {
+        const folded = Number.isInteger(messages[0].turns) && messages[0].turns > 0 ? messages[0].turns : 0;
+        return folded + Math.floor((messages.length - 1) / 2);
+    }
+    return Math.floor(messages.length / 2);
+}
+
+function formatConversationMemory(session) {
+    const blocks = [];
+    if (session.summary) blocks.push(`Earlier questions, summarized:\n${session.summary}`);
+    if (session.claims.length > 0) {
+        blocks.push(`The player's earlier claims:\n${session.claims.map(claim => `- ${claim}`).join('\n')}`);
+    }
+    blocks.push(...session.conversationHistory.map(formatMemoryLine));
+    return blocks.join('\n');
+}
+
+// Fold the oldest verbatim turns into the summary and claims until the
+// transcript fits the budget; returns true if any turn was folded
+function compactConversation(session) {
+    const messages = session.conversationHistory;
+    let changed = false;
+    while (session.tokens > config.CONVERSATION_TOKEN_BUDGET && messages.length / 2 > MIN_RECENT_TURNS) {
+        const [question, answer] = messages.splice(0, 2);
+        const line = shorten(question.content, FOLDED_QUESTION_CHARS);
+        let summary = session.summary ? `${session.summary}\n${line}` : line;
+        while (summary.length > SUMMARY_CHARS && summary.includes('\n')) {
+            summary = summary.slice(summary.indexOf('\n') + 1);
+        }
+        session.tokens -= estimateTokens(question.content) + estimateTokens(answer.content) + estimateTokens(session.summary);
+        session.summary = shorten(summary, SUMMARY_CHARS);
+        session.tokens += estimateTokens(session.summary);
+
+        const claim = shorten(answer.content, CLAIM_CHARS);
+        session.claims.push(claim);
+        session.tokens += estimateTokens(claim);
+        if (session.claims.length > MAX_CLAIMS) {
+            session.tokens -= estimateTokens(session.claims.shift());
+        }
+        session.foldedTurns += 1;
+        changed = true;
+    }
+    return changed;
+}
+
+// Replace a session's transcript wholesale (new session or full resync)
+function setConversation(session, conversationHistory) {
+    const head = conversationHistory[0]?.role === 'summary' ? conversationHistory[0] : null;
+    session.summary = head ? String(head.content ?? '') : '';
+    session.claims = head && Array.isArray(head.claims) ? head.claims.slice(-MAX_CLAIMS).map(String) : [];
+    session.foldedTurns = countTurns(head ? [head] : []);
+    session.conversationHistory = conversationHistory.slice(head ? 1 : 0)
+        .map(msg => ({ role: msg.role, content: String(msg.content ?? '') }));
+    session.tokens = [session.summary, ...session.claims, ...session.conversationHistory.map(msg => msg.content)]
+        .reduce((sum, text) => sum + estimateTokens(text), 0);
+    compactConversation(session);
+    session.conversationMemory = formatConversationMemory(session);
+    session.seq = countTurns(conversationHistory);
+}
+
+// Append a single question/answer turn; the memory block is only rebuilt
+// when older turns had to be folded to stay within budget
+function appendTurn(session, turn) {
+    const messages = [
+        { role: 'detective', content: turn.question },
+        { role: 'player', content: turn.answer }
+    ];
+    session.conversationHistory.push(...messages);
+    session.tokens += estimateTokens(turn.question) + estimateTokens(turn.answer);
+    session.seq += 1;
+    if (compactConversation(session)) {
+        session.conversationMemory = formatConversationMemory(session);
+        return;
+    }
+    const lines = messages.map(formatMemoryLine).join('\n');
+    session.conversationMemory = session.conversationMemory ? `${session.conversationMemory}\n${lines}` : lines;
+}
+
+// Send JSON, gzipped when the client accepts it and the body is worth compressing
+const GZIP_MIN_BYTES = 1024;
+function sendJson(req, res, body) {
+    const json = JSON.stringify(body);
+    res.setHeader('Content-Type', 'application/json; charset=utf-8');
+    res.setHeader('Vary', 'Accept-Encoding');
+    if (json.length >= GZIP_MIN_BYTES && /\bgzip\b/.test(req.headers['accept-encoding'] || '')) {
+        res.setHeader('Content-Encoding', 'gzip');
+        return res.end(zlib.gzipSync(json));
+    }
+    return res.end(json);
+}
+
 // Run cleanup every 30 minutes
 setInterval(cleanupSessions, 30 * 60 * 1000);
 
@@ -120,8 +244,33 @@ const methods = [
 const roles = ['Driver', 'Lookout', 'Hacker', 'Muscle', 'Inside Man', 'Mastermind', 'Tech Specialist', 'Demolitions Expert', 'Scout', 'Communications Specialist', 'Safecracker', 'Surveillance Expert', 'Escape Artist', 'Infiltration Specialist', 'Tactical Coordinator', 'Logistics Manager'];
 const difficulties = ['Easy', 'Medium', 'Hard', 'Expert'];
 
+// Small seedable PRNG (mulberry32). alibi_scenario.py implements the same
+// generator, so a client that proposes a scenarioSeed can render the exact
+// scenario and evidence the server will use before the response arrives.
+function mulberry32(seed) {
+    let a = seed >>> 0;
+    return function () {
+        a = (a + 0x6D2B79F5) >>> 0;
+        let t = a;
+        t = Math.imul(t ^ (t >>> 15), t | 1);
+        t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+}
+
+// Unbiased partial Fisher-Yates: the first `count` items of a shuffled copy
+function sample(pool, count, rand) {
+    const items = pool.slice();
+    const n = Math.min(count, items.length);
+    for (let i = 0; i < n; i++) {
+        const j = i + Math.floor(rand() * (items.length - i));
+        [items[i], items[j]] = [items[j], items[i]];
+    }
+    return items.slice(0, n);
+}
+
 // Generate random time with more variety
-function generateRandomTime() {
+function generateRandomTime(rand = Math.random) {
     // Sometimes use late night (10 PM - 4 AM), sometimes use other times
     const timeRanges = [
         { start: 22, end: 28, label: 'late night' }, // 10 PM - 4 AM
@@ -131,9 +280,9 @@ function generateRandomTime() {
         { start: 8, end: 12, label: 'morning' }       // 8 AM - 12 PM
     ];
     
-    const selectedRange = timeRanges[Math.floor(Math.random() * timeRanges.length)];
-    const hour = Math.floor(Math.random() * (selectedRange.end - selectedRange.start)) + selectedRange.start;
-    const minute = Math.floor(Math.random() * 60);
+    const selectedRange = timeRanges[Math.floor(rand() * timeRanges.length)];
+    const hour = Math.floor(rand() * (selectedRange.end - selectedRange.start)) + selectedRange.start;
+    const minute = Math.floor(rand() * 60);
     
     const ampm = hour >= 24 ? 'AM' : (hour >= 12 ? 'PM' : 'AM');
     const displayHour = hour >= 24 ? hour - 24 : (hour > 12 ? hour - 12 : hour);
@@ -143,7 +292,7 @@ function generateRandomTime() {
 }
 
 // Generate evidence based on difficulty
-function generateEvidence(scenario, playerName, difficulty) {
+function generateEvidence(scenario, playerName, difficulty, rand = Math.random) {
     // Easy: Only weak, circumstantial, or indirect evidence
     const easyEvidence = [
         `A car similar to one registered to ${playerName} was seen in the general area that day`,
@@ -209,20 +358,18 @@ function generateEvidence(scenario, playerName, difficulty) {
 
     // Select 3-4 pieces of evidence for Easy/Normal, 4-5 for Hard, 5+ for Expert
     let count = 3;
-    if (difficulty === 'Hard') count = 4 + Math.floor(Math.random() * 2);
-    if (difficulty === 'Expert') count = 5 + Math.floor(Math.random() * 2);
-    if (difficulty === 'Easy' || difficulty === 'Medium' || difficulty === 'Normal') count = 3 + Math.floor(Math.random() * 2);
+    if (difficulty === 'Hard') count = 4 + Math.floor(rand() * 2);
+    if (difficulty === 'Expert') count = 5 + Math.floor(rand() * 2);
+    if (difficulty === 'Easy' || difficulty === 'Medium' || difficulty === 'Normal') count = 3 + Math.floor(rand() * 2);
 
-    // Shuffle and select
-    const shuffled = evidencePool.sort(() => Math.random() - 0.5);
-    return shuffled.slice(0, count);
+    return sample(evidencePool, count, rand);
 }
 
 // Generate dynamic scenario with logical crime-location pairs
-function generateScenario() {
-    const pair = crimeLocationPairs[Math.floor(Math.random() * crimeLocationPairs.length)];
-    const method = methods[Math.floor(Math.random() * methods.length)];
-    const time = generateRandomTime();
+function generateScenario(rand = Math.random) {
+    const pair = crimeLocationPairs[Math.floor(rand() * crimeLocationPairs.length)];
+    const method = methods[Math.floor(rand() * methods.length)];
+    const time = generateRandomTime(rand);
     
     return {
         crime: pair.crime,
@@ -232,8 +379,43 @@ function generateScenario() {
     };
 }
 
+// Model calls saved by answering duplicate turns from the first request's
+// reply, and streams dropped because the client went away
+const requestStats = { deduplicated: 0, abandonedStreams: 0 };
+
+function sameTurn(a, b) {
+    return !!a && !!b && a.question === b.question && a.answer === b.answer;
+}
+
+function wantsEventStream(req) {
+    return req.body.stream === true || (req.headers.accept || '').includes('text/event-stream');
+}
+
+// Remember the reply to a session's newest turn so a repeat of the same
+// request (double submit, client retry) can share it
+function deferReply(session, seq, turn) {
+    let resolve;
+    const promise = new Promise(r => { resolve = r; });
+    session.lastReply = { seq, turn, promise };
+    return resolve;
+}
+
+// Send a finished reply again, as JSON or as a one-delta event stream
+function replayReply(req, res, body) {
+    if (!wantsEventStream(req)) return sendJson(req, res, body);
+    res.status(200);
+    res.setHeader('Content-Type', 'text/event-stream');
+    res.setHeader('Cache-Control', 'no-cache');
+    const { response, timestamp, ...meta } = body;
+    sendEvent(res, { type: 'meta', ...meta });
+    sendEvent(res, { type: 'delta', content: response });
+    sendEvent(res, { type: 'done', ...body });
+    res.end();
+}
+
 // POST /interrogate endpoint
 app.post('/interrogate', async (req, res) => {
+    let settleReply = () => {};
     // Log incoming request for debugging
     console.log('📥 Received /interrogate request:', {
         body: req.body,
@@ -280,13 +462,18 @@ app.post('/interrogate', async (req, res) => {
         });
     }
 
+    // Advertise that gzip request bodies are accepted (RFC 7694); express.json() inflates them
+    res.setHeader('Accept-Encoding', 'gzip');
+
     try {
-        const { playerName, role, difficulty, evidenceList, playerResponse, playerAnswer, conversationHistory, history, context, startInterrogation } = req.body;
+        const { playerName, role, difficulty, evidenceList, playerResponse, playerAnswer, conversationHistory, history, context, startInterrogation, stream, sessionToken, seq, turn, scenarioSeed } = req.body;
         
         // Handle different field names from different clients
         const actualPlayerResponse = playerResponse || playerAnswer || '';
         const actualConversationHistory = conversationHistory || history || [];
-        const isFirstMessage = startInterrogation === true || !actualConversationHistory || actualConversationHistory.length === 0;
+        // Incremental clients send only the newest turn plus a sequence number
+        const isIncremental = typeof sessionToken === 'string' && !conversationHistory && !history;
+        const isFirstMessage = startInterrogation === true || (!isIncremental && actualConversationHistory.length === 0);
 
         // Enhanced validation with better error messages
         const validationErrors = [];
@@ -307,6 +494,19 @@ app.post('/interrogate', async (req, res) => {
             validationErrors.push(`difficulty must be one of: ${difficulties.join(', ')}`);
         }
 
+        if (scenarioSeed != null && !(Number.isInteger(scenarioSeed) && scenarioSeed >= 0 && scenarioSeed <= 0xFFFFFFFF)) {
+            validationErrors.push('scenarioSeed must be an integer from 0 to 4294967295');
+        }
+
+        if (isIncremental) {
+            if (!Number.isInteger(seq) || seq < 0) {
+                validationErrors.push('seq must be a non-negative integer');
+            }
+            if (turn != null && (typeof turn.question !== 'string' || typeof turn.answer !== 'string')) {
+                validationErrors.push('turn must have string question and answer fields');
+            }
+        }
+
         if (validationErrors.length > 0) {
             return res.status(400).json({
                 error: 'Validation failed',
@@ -325,19 +525,54 @@ app.post('/interrogate', async (req, res) => {
         let scenario = null;
         let generatedEvidence = [];
         let session = sessions[cleanPlayerName];
+
+        // Incremental turn: the server owns the transcript, so the client's
+        // token and sequence number must line up with it or it has to resync
+        if (isIncremental && !isFirstMessage && session && session.token === sessionToken && turn
+            && seq === session.seq && session.lastReply?.seq === seq && sameTurn(session.lastReply.turn, turn)) {
+            // Same turn again: wait for the first request's reply instead of calling the model twice
+            requestStats.deduplicated++;
+            console.log(`♻️ Duplicate turn ${seq} for ${cleanPlayerName}, sharing the in-flight reply`);
+            const reply = await session.lastReply.promise;
+            if (reply) return replayReply(req, res, reply);
+            return res.status(409).json({
+                error: 'Resync required',
+                expectedSeq: session.seq,
+                timestamp: new Date().toISOString()
+            });
+        }
+
+        if (isIncremental && !isFirstMessage) {
+            const expectedSeq = session ? session.seq + (turn ? 1 : 0) : null;
+            if (!session || session.token !== sessionToken || seq !== expectedSeq) {
+                console.log(`🔁 Resync required for ${cleanPlayerName}:`, {
+                    knownSession: !!session,
+                    seq,
+                    expectedSeq
+                });
+                return res.status(409).json({
+                    error: 'Resync required',
+                    expectedSeq: session && session.token === sessionToken ? session.seq : null,
+                    timestamp: new Date().toISOString()
+                });
+            }
+        }
         
         if (isFirstMessage || !session) {
-            // Start new session
-            scenario = generateScenario();
-            generatedEvidence = generateEvidence(scenario, cleanPlayerName, cleanDifficulty);
+            // Start new session; a client-proposed seed pins the scenario and
+            // opening evidence to what the client has already rendered
+            const rand = scenarioSeed != null ? mulberry32(scenarioSeed) : Math.random;
+            scenario = generateScenario(rand);
+            generatedEvidence = generateEvidence(scenario, cleanPlayerName, cleanDifficulty, rand);
             // Store session data (evidence will be regenerated on each question)
             sessions[cleanPlayerName] = {
+                token: crypto.randomUUID(),
                 scenario: scenario,
                 history: [],
-                conversationHistory: actualConversationHistory || [],
                 timestamp: Date.now()
             };
             session = sessions[cleanPlayerName];
+            setConversation(session, Array.isArray(actualConversationHistory) ? actualConversationHistory : []);
             console.log(`🆕 Started new session for ${cleanPlayerName}:`, {
                 crime: scenario.crime,
                 location: scenario.location,
@@ -349,12 +584,17 @@ app.post('/interrogate', async (req, res) => {
             // Regenerate evidence on each question for more variety
             generatedEvidence = generateEvidence(scenario, cleanPlayerName, cleanDifficulty);
             // Accumulate conversation history
-            if (Array.isArray(actualConversationHistory) && actualConversationHistory.length > 0) {
-                session.conversationHistory = actualConversationHistory;
+            if (isIncremental) {
+                if (turn) {
+                    appendTurn(session, turn);
+                    settleReply = deferReply(session, session.seq, turn);
+                }
+            } else if (Array.isArray(actualConversationHistory) && actualConversationHistory.length > 0) {
+                setConversation(session, actualConversationHistory);
             }
             // Update session history (for debugging, not used in prompt)
             session.history.push({
-                question: actualConversationHistory[actualConversationHistory.length - 1]?.content || 'Previous question',
+                question: turn ? turn.question : (actualConversationHistory[actualConversationHistory.length - 1]?.content || 'Previous question'),
                 answer: actualPlayerResponse
             });
             session.timestamp = Date.now();
@@ -374,11 +614,7 @@ app.post('/interrogate', async (req, res) => {
         const situationMemoryBlock = `====================\nSITUATION MEMORY (DO NOT CHANGE)\n====================\nCRIME: ${scenario.crime}\nLOCATION: ${scenario.location}\nTIME: ${scenario.time}\nMETHOD: ${scenario.method}\n====================\n`;
 
         // Build the conversation memory block (grows with Q&A)
-        const conversationMemoryBlock = (session.conversationHistory || []).map(msg => {
-            if (msg.role === 'detective') return `Detective: ${msg.content}`;
-            if (msg.role === 'player') return `Player: ${msg.content}`;
-            return `${msg.role || 'Unknown'}: ${msg.content}`;
-        }).join('\n');
+        const conversationMemoryBlock = session.conversationMemory || '';
 
         // Build the prompt based on whether it's the first message or continuation
         let systemPrompt, userPrompt;
@@ -404,8 +640,7 @@ app.post('/interrogate', async (req, res) => {
             userPrompt = `${situationMemoryBlock}\nPlayer's response: "${actualPlayerResponse}"`;
         }
 
-        // Call OpenAI API
-        const response = await axios.post(OPENAI_API_URL, {
+        const openaiRequest = {
             model: 'gpt-4o',
             messages: [
                 { role: 'system', content: systemPrompt },
@@ -413,7 +648,25 @@ app.post('/interrogate', async (req, res) => {
             ],
             max_tokens: 500,
             temperature: 0.9
-        }, {
+        };
+
+        // Streaming mode: forward the model's tokens as Server-Sent Events
+        if (wantsEventStream(req)) {
+            return await streamInterrogation(req, res, openaiRequest, {
+                scenario,
+                evidence: finalEvidenceList,
+                difficulty: cleanDifficulty,
+                sessionToken: session.token,
+                seq: session.seq,
+                playerName: cleanPlayerName,
+                role: cleanRole,
+                isFirstMessage,
+                settleReply
+            });
+        }
+
+        // Call OpenAI API
+        const response = await axios.post(OPENAI_API_URL, openaiRequest, {
             headers: {
                 'Authorization': `Bearer ${OPENAI_API_KEY}`,
                 'Content-Type': 'application/json'
@@ -432,16 +685,27 @@ app.post('/interrogate', async (req, res) => {
         });
 
         // Return the response
-        res.json({
+        const reply = {
             response: gptResponse,
             scenario: scenario || null,
             evidence: finalEvidenceList,
             difficulty: cleanDifficulty,
+            sessionToken: session.token,
+            seq: session.seq,
             timestamp: new Date().toISOString()
-        });
+        };
+        settleReply(reply);
+        sendJson(req, res, reply);
 
     } catch (error) {
+        settleReply(null);
         console.error('❌ Error in /interrogate endpoint:', error.response?.data || error.message);
+
+        // Headers already went out as an event stream; report the failure in-band
+        if (res.headersSent) {
+            sendEvent(res, { type: 'error', error: 'Failed to get response from AI' });
+            return res.end();
+        }
         
         // Provide more specific error messages
         let errorMessage = 'Failed to get response from AI';
@@ -465,13 +729,148 @@ app.post('/interrogate', async (req, res) => {
     }
 });
 
+// Write one Server-Sent Event
+function sendEvent(res, data) {
+    res.write(`data: ${JSON.stringify(data)}\n\n`);
+}
+
+// Relay an OpenAI streaming completion to the client as SSE:
+// meta (scenario/evidence) first, then one delta per token, then done with the full text
+async function streamInterrogation(req, res, openaiRequest, meta) {
+    res.status(200);
+    res.setHeader('Content-Type', 'text/event-stream');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.setHeader('Connection', 'keep-alive');
+    res.setHeader('X-Accel-Buffering', 'no');
+    res.flushHeaders();
+
+    sendEvent(res, {
+        type: 'meta',
+        scenario: meta.scenario || null,
+        evidence: meta.evidence,
+        difficulty: meta.difficulty,
+        sessionToken: meta.sessionToken,
+        seq: meta.seq
+    });
+
+    const upstream = await axios.post(OPENAI_API_URL, { ...openaiRequest, stream: true }, {
+        headers: {
+            'Authorization': `Bearer ${OPENAI_API_KEY}`,
+            'Content-Type': 'application/json'
+        },
+        responseType: 'stream'
+    });
+
+    const decoder = new StringDecoder('utf8');
+    let buffer = '';
+    let fullResponse = '';
+
+    // Stop paying for tokens nobody will read
+    res.on('close', () => {
+        if (!res.writableFinished) {
+            requestStats.abandonedStreams++;
+            meta.settleReply(null);
+        }
+        upstream.data.destroy();
+    });
+
+    upstream.data.on('data', chunk => {
+        buffer += decoder.write(chunk);
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline).trim();
+            buffer = buffer.slice(newline + 1);
+            if (!line.startsWith('data:')) continue;
+            const data = line.slice(5).trim();
+            if (data === '[DONE]') continue;
+            try {
+                const delta = JSON.parse(data).choices?.[0]?.delta?.content;
+                if (delta) {
+                    fullResponse += delta;
+                    sendEvent(res, { type: 'delta', content: delta });
+                }
+            } catch (err) {
+                console.error('⚠️ Could not parse stream chunk:', data);
+            }
+        }
+    });
+
+    upstream.data.on('end', () => {
+        console.log('✅ Successfully streamed interrogation response:', {
+            playerName: meta.playerName,
+            role: meta.role,
+            difficulty: meta.difficulty,
+            isFirstMessage: meta.isFirstMessage,
+            responseLength: fullResponse.length
+        });
+        const reply = {
+            response: fullResponse,
+            scenario: meta.scenario || null,
+            evidence: meta.evidence,
+            difficulty: meta.difficulty,
+            sessionToken: meta.sessionToken,
+            seq: meta.seq,
+            timestamp: new Date().toISOString()
+        };
+        meta.settleReply(reply);
+        sendEvent(res, { type: 'done', ...reply });
+        res.end();
+    });
+
+    upstream.data.on('error', err => {
+        console.error('❌ OpenAI stream interrupted:', err.message);
+        meta.settleReply(null);
+        sendEvent(res, { type: 'error', error: 'Stream interrupted. Please try again.' });
+        res.end();
+    });
+}
+
+// Move a session to a new player name. Clients prefetch the opening question
+// under a provisional name while the player is still typing theirs.
+app.post('/session/rekey', (req, res) => {
+    const { playerName, newPlayerName, sessionToken } = req.body;
+
+    if (typeof newPlayerName !== 'string' || newPlayerName.trim() === '') {
+        return res.status(400).json({
+            error: 'Validation failed',
+            details: ['newPlayerName must be a non-empty string']
+        });
+    }
+
+    const fromName = typeof playerName === 'string' ? playerName.trim() : '';
+    const toName = newPlayerName.trim();
+    const session = sessions[fromName];
+    if (!session || session.token !== sessionToken) {
+        return res.status(404).json({
+            error: 'Session not found',
+            timestamp: new Date().toISOString()
+        });
+    }
+
+    if (toName !== fromName) {
+        delete sessions[fromName];
+        sessions[toName] = session;
+    }
+    session.timestamp = Date.now();
+    console.log(`🔑 Re-keyed session ${fromName} -> ${toName}`);
+
+    res.json({
+        playerName: toName,
+        sessionToken: session.token,
+        seq: session.seq,
+        timestamp: new Date().toISOString()
+    });
+});
+
 // Health check endpoint
 app.get('/health', (req, res) => {
     res.json({ 
         status: 'OK', 
         timestamp: new Date().toISOString(),
         openai_configured: !!OPENAI_API_KEY,
-        active_sessions: Object.keys(sessions).length
+        active_sessions: Object.keys(sessions).length,
+        deduplicated_requests: requestStats.deduplicated,
+        abandoned_streams: requestStats.abandonedStreams
     });
 });
 
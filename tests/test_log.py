@@ -0,0 +1,38 @@
+"""The trace buffer of alibi_log: DEBUG kept by default, formatted off the logging thread."""
+import logging
+import os
+import sys
+import threading
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import alibi_log  # noqa: E402
+
+
+class Probe:
+    """Records which thread formats it"""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread())
+        return "probe"
+
+
+def test_debug_trace_is_formatted_off_the_calling_thread(tmp_path):
+    path = str(tmp_path / "trace.log")
+    alibi_log.configure(level="INFO", trace_path=path)
+    try:
+        assert logging.getLogger().getEffectiveLevel() == logging.DEBUG
+        probe = Probe()
+        logging.debug("state %s", probe)
+        logging.info("payload %s", alibi_log.Redacted({"sessionToken": "secret", "answer": "x" * 500}))
+    finally:
+        alibi_log.shutdown()
+
+    assert probe.threads and threading.current_thread() not in probe.threads
+    trace = open(path, encoding="utf-8").read()
+    assert "[DEBUG] MainThread state probe" in trace
+    assert "secret" not in trace and "(500 chars)" in trace
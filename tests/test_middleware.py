@@ -0,0 +1,185 @@
+"""Session store, opening cache and turn handling in the asyncio middleware, with the stub model and no sockets."""
+import asyncio
+import os
+import random
+import sys
+import types
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from alibi_middleware import (MiddlewareServer, ModelGate, Opening, OpeningCache, Session,  # noqa: E402
+                              SessionStore, StubModel)
+from alibi_protocol import build_answer_payload, build_opening_payload  # noqa: E402
+from alibi_server import StubConfig  # noqa: E402
+
+SCENARIO = {"crime": "Art Theft", "location": "City Museum", "time": "9:00 PM", "method": "Cut the glass"}
+REQUEST = types.SimpleNamespace(headers={})
+KEY = (0, 0, "Driver", "Easy")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingModel(StubModel):
+    def __init__(self):
+        super().__init__(StubConfig(latency=0.0, tokens_per_second=100000.0, catch_rate=0.0))
+        self.calls = 0
+
+    async def stream(self, messages, context):
+        self.calls += 1
+        async for token in super().stream(messages, context):
+            yield token
+
+
+class Responder:
+    def __init__(self):
+        self.status = None
+        self.body = None
+
+    async def send_json(self, status, body, headers=None):
+        self.status, self.body = status, body
+
+
+async def post(server, body):
+    responder = Responder()
+    await server.interrogate(body, REQUEST, responder)
+    return responder
+
+
+def session(token):
+    return Session(token, "Ann", SCENARIO)
+
+
+def opening(text="Where were you last night, Suspect-000000?"):
+    return Opening("9:00 PM", (0, 1), text)
+
+
+def test_store_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2, clock=FakeClock())
+    for token in ("a", "b"):
+        store.add(session(token))
+    assert store.get("a") is not None  # now "b" is the coldest
+    store.add(session("c"))
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.evicted == 1
+
+
+def test_store_expires_idle_sessions():
+    clock = FakeClock()
+    store = SessionStore(ttl=60, clock=clock)
+    store.add(session("a"))
+    store.add(session("b"))
+    clock.now = 50
+    assert store.get("a") is not None
+    clock.now = 100
+    store.sweep()
+    assert len(store) == 1 and store.get("a") is not None
+    clock.now = 200
+    assert store.get("a") is None
+    assert store.expired == 2 and store.bytes == 0
+
+
+def test_store_byte_cap_follows_resize():
+    store = SessionStore(clock=FakeClock())
+    small = session("a")
+    store.add(small)
+    store.add(session("b"))
+    store.max_bytes = store.bytes + 10
+    assert store.get("a") is small  # a request for "a" makes it the hot one
+    small.add_turn("And then?", "Then I went to bed.")
+    store.resize(small)  # now past the cap, so the colder "b" goes
+    assert store.get("b") is None and store.get("a") is small
+    assert store.bytes == small.size
+
+
+def test_duplicate_turn_queued_behind_busy_gate_calls_model_once():
+    async def run():
+        model = CountingModel()
+        server = MiddlewareServer(model, gate=ModelGate(1, 10))
+        opened = await post(server, build_opening_payload("Ann", "Driver", "Easy", scenario_seed=7))
+        token = opened.body["sessionToken"]
+        turn = {"question": opened.body["response"], "answer": "I was at home."}
+        body = build_answer_payload("Ann", "Driver", "Easy", turn["answer"], (), (),
+                                    session_token=token, turn=turn, seq=1)
+
+        await server.gate.acquire()  # the gate is busy, so both copies queue for the slot
+        first = asyncio.ensure_future(post(server, dict(body)))
+        second = asyncio.ensure_future(post(server, dict(body)))
+        await asyncio.sleep(0.01)
+        server.gate.release()
+        replies = await asyncio.gather(first, second)
+
+        stored = server.store.get(token)
+        assert [r.status for r in replies] == [200, 200]
+        assert replies[0].body["response"] == replies[1].body["response"]
+        assert model.calls == 2  # the opening and one answer
+        assert server.deduplicated == 1
+        assert stored.seq == 1 and len(stored.transcript) == 1
+
+        follow = dict(turn, answer="Nothing else.")
+        body = build_answer_payload("Ann", "Driver", "Easy", follow["answer"], (), (),
+                                    session_token=token, turn=follow, seq=2)
+        assert (await post(server, body)).status == 200
+
+    asyncio.run(run())
+
+
+def test_cache_replaces_used_up_openings():
+    cache = OpeningCache(variants=2, max_uses=2, clock=FakeClock())
+    cache.add(KEY, opening("first"))
+    cache.add(KEY, opening("second"))
+    taken = [cache.take(KEY).question for _ in range(4)]
+    assert sorted(taken) == ["first", "first", "second", "second"]  # least used variant goes first
+    assert cache.take(KEY) is None and len(cache) == 0
+    assert cache.next_wanted() == KEY and cache.missing(KEY) == 2
+
+
+def test_cache_miss_on_unknown_key_queues_a_refill():
+    cache = OpeningCache(clock=FakeClock())
+    assert cache.take(KEY) is None
+    assert cache.backlog == 1 and cache.stats()["misses"] == 1
+    assert cache.next_wanted() == KEY
+
+
+def test_cache_expires_openings_and_queues_refill():
+    clock = FakeClock()
+    cache = OpeningCache(ttl=100, clock=clock)
+    cache.add(KEY, opening())
+    clock.now = 99
+    assert cache.take(KEY) is not None and cache.backlog == 0
+    clock.now = 101
+    assert cache.take(KEY) is None
+    assert cache.expired == 1 and cache.backlog == 1
+
+
+def test_cache_load_spreads_expiry(tmp_path):
+    clock = FakeClock()
+    saved = OpeningCache(clock=clock)
+    for i in range(200):
+        saved.add((i % 13, i % 26, "Driver", "Easy"), opening(f"question {i}"))
+    path = str(tmp_path / "openings.jsonl.gz")
+    saved.save(path)
+
+    clock.now = 1000.0
+    loaded = OpeningCache(ttl=100, clock=clock)
+    assert loaded.load(path, rng=random.Random(1)) == 200
+    clock.now = 1060.0  # past the first expiries, well short of the TTL
+    live = sum(loaded.take((i % 13, i % 26, "Driver", "Easy")) is not None for i in range(200))
+    assert 0 < loaded.expired < 200 and live > 0
+
+
+def test_cache_miss_wakes_refill_workers():
+    async def run():
+        server = MiddlewareServer(CountingModel(), openings=OpeningCache(clock=FakeClock()))
+        assert (await post(server, build_opening_payload("Ann", "Driver", "Easy", scenario_seed=7))).status == 200
+        assert server.openings.backlog == 1
+        assert server.refill_wanted.is_set()
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+"""Replay a recorded interrogation through the real client, headless and on a virtual clock.
+
+The recording is an eight-turn game against alibi_server.py that ends with
+the detective catching the player. Re-record it (see Recording and Replay
+in the README) when the client's requests change on purpose.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import alibi_replay  # noqa: E402
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings", "interrogation.jsonl")
+WALL_LIMIT = 5.0  # seconds; the game itself took several seconds of virtual time
+
+
+def test_replay_matches_recording():
+    started = time.perf_counter()
+    report = alibi_replay.replay(RECORDING)
+    elapsed = time.perf_counter() - started
+
+    assert report["divergences"] == []
+    assert report["errors"] == []
+    assert report["unused"] == 0
+    assert report["outcome"]["replayed"] == report["outcome"]["recorded"]
+    assert report["ok"]
+    assert report["turns"] == 8
+    assert elapsed < WALL_LIMIT
+
+
+def test_replay_runs_again_in_the_same_process():
+    first = alibi_replay.replay(RECORDING)
+    second = alibi_replay.replay(RECORDING)
+    assert first["ok"] and second["ok"]
+    assert second["dialogs"] == first["dialogs"]  # not carried over from the first run
+    assert second["outcome"] == first["outcome"]
@@ -0,0 +1,82 @@
+"""Folding, the wire format and the token budget of alibi_transcript."""
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from alibi_transcript import (MAX_CLAIMS, MIN_RECENT_TURNS, SUMMARY_CHARS, SUMMARY_ROLE, Transcript,  # noqa: E402
+                              count_turns, estimate_tokens)
+
+
+def play(transcript, turns):
+    for i in range(turns):
+        transcript.add(f"Turn {i}: where exactly were you at {i} o'clock that night, and who saw you there?",
+                       f"Turn {i}: I was at the diner on Fifth with my cousin until {i} o'clock, then I walked home.")
+
+
+def test_short_game_stays_verbatim():
+    transcript = Transcript()
+    play(transcript, 3)
+    assert transcript.folded == 0 and transcript.summary == ""
+    assert count_turns(transcript.messages()) == transcript.seq == 3
+    assert [m["role"] for m in transcript.messages()] == ["detective", "player"] * 3
+
+
+def test_folding_keeps_recent_turns_and_early_claims():
+    transcript = Transcript(token_budget=300)
+    play(transcript, 60)
+    assert len(transcript) == transcript.seq == 60
+    assert len(transcript.turns) >= MIN_RECENT_TURNS
+    assert transcript.turns[-1].answer.startswith("Turn 59:")
+    assert len(transcript.summary) <= SUMMARY_CHARS
+    assert "Turn 0:" not in transcript.summary  # the earliest questions have dropped off...
+    assert len(transcript.folded_claims) == MAX_CLAIMS
+    assert transcript.folded_claims[0].startswith(f"Turn {transcript.folded - MAX_CLAIMS}:")  # ...claims outlive them
+    memory = transcript.memory()
+    assert "The player's earlier claims:" in memory and transcript.folded_claims[0] in memory
+
+
+def test_budget_bounds_tokens_however_long_the_game():
+    transcript = Transcript(token_budget=300)
+    play(transcript, 20)
+    after_20 = transcript.tokens
+    play(transcript, 200)
+    expected = (estimate_tokens(transcript.summary) + sum(estimate_tokens(c) for c in transcript.folded_claims)
+                + sum(turn.tokens() for turn in transcript))
+    assert transcript.tokens == expected
+    bound = SUMMARY_CHARS // 4 + MAX_CLAIMS * 20 + 300 + 100
+    assert after_20 <= bound and transcript.tokens <= bound
+    assert len(transcript.memory()) <= bound * 4
+
+
+def test_wire_round_trip():
+    transcript = Transcript(token_budget=300)
+    play(transcript, 40)
+    messages = transcript.messages()
+    assert messages[0]["role"] == SUMMARY_ROLE and messages[0]["turns"] == transcript.folded
+    assert count_turns(messages) == transcript.seq == 40
+
+    rebuilt = Transcript.from_messages(messages, token_budget=300)
+    assert rebuilt.seq == 40
+    assert rebuilt.summary == transcript.summary
+    assert list(rebuilt.folded_claims) == list(transcript.folded_claims)
+    assert rebuilt.tokens == transcript.tokens
+    assert rebuilt.messages() == messages
+
+    rebuilt.add("And then?", "Then I went to bed.")
+    transcript.add("And then?", "Then I went to bed.")
+    assert rebuilt.messages() == transcript.messages()
+
+
+def test_count_turns_ignores_a_bad_summary_count():
+    assert count_turns([]) == 0
+    assert count_turns([{"role": SUMMARY_ROLE, "content": "", "turns": "7"},
+                        {"role": "detective", "content": "q"}, {"role": "player", "content": "a"}]) == 1
+
+
+def test_clear():
+    transcript = Transcript(token_budget=300)
+    play(transcript, 30)
+    transcript.clear()
+    assert transcript.seq == 0 and transcript.tokens == 0 and transcript.messages() == []